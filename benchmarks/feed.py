@@ -0,0 +1,148 @@
+"""
+Synthetic Facebook page feed, matching the page crawler's selectors, and the GraphQL responses loading it
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+
+feed_class = "x9f619 x1n2onr6 x1ja2u2z xeuugli xs83m0k xjl7jj x1xmf6yo x1emribx x1e56ztr x1i64zmx x19h7ccj xu9j1y6 x7ep2pv"
+post_class = "x1yztbdb x1n2onr6 xh8yej3 x1ja2u2z"
+post_content_div_class = (
+    "html-div xdj266r x11i5rnm xat24cr x1mh8g0r xexx8yu x4uap5 x18d9i69 xkhd6sd"
+)
+sidebar_class = "x9f619 x1n2onr6 x1ja2u2z x78zum5 xdt5ytf xeuugli x1r8uery x1iyjqo2 xs83m0k x1swvt13 x1pi30zi xqdwrps x16i7wwg x1y5dvz6"
+hover_class = "x78zum5 xdt5ytf x1n2onr6 xat3117 xxzkxad"
+words = "khuyến mãi giảm giá sản phẩm mới cửa hàng chạy bộ thể thao giày áo".split()
+
+
+class SyntheticPost:
+    def __init__(self, i: int, rng: random.Random, page_id: str) -> None:
+        self.i = i
+        self.link = f"https://www.facebook.com/{page_id}/posts/pfbid0{i:08d}"
+        self.date = datetime(2024, 9, 1) - timedelta(hours=3 * i)
+        self.text = " ".join(rng.choices(words, k=rng.randrange(10, 80)))
+        self.hashtag = f"#tag{i % 20}"
+        self.has_link = rng.random() < 0.3
+        self.has_location = rng.random() < 0.2
+        self.media = rng.choice([None, "Photo", "Video"])
+        self.reactions = {
+            name: rng.randrange(1, 500)
+            for name in rng.sample(["like", "love", "haha", "wow"], k=rng.randrange(4))
+        }
+        self.num_comments = rng.randrange(200)
+        self.num_shares = rng.randrange(50)
+
+    def html(self) -> str:
+        link = (
+            ' <a href="https://l.facebook.com/l.php?u=https%3A%2F%2Fshop.vn">shop.vn</a>'
+            if self.has_link
+            else ""
+        )
+        location = (
+            '<a href="/pages/hanoi"><span class="xt0psk2">Hà Nội</span></a>'
+            if self.has_location
+            else "<a><span>·</span></a>"
+        )
+        if self.media == "Photo":
+            visual = (
+                '<div><div><img src="https://scontent.xx.fbcdn.net/p.jpg"></div></div>'
+            )
+        elif self.media == "Video":
+            visual = '<div><div role="presentation"><video></video></div></div>'
+        else:
+            visual = ""
+        labels = "".join(
+            f'<span aria-label="{label}: {count} người"></span>'
+            for label, count in zip(
+                [
+                    {"like": "Thích", "love": "Yêu thích"}.get(name, name.capitalize())
+                    for name in self.reactions
+                ],
+                self.reactions.values(),
+            )
+        )
+        total = sum(self.reactions.values())
+        return (
+            f'<div class="{post_class}"><div class="{post_content_div_class}"><div class="{post_content_div_class}">'
+            "<div>header</div>"
+            '<div><div><div><div data-ad-rendering-role="profile_name"><h2><a href="/page">Page</a></h2></div></div></div>'
+            f'<div><span><a href="{self.link}?__cft__[0]=AZ{self.i}&amp;__tn__=%2CO%2CP-R" aria-label="{self.date.day} tháng {self.date.month}, {self.date.year}">'
+            f"{self.i // 8 + 1} giờ</a></span></div>"
+            f'<div><a href="/page">Page {self.i}</a>{location}</div></div>'
+            f'<div><div data-ad-comet-preview="message"><div>{self.text}{link} {self.hashtag}</div></div>{visual}</div>'
+            f'<div><div class="x1n2onr6"><div><div><div>{labels}<span>{total if total > 0 else ""}</span></div></div>'
+            f'<div><div role="button">{self.num_comments} bình luận</div><div role="button">{self.num_shares} lượt chia sẻ</div></div>'
+            "</div></div></div>"
+            "</div></div></div>"
+        )
+
+    def story(self) -> dict:
+        return {
+            "__typename": "Story",
+            "post_id": str(self.i),
+            "url": self.link,
+            "actors": [{"name": f"Page {self.i}"}],
+            "message": {"text": f"{self.text} {self.hashtag}"},
+            "creation_time": int(self.date.timestamp()),
+            "attachments": (
+                [{"media": {"__typename": self.media}}]
+                if self.media is not None
+                else []
+            ),
+            "comment_rendering_instance": {
+                "comments": {"total_count": self.num_comments}
+            },
+            "share_count": {"count": self.num_shares},
+            "top_reactions": {
+                "edges": [
+                    {"node": {"localized_name": name}, "reaction_count": count}
+                    for name, count in self.reactions.items()
+                ]
+            },
+        }
+
+
+def synthetic_posts(
+    n_posts: int, seed: int = 0, page_id: str = "bench"
+) -> list[SyntheticPost]:
+    rng = random.Random(seed)
+    return [SyntheticPost(i, rng, page_id) for i in range(n_posts)]
+
+
+def synthetic_feed(posts: list[SyntheticPost]) -> str:
+    """Page HTML holding all posts in its feed, with the overlays and hover tooltip the crawler expects"""
+    latest = posts[0].date if len(posts) > 0 else datetime(2024, 9, 1)
+    sidebars = "".join(f'<div class="{sidebar_class}"></div>' for _ in range(3))
+    return (
+        "<html><head></head><body>"
+        '<div role="banner"><a href="https://www.facebook.com/">Facebook</a></div>'
+        f"{sidebars}"
+        f'<div class="{feed_class}"><div><div>{"".join(post.html() for post in posts)}</div></div></div>'
+        f'<div class="{hover_class}"><div></div><div><div><div><div class="x1 __fb-light-mode">'
+        f"Chủ Nhật, {latest.day} tháng {latest.month}, {latest.year} lúc {latest.hour}:{latest.minute:02d}"
+        "</div></div></div></div></div>"
+        "</body></html>"
+    )
+
+
+def synthetic_responses(posts: list[SyntheticPost], page_size: int) -> list[str]:
+    """GraphQL response bodies loading the feed, `page_size` stories each"""
+    return [
+        "\n".join(
+            json.dumps(
+                {
+                    "data": {
+                        "node": {
+                            "timeline_list_feed_units": {
+                                "edges": [{"node": post.story()}]
+                            }
+                        }
+                    }
+                },
+                ensure_ascii=False,
+            )
+            for post in posts[i : i + page_size]
+        )
+        for i in range(0, len(posts), page_size)
+    ]
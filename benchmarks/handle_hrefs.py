@@ -0,0 +1,92 @@
+"""
+`HandleHrefs` on synthetic post frames of increasing size: previous per-cell `df.map` against the vectorized step.
+Usage: python -m benchmarks.handle_hrefs [--sizes 1000 10000 100000]
+"""
+
+from pipeline import HandleHrefs
+
+import re
+import time
+import random
+import argparse
+from datetime import datetime
+from pandas import DataFrame
+
+
+def keep_content_fn(value):
+    if isinstance(value, str):
+        return re.sub(r"href\(([^,]+), [^\)]+\)", r"\1", value)
+    return value
+
+
+def replace_fn(value, predicate):
+    if isinstance(value, str):
+        hrefs = re.findall(r"href\(([^,]+), ([^\)]+)\)", value)
+        replace_dict = {
+            f"href({content}, {url})": predicate(content, url) for content, url in hrefs
+        }
+        return re.sub(
+            r"href\([^,]+, [^\)]+\)",
+            repl=lambda m: replace_dict.get(m.group(), None),
+            string=value,
+        )
+    return value
+
+
+def synthetic_posts(n_rows: int, seed: int = 0) -> DataFrame:
+    rng = random.Random(seed)
+    words = "khuyến mãi giảm giá sản phẩm mới cửa hàng chạy bộ thể thao".split()
+
+    def content(i: int):
+        text = " ".join(rng.choices(words, k=40))
+        if rng.random() < 0.3:
+            text += f" href(xem tại đây, https://l.facebook.com/l.php?u=https%3A%2F%2Fshop.vn%2F{i})"
+        return text
+
+    return DataFrame(
+        {
+            "Post_link": [
+                f"https://www.facebook.com/page/posts/pfbid{i}" for i in range(n_rows)
+            ],
+            "Owner": ["Page"] * n_rows,
+            "Location": [None] * n_rows,
+            "Post_date": [datetime(2024, 9, 1)] * n_rows,
+            "Content": [content(i) for i in range(n_rows)],
+            "Hashtag": ["#run #sale"] * n_rows,
+            "Is_Post_Image": [rng.random() < 0.5 for _ in range(n_rows)],
+            "Is_Post_Video": [rng.random() < 0.2 for _ in range(n_rows)],
+            "Reaction": ["like (12);love (3)"] * n_rows,
+            "Num_comments": [rng.randrange(100) for _ in range(n_rows)],
+            "Num_share": [rng.randrange(10) for _ in range(n_rows)],
+        }
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    predicate = lambda content, url: "<link>"
+    print(
+        f"{'Rows':>10} {'Action':>14} {'df.map (ms)':>12} {'Vectorized (ms)':>16} {'Speedup':>8}"
+    )
+    for size in args.sizes:
+        df = synthetic_posts(size)
+        for action, old_fn in [
+            ("keep_content", lambda: df.map(keep_content_fn)),
+            ("replace", lambda: df.map(replace_fn, predicate=predicate)),
+        ]:
+            step = HandleHrefs(action=action, replace_predicate=predicate)
+            start = time.perf_counter()
+            expected = old_fn()
+            old_time = time.perf_counter() - start
+            start = time.perf_counter()
+            result = step(df)
+            new_time = time.perf_counter() - start
+            assert result.equals(expected)
+            print(
+                f"{size:>10,} {action:>14} {old_time * 1000:>12.1f} {new_time * 1000:>16.1f} {old_time / new_time:>7.1f}x"
+            )
@@ -0,0 +1,82 @@
+"""
+Link extraction over a large page: per-extractor BeautifulSoup parse (previous implementation)
+against the shared href scan of `extract_links`.
+Usage: python -m benchmarks.link_extraction [--html saved_page.html] [--anchors 20000]
+"""
+
+import config
+from utils.link_extractor import LinkExtractor, extract_links
+
+import bs4
+import time
+import random
+import argparse
+
+
+def bs4_extract(extractor: LinkExtractor, html: str):
+    soup = bs4.BeautifulSoup(html, features="lxml")
+    links = [anchor.get("href", "") for anchor in soup.find_all("a")]
+    return [link for link in links if extractor.match(link)]
+
+
+def synthetic_page(n_anchors: int, seed: int = 0) -> str:
+    """Facebook-like markup: deeply nested divs with obfuscated classes and tracking-laden links"""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n_anchors):
+        kind = rng.choice(["page", "post", "photo", "hashtag", "profile"])
+        if kind == "page":
+            href = f"https://www.facebook.com/page{rng.randrange(n_anchors // 10 + 1)}"
+        elif kind == "post":
+            href = f"https://www.facebook.com/page{i % 50}/posts/pfbid{i}?__cft__[0]=AZ{i}&amp;__tn__=%2CO%2CP-R"
+        elif kind == "photo":
+            href = f"https://www.facebook.com/photo/?fbid={i}&amp;set=a.{i}&amp;__tn__=%2CO*F"
+        elif kind == "hashtag":
+            href = f"https://www.facebook.com/hashtag/tag{i % 300}?__eep__=6&amp;__cft__[0]=AZ"
+        else:
+            href = f"/profile.php?id={i}&amp;__tn__=-]C%2CP-R"
+        chunks.append(
+            f'<div class="x1i10hfl xjbqb8w x6umtig x1b1mbwd xaqea5y xav7gou x9f619"><div class="x78zum5 xdt5ytf">'
+            f'<span dir="auto"><a class="x1i10hfl xjbqb8w x1ejq31n" href="{href}" role="link" tabindex="0">'
+            f"<span>Link {i}</span></a></span></div></div>"
+        )
+    return f"<html><head></head><body>{''.join(chunks)}</body></html>"
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--html", help="Path to a saved page_source", default=None)
+    parser.add_argument("--anchors", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.html is not None:
+        with open(args.html, "r", encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page(args.anchors)
+
+    extractors = [config.NAVIGATE_LINK_EXTRACTOR, config.PARSE_LINK_EXTRACTOR]
+    old_time, old_links = timed(
+        lambda: [bs4_extract(extractor, html) for extractor in extractors], args.repeat
+    )
+    new_time, new_links = timed(lambda: extract_links(html, *extractors), args.repeat)
+
+    print(f"Page size: {len(html) / 1024**2:.2f} MB")
+    print(f"{'Method':<24} {'Time (ms)':>10} {'Links per extractor':>22}")
+    print(
+        f"{'BeautifulSoup x2':<24} {old_time * 1000:>10.1f} {str([len(set(links)) for links in old_links]):>22}"
+    )
+    print(
+        f"{'Shared href scan':<24} {new_time * 1000:>10.1f} {str([len(links) for links in new_links]):>22}"
+    )
+    print(f"Speedup: {old_time / new_time:.1f}x")
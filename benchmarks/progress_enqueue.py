@@ -0,0 +1,64 @@
+"""
+Per-enqueue latency of `Progress.selectively_enqueue` as the number of known URLs grows.
+Usage: python -m benchmarks.progress_enqueue [--sizes 1000 10000 100000 1000000]
+"""
+
+from utils import Progress
+
+import argparse
+import time
+from tempfile import TemporaryDirectory
+
+
+def bench(n_known: int, n_ops: int) -> dict[str, float]:
+    with TemporaryDirectory() as tmp_dir:
+        progress = Progress(dir=tmp_dir)
+        # Half of known URLs are in history, the other half still queued
+        with progress.transaction():
+            for i in range(n_known // 2):
+                progress.add_history(f"https://www.facebook.com/history/{i}")
+            progress.enqueue_list(
+                [f"https://www.facebook.com/queue/{i}" for i in range(n_known // 2)]
+            )
+
+        known_urls = [
+            f"https://www.facebook.com/{kind}/{i * (n_known // 2) // n_ops}"
+            for i in range(n_ops // 2)
+            for kind in ["history", "queue"]
+        ]
+        new_urls = [f"https://www.facebook.com/new/{i}" for i in range(n_ops)]
+
+        start = time.perf_counter()
+        for url in known_urls:
+            progress.selectively_enqueue(url)
+        known_us = (time.perf_counter() - start) / len(known_urls) * 1e6
+
+        start = time.perf_counter()
+        for url in new_urls:
+            progress.selectively_enqueue(url)
+        new_us = (time.perf_counter() - start) / len(new_urls) * 1e6
+
+        start = time.perf_counter()
+        progress.selectively_enqueue_list(known_urls + new_urls)
+        list_us = (
+            (time.perf_counter() - start) / (len(known_urls) + len(new_urls)) * 1e6
+        )
+        progress.db.close()
+
+    return {"known_us": known_us, "new_us": new_us, "list_us": list_us}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--ops", type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(f"{'Known URLs':>12} {'Known (us)':>12} {'New (us)':>12} {'List (us)':>12}")
+    for size in args.sizes:
+        result = bench(size, args.ops)
+        print(
+            f"{size:>12,} {result['known_us']:>12.2f} {result['new_us']:>12.2f} {result['list_us']:>12.2f}"
+        )
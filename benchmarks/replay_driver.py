@@ -0,0 +1,402 @@
+"""
+Fake Chrome driver replaying a saved feed page, implementing the subset of the Selenium API the page crawler uses.
+Scrolling reveals `page_size` more posts of the page and releases the next recorded GraphQL response, if any.
+Element lookups go through Selenium's own `find_element(s)` down to `execute`, as they would with Chrome.
+Document-wide lookups are memoized until the DOM changes: browsers evaluate them natively,
+while lxml scanning the whole page for each post would otherwise dominate the replay.
+Page scripts are answered by Python mirrors of them, so time spent in scripts measures the mirrors, not a browser
+"""
+
+from crawlers.page_crawler.selectors import SELECTORS
+from crawlers.page_crawler import scripts
+from utils import pacing
+from utils.selectors import compile_xpath
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.remote.locator_converter import LocatorConverter
+from selenium.common.exceptions import NoSuchElementException
+
+import json
+from lxml import html as lxml_html
+from urllib.parse import urljoin
+from typing import Any
+
+SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight)"
+REMOVE_JS = "arguments[0].remove();"
+READY_STATE_JS = "return document.readyState"
+
+
+def inner_html(element) -> str:
+    return (element.text or "") + "".join(
+        lxml_html.tostring(child, encoding="unicode") for child in element
+    )
+
+
+class ReplayElement(WebElement):
+    def __init__(self, driver: "ReplayDriver", element) -> None:
+        super().__init__(driver, str(id(element)))
+        self.element = element
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ReplayElement) and self.element is other.element
+
+    def __hash__(self) -> int:
+        return id(self.element)
+
+    @property
+    def text(self) -> str:
+        return self.element.text_content()
+
+    @property
+    def tag_name(self) -> str:
+        return self.element.tag
+
+    def get_attribute(self, name: str) -> str | None:
+        if name == "outerHTML":
+            return lxml_html.tostring(self.element, encoding="unicode", with_tail=False)
+        if name == "innerHTML":
+            return inner_html(self.element)
+        if name in ["textContent", "innerText"]:
+            return self.element.text_content()
+        value = self.element.get(name)
+        if name in ["href", "src"] and value is not None:
+            return urljoin(self.parent.current_url, value)
+        return value
+
+    def click(self):
+        pass
+
+    def is_displayed(self) -> bool:
+        return True
+
+
+class ReplayDriver:
+    def __init__(
+        self,
+        html: str,
+        url: str = "https://www.facebook.com/bench",
+        page_size: int = 10,
+        responses: list[str] | None = None,
+    ) -> None:
+        self.current_url = url
+        self.page_size = page_size
+        self.document = lxml_html.fromstring(html)
+        # Posts beyond the first page are detached, to be appended back as the feed scrolls
+        posts = SELECTORS.posts.select(self.document)
+        self.feed = posts[0].getparent() if len(posts) > 0 else None
+        for post in posts[page_size:]:
+            self.feed.remove(post)
+        self.hidden_posts = posts[page_size:]
+        self.responses = list(responses or [])
+        self.log_entries: list[dict[str, Any]] = []
+        self.bodies: dict[str, str] = dict()
+        self.n_requests = 0
+        self.n_scrolls = 0
+        self.n_commands = 0
+        self.lookups: dict[str, list] = dict()
+        # Elements handed out, by WebElement id
+        self.elements: dict[str, Any] = dict()
+        self.locator_converter = LocatorConverter()
+        self.release_response()
+
+        self.session_id = "replay"
+        self.current_window_handle = "main"
+        self.window_handles = ["main"]
+        self.switch_to = self
+        self.scripts = {
+            SCROLL_JS: self.scroll,
+            REMOVE_JS: self.remove,
+            READY_STATE_JS: lambda: "complete",
+            pacing.RENDER_STATE_JS: self.render_state,
+            scripts.COUNT_XPATH_JS: lambda xpath: len(self.evaluate(xpath)),
+            scripts.CLICK_ALL_JS: lambda xpath: None,
+            scripts.MARK_PARSED_JS: self.mark_parsed,
+            scripts.PRUNE_PARSED_POSTS_JS: self.prune_parsed_posts,
+            scripts.POST_HREFS_JS: self.post_hrefs,
+            scripts.LAST_POST_DATE_HINTS_JS: self.last_post_date_hints,
+            scripts.REACTION_SUMMARY_JS: self.reaction_summary,
+            scripts.EXTRACT_POSTS_JS: self.extract_posts,
+        }
+
+    ## Selenium API
+    @property
+    def page_source(self) -> str:
+        return lxml_html.tostring(self.document, encoding="unicode")
+
+    def get(self, url: str):
+        self.current_url = url
+
+    def new_window(self, type_hint: str | None = None):
+        pass
+
+    def window(self, handle: str):
+        pass
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def implicitly_wait(self, seconds: float):
+        pass
+
+    def get_cookies(self) -> list[dict]:
+        return []
+
+    find_element = WebDriver.find_element
+    find_elements = WebDriver.find_elements
+
+    def execute(self, driver_command: str, params: dict | None = None):
+        self.n_commands += 1
+        if driver_command in [Command.FIND_ELEMENT, Command.FIND_ELEMENTS]:
+            context = self.document
+        elif driver_command in [
+            Command.FIND_CHILD_ELEMENT,
+            Command.FIND_CHILD_ELEMENTS,
+        ]:
+            context = self.elements[params["id"]]
+        else:
+            # Actions (hover, clicks) have no effect on a static page
+            return {"value": None}
+
+        if params["using"] != By.XPATH:
+            raise NotImplementedError(
+                f"Only XPath lookups are replayed, got {params['using']}"
+            )
+        elements = [
+            self._wrap(element) for element in self.evaluate(params["value"], context)
+        ]
+        if driver_command in [Command.FIND_ELEMENTS, Command.FIND_CHILD_ELEMENTS]:
+            return {"value": elements}
+        if len(elements) == 0:
+            raise NoSuchElementException(f"No element matches {params['value']}")
+        return {"value": elements[0]}
+
+    def execute_script(self, script: str, *args):
+        self.n_commands += 1
+        if script not in self.scripts:
+            raise NotImplementedError(f"Script not supported by replay: {script[:60]}")
+        args = [self._unwrap(arg) for arg in args]
+        return self._wrap(self.scripts[script](*args))
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+        self.n_commands += 1
+        if cmd == "Network.getResponseBody":
+            return {"body": self.bodies.pop(cmd_args["requestId"])}
+        return {}
+
+    def get_log(self, log_type: str) -> list[dict[str, Any]]:
+        self.n_commands += 1
+        entries, self.log_entries = self.log_entries, []
+        return entries
+
+    def evaluate(self, xpath: str, context=None) -> list:
+        if context is not None and context is not self.document:
+            return compile_xpath(xpath)(context)
+        if xpath not in self.lookups:
+            self.lookups[xpath] = compile_xpath(xpath)(self.document)
+        return self.lookups[xpath]
+
+    def mutated(self):
+        self.lookups = dict()
+
+    def _unwrap(self, value):
+        if isinstance(value, ReplayElement):
+            return value.element
+        if isinstance(value, list):
+            return [self._unwrap(item) for item in value]
+        return value
+
+    def _wrap(self, value):
+        if isinstance(value, lxml_html.HtmlElement):
+            element = ReplayElement(self, value)
+            self.elements[element.id] = value
+            return element
+        if isinstance(value, list):
+            return [self._wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._wrap(item) for key, item in value.items()}
+        return value
+
+    ## Page behaviour
+    def release_response(self):
+        """Log the next recorded response as received and finished, as Chrome's performance log would"""
+        if len(self.responses) == 0:
+            return
+        request_id = str(self.n_requests)
+        self.n_requests += 1
+        self.bodies[request_id] = self.responses.pop(0)
+        for message in [
+            {
+                "method": "Network.responseReceived",
+                "params": {
+                    "requestId": request_id,
+                    "response": {"url": "https://www.facebook.com/api/graphql/"},
+                },
+            },
+            {"method": "Network.loadingFinished", "params": {"requestId": request_id}},
+        ]:
+            self.log_entries.append({"message": json.dumps({"message": message})})
+
+    def remove(self, element):
+        element.getparent().remove(element)
+        self.mutated()
+
+    def scroll(self):
+        self.n_scrolls += 1
+        self.mutated()
+        for post in self.hidden_posts[: self.page_size]:
+            self.feed.append(post)
+        self.hidden_posts = self.hidden_posts[self.page_size :]
+        self.release_response()
+        # Once the page shows no more posts, pending responses all come in
+        if len(self.hidden_posts) == 0:
+            while len(self.responses) > 0:
+                self.release_response()
+
+    def render_state(self, xpath: str) -> dict[str, Any]:
+        return dict(
+            quiet_ms=float("inf"),
+            n_resources=self.n_scrolls,
+            n_items=len(self.evaluate(xpath)),
+        )
+
+    def mark_parsed(self, posts: list):
+        for post in posts:
+            post.set("data-crawler-parsed", "1")
+        self.mutated()
+
+    def prune_parsed_posts(self, xpath: str) -> int:
+        parsed = [
+            post for post in self.evaluate(xpath) if post.get("data-crawler-parsed")
+        ]
+        for post in parsed[:-1]:
+            post.getparent().remove(post)
+        self.mutated()
+        return len(parsed[:-1])
+
+    def post_hrefs(self, xpath: str) -> list[list[str]]:
+        return [
+            [
+                urljoin(self.current_url, anchor.get("href"))
+                for anchor in post.iterfind(".//a[@href]")
+            ]
+            for post in self.evaluate(xpath)
+        ]
+
+    def last_post_date_hints(self, xpath: str, anchor_xpaths: list[str]) -> list[str]:
+        posts = self.evaluate(xpath)
+        if len(posts) == 0:
+            return []
+        anchor = next(
+            (
+                anchors[0]
+                for anchor_xpath in anchor_xpaths
+                if len(anchors := self.evaluate(anchor_xpath, posts[-1])) > 0
+            ),
+            None,
+        )
+        # Same order as the script: embedded timestamps, the anchor's labels, its descendants' labels, its text
+        hints = [
+            f"utime:{element.get('data-utime')}"
+            for element in posts[-1].iterfind(".//*[@data-utime]")
+        ]
+        if anchor is None:
+            return hints
+        hints.extend(
+            anchor.get(attr) for attr in ["aria-label", "title"] if anchor.get(attr)
+        )
+        hints.extend(
+            element.get("aria-label") or element.get("title")
+            for element in anchor.xpath(".//*[@aria-label or @title]")
+        )
+        hints.append(anchor.text_content())
+        return hints
+
+    def reaction_summary(self, bar) -> dict[str, Any]:
+        return dict(
+            text=bar.text_content(),
+            labels=[
+                element.get("aria-label")
+                for element in bar.iterfind(".//*[@aria-label]")
+            ],
+        )
+
+    def extract_posts(
+        self, posts_xpath: str, selectors: dict[str, list[str]]
+    ) -> list[dict[str, Any]]:
+        # Mirrors `EXTRACT_POSTS_JS`, through the registry's fallback chains
+        items = []
+        for post in self.evaluate(posts_xpath):
+            if post.get("data-crawler-parsed"):
+                continue
+            post.set("data-crawler-parsed", "1")
+            self.mutated()
+
+            content_divs = SELECTORS.post_content_divs.select(post)
+            profile_div = SELECTORS.profile_name.select_one(post)
+            datetime_anchor = (
+                SELECTORS.datetime_anchor.select_one(profile_div)
+                if profile_div is not None
+                else None
+            )
+            anchors = SELECTORS.owner_loc_anchors.select(post)
+
+            text_div, visual_div = None, None
+            if len(content_divs) > 2:
+                n_modalities = len(SELECTORS.child_divs.select(content_divs[2]))
+                text_div = SELECTORS.text_content.select_one(content_divs[2])
+                if (n_modalities == 2 and text_div is not None) or (
+                    n_modalities == 1 and text_div is None
+                ):
+                    visual_div = SELECTORS.last_child_div.select_one(content_divs[2])
+
+            button_texts = []
+            interaction_div = (
+                SELECTORS.interaction_div.select_one(content_divs[3])
+                if len(content_divs) > 3
+                else None
+            )
+            if interaction_div is not None:
+                cmt_share_div = SELECTORS.last_child_div.select_one(interaction_div)
+                button_texts = [
+                    button.text_content()
+                    for button in SELECTORS.buttons.select(cmt_share_div)
+                ]
+
+            location_span = (
+                SELECTORS.first_span.select_one(anchors[3])
+                if len(anchors) > 3
+                else None
+            )
+            img = (
+                SELECTORS.img.select_one(visual_div) if visual_div is not None else None
+            )
+            items.append(
+                dict(
+                    element=post,
+                    post_link_href=(
+                        urljoin(self.current_url, datetime_anchor.get("href"))
+                        if datetime_anchor is not None
+                        else None
+                    ),
+                    owner=anchors[2].text_content() if len(anchors) > 2 else None,
+                    location=(
+                        anchors[3].text_content()
+                        if location_span is not None
+                        and location_span.get("class") == "xt0psk2"
+                        else None
+                    ),
+                    text_html=inner_html(text_div) if text_div is not None else None,
+                    button_texts=button_texts,
+                    is_post_image=img is not None
+                    and "data-visualcompletion" not in img.getparent().attrib,
+                    is_post_video=visual_div is not None
+                    and SELECTORS.presentation_div.select_one(visual_div) is not None,
+                )
+            )
+        return items
@@ -0,0 +1,423 @@
+"""
+Offline benchmarks of the page crawler on a replayed feed, at several feed sizes:
+end-to-end `parse` per extraction mode, per-post parsing, link extraction, `Progress` operations
+and each step of the configured pipeline. Results are written as JSON, optionally compared to an earlier run.
+Script mode is only run when asked for: the replay driver runs its in-page extraction as Python,
+so its results are flagged `emulated` and reported apart, not as a timing of the browser-side script.
+Usage: python -m benchmarks.suite [--sizes 50 500 5000] [--html saved_page.html | --record-dir recorded_network_dir]
+                                  [--output results.json] [--compare baseline.json]
+"""
+
+import os
+
+# Progress bars of the crawler would flood the benchmark's output
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+import config
+from crawlers.page_crawler.crawler import Crawler
+from crawlers.page_crawler.snapshot import FeedSnapshot
+from crawlers.page_crawler.network import parse_payloads
+from crawlers.page_crawler.selectors import SELECTORS
+from pipeline import Pipeline
+from utils import Progress, Metrics
+from utils.link_extractor import extract_links
+from .feed import synthetic_posts, synthetic_feed, synthetic_responses
+from .replay_driver import ReplayDriver
+
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+from glob import glob
+from lxml import html as lxml_html
+from os.path import join
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from typing import Any, Callable
+
+PAGE_ID = "bench"
+PAGE_URL = f"https://www.facebook.com/{PAGE_ID}"
+MODES = ["snapshot", "script", "selenium", "network"]
+# Modes whose extraction runs in page scripts, which `ReplayDriver` emulates in Python
+EMULATED_MODES = ["script"]
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """Best time of `repeat` runs, and result of the last one"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def result(
+    benchmark: str, n_posts: int, seconds: float, n_items: int, **params: Any
+) -> dict[str, Any]:
+    return dict(
+        benchmark=benchmark,
+        n_posts=n_posts,
+        params=params,
+        seconds=round(seconds, 6),
+        per_item_ms=round(seconds / n_items * 1000, 4) if n_items > 0 else None,
+    )
+
+
+def format_name(name: str, params: dict[str, Any]) -> str:
+    if len(params) == 0:
+        return name
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+
+def make_crawler(
+    crawler_dir: str,
+    driver: ReplayDriver,
+    n_posts: int,
+    extraction_mode: str,
+    stream: bool = False,
+) -> Crawler:
+    crawler = Crawler(
+        page_id=PAGE_ID,
+        post_collect_criterion="n_posts",
+        post_collect_threshold=n_posts,
+        extraction_mode=extraction_mode,
+        stream=stream,
+        chromedriver_path="chromedriver",
+        navigate_link_extractor=config.NAVIGATE_LINK_EXTRACTOR,
+        parse_link_extractor=config.PARSE_LINK_EXTRACTOR,
+        crawler_dir=crawler_dir,
+        data_pipeline=Pipeline(),
+        user=PAGE_ID,
+        secrets_file="",
+        cookies_save_dir=crawler_dir,
+        # Replayed pages render instantly, only parsing is left to measure
+        sleep_weibull_lambda=1e-9,
+        max_loading_wait=1,
+        async_pipeline=False,
+    )
+    crawler.pacing.poll_interval = 0
+    crawler.chrome = driver
+    crawler.main_tab = driver.current_window_handle
+    return crawler
+
+
+def bench_parse(
+    html: str,
+    responses: list[str],
+    n_posts: int,
+    extraction_mode: str,
+    stream: bool,
+    repeat: int,
+) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """End-to-end `Crawler.parse`: scrolling the replayed feed, then extracting all posts"""
+    best, best_run = float("inf"), None
+    for _ in range(repeat):
+        with TemporaryDirectory() as crawler_dir:
+            driver = ReplayDriver(html, url=PAGE_URL, responses=responses)
+            crawler = make_crawler(
+                crawler_dir, driver, n_posts, extraction_mode, stream
+            )
+            start = time.perf_counter()
+            data = crawler.parse()
+            items = [item for batch in data for item in batch] if stream else data
+            elapsed = time.perf_counter() - start
+            crawler.progress.db.close()
+        if elapsed < best:
+            best, best_run = elapsed, (items, crawler.metrics, driver.n_commands)
+
+    items, metrics, n_commands = best_run
+    record = result(
+        "parse", n_posts, best, len(items), mode=extraction_mode, stream=stream
+    )
+    if extraction_mode in EMULATED_MODES:
+        record["params"]["emulated"] = True
+    record.update(
+        n_parsed=len(items),
+        driver_commands=n_commands,
+        phases={
+            format_name(timing["name"], timing["labels"]): timing["sum"]
+            for timing in metrics.to_dict()["timings"]
+        },
+    )
+    return record, items
+
+
+def bench_parse_post(html: str, n_posts: int, repeat: int) -> list[dict[str, Any]]:
+    """Per-post parsing: offline over a page snapshot, and through the (replayed) WebDriver"""
+    snapshot = FeedSnapshot(html, posts_xpath=Crawler.posts_xpath, page_id=PAGE_ID)
+    posts = snapshot.get_posts()
+    snapshot_time, _ = timed(
+        lambda: [snapshot.parse_post(post) for post in posts], repeat
+    )
+
+    with TemporaryDirectory() as crawler_dir:
+        driver = ReplayDriver(html, url=PAGE_URL, page_size=len(posts))
+        crawler = make_crawler(crawler_dir, driver, n_posts, "selenium")
+        post_divs = crawler.get_loaded_posts()
+        selenium_time, _ = timed(
+            lambda: [
+                crawler.parse_post(i, post_div)
+                for i, post_div in enumerate(post_divs, start=1)
+            ],
+            repeat,
+        )
+        crawler.progress.db.close()
+
+    return [
+        result("parse_post", n_posts, snapshot_time, len(posts), mode="snapshot"),
+        result("parse_post", n_posts, selenium_time, len(posts), mode="selenium"),
+    ]
+
+
+def bench_link_extraction(html: str, n_posts: int, repeat: int) -> list[dict[str, Any]]:
+    extractors = {
+        "navigate": config.NAVIGATE_LINK_EXTRACTOR,
+        "parse": config.PARSE_LINK_EXTRACTOR,
+    }
+    records = []
+    for name, extractor in extractors.items():
+        seconds, _ = timed(lambda: extractor.extract(html), repeat)
+        records.append(result("link_extractor", n_posts, seconds, 1, extractor=name))
+    seconds, _ = timed(lambda: extract_links(html, *extractors.values()), repeat)
+    records.append(result("link_extractor", n_posts, seconds, 1, extractor="all"))
+    return records
+
+
+def bench_progress(urls: list[str], n_posts: int) -> list[dict[str, Any]]:
+    records = []
+    with TemporaryDirectory() as progress_dir:
+        progress = Progress(dir=progress_dir)
+        for op, fn in [
+            ("enqueue_list", lambda: progress.enqueue_list(urls)),
+            # All already queued, only membership checks
+            (
+                "selectively_enqueue_list",
+                lambda: progress.selectively_enqueue_list(urls),
+            ),
+            ("next_url", lambda: [progress.next_url() for _ in urls]),
+            ("add_history", lambda: [progress.add_history(url) for url in urls]),
+            ("save", progress.save),
+        ]:
+            start = time.perf_counter()
+            fn()
+            records.append(
+                result(
+                    "progress", n_posts, time.perf_counter() - start, len(urls), op=op
+                )
+            )
+        progress.db.close()
+    return records
+
+
+def bench_pipeline(
+    items: list[dict[str, Any]], n_posts: int, pipeline: Pipeline
+) -> list[dict[str, Any]]:
+    """Each step of the pipeline on new records, then on the same records again (e.g. upserted by `Deduplicate`)"""
+    records = []
+    with TemporaryDirectory() as crawler_dir:
+        pipeline.set_path_format(crawler_dir=crawler_dir, page_id=PAGE_ID)
+        for run in ["new", "seen"]:
+            pipeline.metrics = Metrics()
+            pipeline(items)
+            for timing in pipeline.metrics.to_dict()["timings"]:
+                records.append(
+                    result(
+                        "pipeline_step",
+                        n_posts,
+                        timing["sum"],
+                        len(items),
+                        step=timing["labels"]["step"],
+                        run=run,
+                    )
+                )
+        start = time.perf_counter()
+        pipeline.flush()
+        records.append(
+            result("pipeline_flush", n_posts, time.perf_counter() - start, len(items))
+        )
+        pipeline.metrics = None
+        # Release index connections before the directory is removed
+        for step in pipeline.steps:
+            for db in getattr(step, "dbs", dict()).values():
+                db.close()
+            getattr(step, "dbs", dict()).clear()
+    return records
+
+
+def run_size(
+    html: str,
+    responses: list[str],
+    n_posts: int,
+    modes: list[str],
+    stream: bool,
+    repeat: int,
+    urls: list[str],
+) -> list[dict[str, Any]]:
+    records, items = [], None
+    full_page = ReplayDriver(html, url=PAGE_URL, page_size=n_posts).page_source
+    has_feed = len(SELECTORS.posts.select(lxml_html.fromstring(full_page))) > 0
+    if not has_feed:
+        print("No feed posts in page, skipping DOM-driven benchmarks", file=sys.stderr)
+
+    for mode in modes if has_feed else []:
+        # Network mode needs recorded or synthetic responses
+        if mode == "network" and len(responses) == 0:
+            continue
+        for mode_stream in [False, True] if stream and mode != "selenium" else [False]:
+            record, mode_items = bench_parse(
+                html, responses, n_posts, mode, mode_stream, repeat
+            )
+            records.append(record)
+            if mode == "snapshot" or items is None:
+                items = mode_items
+
+    if len(responses) > 0:
+        # Mapping of GraphQL payloads alone, without scrolling
+        seconds, payload_items = timed(
+            lambda: parse_payloads(responses, html=html), repeat
+        )
+        records.append(result("parse_payloads", n_posts, seconds, len(payload_items)))
+        items = items or payload_items
+    if has_feed:
+        records.extend(bench_parse_post(full_page, n_posts, repeat))
+    records.extend(bench_link_extraction(full_page, n_posts, repeat))
+    records.extend(bench_progress(urls, n_posts))
+    if items:
+        records.extend(bench_pipeline(items, n_posts, config.PIPELINE))
+    return records
+
+
+def metadata(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(
+        created_at=datetime.now().isoformat(),
+        git_commit=commit,
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        repeat=args.repeat,
+        source=args.html or args.record_dir or "synthetic",
+    )
+
+
+def result_key(record: dict[str, Any]) -> tuple:
+    return (
+        record["benchmark"],
+        record["n_posts"],
+        tuple(sorted((key, str(value)) for key, value in record["params"].items())),
+    )
+
+
+def print_results(results: list[dict[str, Any]]):
+    print(f"{'Benchmark':<54} {'Posts':>6} {'Time (s)':>10} {'Per item (ms)':>14}")
+    for record in results:
+        per_item = record["per_item_ms"] if record["per_item_ms"] is not None else 0.0
+        print(
+            f"{format_name(record['benchmark'], record['params']):<54} {record['n_posts']:>6} "
+            f"{record['seconds']:>10.4f} {per_item:>14.4f}"
+        )
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]]):
+    baseline_by_key = {result_key(record): record for record in baseline}
+    print(
+        f"{'Benchmark':<54} {'Posts':>6} {'Baseline (s)':>13} {'Now (s)':>10} {'Ratio':>7}"
+    )
+    for record in results:
+        if (base := baseline_by_key.get(result_key(record))) is None:
+            continue
+        ratio = record["seconds"] / base["seconds"] if base["seconds"] > 0 else 0.0
+        print(
+            f"{format_name(record['benchmark'], record['params']):<54} {record['n_posts']:>6} "
+            f"{base['seconds']:>13.4f} {record['seconds']:>10.4f} {ratio:>6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[50, 500, 5000])
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=[mode for mode in MODES if mode not in EMULATED_MODES],
+        choices=MODES,
+        help=f"Modes {EMULATED_MODES} are emulated in Python by the replay driver, and reported apart",
+    )
+    parser.add_argument(
+        "--stream", action="store_true", help="Also benchmark streaming parse"
+    )
+    parser.add_argument("--html", help="Saved feed page_source to replay", default=None)
+    parser.add_argument(
+        "--record-dir",
+        help="Network responses (and page.html) recorded by the crawler's network mode",
+        default=None,
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results to compare to", default=None)
+    args = parser.parse_args()
+    # Crawler's info logs would too
+    logging.disable(logging.INFO)
+
+    if args.html is not None or args.record_dir is not None:
+        # A saved page replays as is, at its own size
+        html_path = args.html or join(args.record_dir, "page.html")
+        with open(html_path, "r", encoding="utf-8") as f:
+            html = f.read()
+        responses = []
+        if args.record_dir is not None:
+            for path in sorted(glob(join(args.record_dir, "*.txt"))):
+                with open(path, "r", encoding="utf-8") as f:
+                    responses.append(f.read())
+        snapshot = FeedSnapshot(html, posts_xpath=Crawler.posts_xpath, page_id=PAGE_ID)
+        # Recordings may only hold posts in their payloads
+        items = snapshot.parse_posts() or parse_payloads(responses, html=html)
+        n_posts = len(items)
+        urls = [item["Post_link"] for item in items if item["Post_link"]]
+        cases = [(html, responses, n_posts, urls)]
+    else:
+        cases = []
+        for size in args.sizes:
+            posts = synthetic_posts(size, page_id=PAGE_ID)
+            cases.append(
+                (
+                    synthetic_feed(posts),
+                    synthetic_responses(posts, page_size=10),
+                    size,
+                    [post.link for post in posts],
+                )
+            )
+
+    results = []
+    for html, responses, n_posts, urls in cases:
+        print(f"Benchmarking feed of {n_posts} posts...", file=sys.stderr)
+        results.extend(
+            run_size(
+                html, responses, n_posts, args.modes, args.stream, args.repeat, urls
+            )
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(dict(meta=metadata(args), results=results), f, indent=2)
+    # Emulated timings measure the replay driver, thus aren't comparable to the other modes
+    emulated = [record for record in results if record["params"].get("emulated")]
+    print_results([record for record in results if record not in emulated])
+    if len(emulated) > 0:
+        print("Emulated in Python by the replay driver, not browser timings:")
+        print_results(emulated)
+    print(f"Results written to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f)["results"])
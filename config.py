@@ -1,11 +1,24 @@
 from utils import LinkExtractor
-from pipeline import Pipeline, SaveAsCSV, SaveAsExcel, HandleHrefs
+from pipeline import (
+    Pipeline,
+    SaveAsCSV,
+    SaveAsExcel,
+    SaveAsParquet,
+    HandleHrefs,
+    Deduplicate,
+)
 from datetime import datetime
 
 PIPELINE = Pipeline(
     HandleHrefs(action="keep_content"),
+    ## Posts seen before are only passed on when their engagement counts changed, as updates stored apart
+    Deduplicate(
+        index_dir="{crawler_dir}/{page_id}",
+        upsert_columns=["Reaction", "Num_reactions", "Num_comments", "Num_share"],
+    ),
     SaveAsCSV(dst_dir="{crawler_dir}/{page_id}"),
     # SaveAsExcel(dst_dir="{crawler_dir}/{page_id}", sheet_name="Post"),
+    # SaveAsParquet(dst_dir="{crawler_dir}/{page_id}", row_group_size=10_000),
 )
 
 NAVIGATE_LINK_EXTRACTOR = LinkExtractor(allow_regex=r"", deny_regex=r".*")
@@ -16,10 +29,18 @@ PARSE_LINK_EXTRACTOR = LinkExtractor(
 
 CRAWLER_ARGUMENTS = {
     "page_crawler": dict(
-        page_id="UnderArmourVietnam",
-        post_collect_criterion="post_time",  # ["elapsed_minutes", "n_posts", "post_time"]
+        page_id="UnderArmourVietnam",  # A list of page_ids is crawled in parallel with --workers
+        post_collect_criterion="post_time",  # ["elapsed_minutes", "n_posts", "post_time", "since_last_crawl"]
         post_collect_threshold=datetime(year=2024, month=9, day=1),
+        extraction_mode="snapshot",  # ["snapshot", "script", "selenium", "network"]
+        # network_record_dir="./fixtures/network",  # Record GraphQL responses for replay
+        stream=False,  # Parse and prune posts while scrolling
+        reaction_breakdown="never",  # ["never", "threshold", "always"]
+        reaction_breakdown_threshold=100,  # Min. total reactions to open the breakdown dialog for
         # post_collect_criterion="n_posts",
         # post_collect_threshold=4,
+        ## Stop at posts stored by the previous crawl, threshold is used on first crawl of a page
+        # post_collect_criterion="since_last_crawl",
+        # post_collect_threshold=datetime(year=2024, month=9, day=1),
     )
 }
@@ -1,2 +1,3 @@
 from .base_crawler import BaseCrawler
 from .page_crawler import Crawler as PageCrawler
+from .worker_pool import WorkerPool
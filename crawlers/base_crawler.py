@@ -3,21 +3,34 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.remote.remote_connection import LOGGER
 from selenium.common.exceptions import NoSuchWindowException, WebDriverException
-
-from utils import Logger, Progress, LinkExtractor, Cookies
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils import (
+    Logger,
+    Progress,
+    LinkExtractor,
+    Cookies,
+    Metrics,
+    DriverProfiler,
+    ResourceBlocker,
+)
+from utils.resource_blocking import LOW_MEMORY_ARGUMENTS
 from utils.colors import *
 from utils.utils import login, is_logged_in, ordinal
-from pipeline import Pipeline
+from utils.url import canonicalize_url
+from utils.link_extractor import extract_links
+from utils.pacing import PacingController
+from pipeline import Pipeline, PipelineWriter
 
 import json
 import sys
 import time
 import logging
 from os.path import join
+from queue import SimpleQueue, Empty
 from urllib.parse import urlparse
 from traceback import format_exc
-from scipy.stats import weibull_min
-from typing import Any, Sequence
+from typing import Any, Callable, Sequence, Iterator, Literal
 
 LOGGER.setLevel(logging.CRITICAL)
 
@@ -33,6 +46,8 @@ class BaseCrawler:
         NoSuchWindowException,
         WebDriverException,
     ]
+    # Preset of requests blocked in the browser, unless given to the crawler
+    BLOCKED_RESOURCES = "none"
 
     def __init__(
         self,
@@ -46,16 +61,58 @@ class BaseCrawler:
         cookies_save_dir: str,
         headless: bool = True,
         sleep_weibull_lambda: float = 10.0,
+        scroll_sleep_lambda: float | None = None,
+        error_sleep_lambda: float | None = None,
         max_loading_wait: float = 90,
+        implicit_wait: float = 10,
         max_error_trials: int = 5,
+        history_backend: Literal["set", "bloom"] = "set",
+        async_pipeline: bool = True,
+        pipeline_flush_interval: float = 60.0,
+        metrics_export_interval: float = 30.0,
+        profile_driver: bool = False,
+        user_data_dir: str | None = None,
+        debugger_address: str | None = None,
+        reuse_tab: bool = False,
+        blocked_resources: str | list[str] | None = None,
+        low_memory: bool = False,
         name: str = "Crawler",
     ):
         self.logger = Logger(name)
         self.logger.info("Initializing...")
+        # Timings and counters of the crawl, exported periodically to crawler_dir
+        self.metrics = Metrics(export_interval=metrics_export_interval)
+        self.owns_metrics = True
+        # Opt-in recording of every WebDriver command with its call site, reported at teardown
+        self.driver_profiler = DriverProfiler() if profile_driver else None
         self.navigate_link_extractor = navigate_link_extractor
         self.parse_link_extractor = parse_link_extractor
+        # Set when records are handed to a background writer instead of running own pipeline inline
+        self.pipeline_writer: PipelineWriter | None = None
+        self.async_pipeline = async_pipeline
+        self.owns_pipeline_writer = False
+        # Records count as stored once the pipeline is flushed, every `pipeline_flush_interval` seconds.
+        # URLs are only recorded in history then, or restored to queue if their records failed to be stored.
+        # Records are tracked per attempt (URL, attempt number), so acknowledgements of an earlier, failed
+        # attempt at a URL don't settle a retry of it
+        self.pipeline_flush_interval = pipeline_flush_interval
+        self.n_attempts = 0
+        self.pending_writes: dict[tuple[str, int], int] = dict()
+        self.failed_writes: set[tuple[str, int]] = set()
+        # Run once all records of their attempt are stored
+        self.persisted_callbacks: dict[tuple[str, int], list[Callable[[], Any]]] = (
+            dict()
+        )
+        self.write_acks: SimpleQueue[
+            tuple[tuple[str, int] | None, Callable[[], Any] | None, bool]
+        ] = SimpleQueue()
+        self.unflushed: list[Callable[[bool], Any]] = []
+        self.last_flush = time.monotonic()
+        self.path_format: dict[str, str] = dict()
         self.set_crawler_dir(crawler_dir=crawler_dir, data_pipeline=data_pipeline)
-        self.progress = Progress(dir=join(crawler_dir, "progress"))
+        self.progress = Progress(
+            dir=join(crawler_dir, "progress"), history_backend=history_backend
+        )
         self.progress.load()
         self.user = user
         self.secret_file = secrets_file
@@ -63,14 +120,45 @@ class BaseCrawler:
 
         self.headless = headless
         self.sleep_weibull_lambda = sleep_weibull_lambda
+        self.pacing = PacingController(
+            budgets={
+                "url": sleep_weibull_lambda,
+                "scroll": scroll_sleep_lambda or sleep_weibull_lambda,
+                "error": error_sleep_lambda or sleep_weibull_lambda,
+            }
+        )
+        self.implicit_wait = implicit_wait
         self.max_loading_wait = max_loading_wait
         self.max_error_trials = max_error_trials
+        self.err_trial = 0
+        self.start_urls: list[str] = []
 
         self.chromedriver_path = chromedriver_path
         self.driver_service = Service(chromedriver_path)
         self.driver_options = webdriver.ChromeOptions()
 
+        # Browser session
+        ## Attach to an already running Chrome (started with --remote-debugging-port), left open at exit
+        self.debugger_address = debugger_address
+        ## Navigate parsing URLs in the main tab instead of a new tab each
+        self.reuse_tab = reuse_tab
+        self.user_data_dir: str | None = None
+        ## Requests not needed for crawling (media, fonts, tracking...), blocked in every tab.
+        ## Opt-in when attached, as blocking would also break pages in the user's own tabs
+        if blocked_resources is None:
+            blocked_resources = (
+                self.BLOCKED_RESOURCES if debugger_address is None else "none"
+            )
+        self.resource_blocker = ResourceBlocker(blocked_resources)
+
         # Options
+        if debugger_address is not None:
+            # Launch options don't apply to a running browser
+            self.driver_options.debugger_address = debugger_address
+            return
+        ## Keep cookies and cache across runs in a Chrome profile per user
+        if user_data_dir is not None:
+            self.set_user_data_dir(join(user_data_dir, user))
         ## Disable image loading
         self.driver_options.add_argument("--blink-settings=imagesEnabled=false")
         ## Disable notifications
@@ -80,6 +168,23 @@ class BaseCrawler:
             self.driver_options.add_argument("--headless")
         else:
             self.driver_options.add_experimental_option("detach", True)
+        ## Trim background work and renderer memory
+        if low_memory:
+            for argument in LOW_MEMORY_ARGUMENTS:
+                self.driver_options.add_argument(argument)
+
+    @property
+    def persistent_session(self) -> bool:
+        """Whether the browser may already hold a logged in session of its own"""
+        return self.debugger_address is not None or self.user_data_dir is not None
+
+    def set_user_data_dir(self, user_data_dir: str):
+        # Chrome locks a profile, so concurrent browsers need one each
+        self.user_data_dir = user_data_dir
+        for argument in list(self.driver_options.arguments):
+            if argument.startswith("--user-data-dir="):
+                self.driver_options.arguments.remove(argument)
+        self.driver_options.add_argument(f"--user-data-dir={user_data_dir}")
 
     def on_start(self):
         # raise NotImplementedError("Crawler's on_start method is not implemented")
@@ -93,50 +198,177 @@ class BaseCrawler:
         # raise NotImplementedError("Crawler's on_parse_error method is not implemented")
         pass
 
-    def parse(self) -> dict[str, Any | Sequence[Any]] | list[dict[str, Any]]:
+    def get_start_urls(self) -> list[str]:
+        raise NotImplementedError("Crawler's get_start_urls method is not implemented")
+
+    def parse(
+        self,
+    ) -> (
+        dict[str, Any | Sequence[Any]]
+        | list[dict[str, Any]]
+        | Iterator[list[dict[str, Any]]]
+    ):
         raise NotImplementedError("Crawler's parse method is not implemented")
 
     def new_tab(self, url: str):
         self.chrome.switch_to.new_window("tab")
+        self.resource_blocker.apply(self.chrome)
         self.chrome.get(url)
         self.logger.info(f"Opened new tab to {grey(url)}")
 
     def close_all_new_tabs(self):
         for handle in self.chrome.window_handles:
-            if handle == self.main_tab:
+            # Tabs open before the crawler attached belong to the user
+            if handle == self.main_tab or handle in self.initial_tabs:
                 continue
             self.chrome.switch_to.window(handle)
             self.chrome.close()
         self.chrome.switch_to.window(self.main_tab)
 
     def set_pipeline_path_format(self, **format_kwargs):
-        for step in self.data_pipeline.steps:
-            step.set_path_format(**format_kwargs)
+        self.path_format.update(format_kwargs)
+        # A shared writer applies each crawler's path format itself
+        if self.pipeline_writer is None:
+            self.data_pipeline.set_path_format(**format_kwargs)
+
+    def write_data(
+        self,
+        data: Any,
+        url: str | None = None,
+        on_persisted: Callable[[], Any] | None = None,
+    ):
+        if isinstance(data, list):
+            self.metrics.inc("records", len(data))
+        elif isinstance(data, dict) and len(data) > 0:
+            n_records = next(iter(data.values()))
+            self.metrics.inc(
+                "records", len(n_records) if isinstance(n_records, Sequence) else 1
+            )
+
+        attempt = (url, self.n_attempts) if url is not None else None
+        if attempt is not None:
+            self.pending_writes[attempt] = self.pending_writes.get(attempt, 0) + 1
+        # Called from the writer's thread, acknowledgements are handled in `collect_write_acks`
+        on_done = lambda persisted: self.write_acks.put(
+            (attempt, on_persisted, persisted)
+        )
+        if self.pipeline_writer is not None:
+            self.pipeline_writer(data, on_done=on_done, **self.path_format)
+            return
+        try:
+            self.data_pipeline(data)
+        except Exception:
+            on_done(False)
+            raise
+        self.unflushed.append(on_done)
+
+    def flush_pipeline(self):
+        """Flush own pipeline when run inline, acknowledging records written since last flush"""
+        callbacks, self.unflushed = self.unflushed, []
+        self.last_flush = time.monotonic()
+        try:
+            self.data_pipeline.flush()
+            persisted = True
+        except Exception:
+            exc_type, value, _ = sys.exc_info()
+            self.logger.error(
+                f"Failed to flush pipeline: \n{red(exc_type.__name__)}: {value}\n{format_exc()}"
+            )
+            persisted = False
+        for callback in callbacks:
+            callback(persisted)
+
+    def collect_write_acks(self):
+        """
+        Record URLs whose records of an attempt are all stored in history and run their `on_persisted` callbacks,
+        restore URLs with failed records to queue, unless another attempt at them completed or is still in flight
+        """
+        while True:
+            try:
+                attempt, on_persisted, persisted = self.write_acks.get_nowait()
+            except Empty:
+                break
+            if attempt is None:
+                if persisted and on_persisted is not None:
+                    on_persisted()
+                continue
+            if on_persisted is not None:
+                self.persisted_callbacks.setdefault(attempt, []).append(on_persisted)
+            if not persisted:
+                self.failed_writes.add(attempt)
+            self.pending_writes[attempt] -= 1
+            if self.pending_writes[attempt] > 0:
+                continue
+            del self.pending_writes[attempt]
+            callbacks = self.persisted_callbacks.pop(attempt, [])
+            url, _ = attempt
+            if attempt in self.failed_writes:
+                self.failed_writes.remove(attempt)
+                if self.progress.propagated(url) or any(
+                    pending_url == url for pending_url, _ in self.pending_writes
+                ):
+                    continue
+                self.logger.warning(
+                    f"Restore {grey(url)} to queue as its records failed to be stored"
+                )
+                self.progress.selectively_enqueue(url, side="left", ignore="history")
+            else:
+                self.progress.add_history(url)
+                for callback in callbacks:
+                    callback()
 
     def set_crawler_dir(self, crawler_dir: str, data_pipeline: Pipeline):
         self.crawler_dir = crawler_dir
         self.data_pipeline = data_pipeline
+        self.metrics.export_dir = crawler_dir
+        self.data_pipeline.set_metrics(self.metrics)
         self.set_pipeline_path_format(crawler_dir=crawler_dir)
 
-    def sleep(self):
-        sleep_second = weibull_min.rvs(10, loc=0, scale=self.sleep_weibull_lambda)
-        time.sleep(sleep_second)
+    def sleep(
+        self, phase: Literal["url", "scroll", "error"] = "url", elapsed: float = 0.0
+    ):
+        # Time already spent waiting for content counts toward the dwell
+        slept = self.pacing.dwell(phase, elapsed=elapsed)
+        self.metrics.observe("sleep", slept, phase=phase)
 
     def wait_DOM(self):
-        self.chrome.implicitly_wait(self.max_loading_wait)
+        WebDriverWait(self.chrome, self.max_loading_wait).until(
+            lambda driver: driver.execute_script("return document.readyState")
+            == "complete"
+        )
+        # Short implicit wait, so lookups of absent elements don't stall for the whole loading budget
+        self.chrome.implicitly_wait(self.implicit_wait)
 
     def start_driver(self):
-        self.chrome = webdriver.Chrome(
-            service=self.driver_service, options=self.driver_options
-        )
+        with self.metrics.time("driver_start"):
+            self.chrome = webdriver.Chrome(
+                service=self.driver_service, options=self.driver_options
+            )
+        self.metrics.instrument_driver(self.chrome)
+        if self.driver_profiler is not None:
+            self.driver_profiler.attach(self.chrome)
         self.main_tab = self.chrome.current_window_handle
-        self.logger.info(f"Driver started")
+        self.initial_tabs = set(self.chrome.window_handles)
+        self.resource_blocker.apply(self.chrome)
+        if self.debugger_address is not None:
+            self.logger.info(f"Driver attached to browser at {self.debugger_address}")
+        else:
+            self.logger.info(f"Driver started")
 
     def save_cookies(self):
         self.cookies.save(self.chrome.get_cookies())
 
+    def open_facebook(self):
+        # An attached or restored browser may already be on Facebook
+        hostname = urlparse(self.chrome.current_url).hostname
+        domain_name = (
+            ".".join(hostname.split(".")[-2:]) if hostname is not None else None
+        )
+        if domain_name != "facebook.com":
+            self.chrome.get("https://www.facebook.com")
+
     def load_cookies(self):
-        self.chrome.get("https://www.facebook.com")
+        self.open_facebook()
         for cookie in self.cookies.load():
             self.chrome.add_cookie(cookie)
 
@@ -148,17 +380,18 @@ class BaseCrawler:
 
     def ensure_logged_in(self):
         self.logger.info("Ensuring user logging in")
+        # Sessions kept by the browser's profile are reused, without injecting cookies
+        if self.persistent_session:
+            self.open_facebook()
+            if is_logged_in(self.chrome):
+                self.logger.info("User is already logged in inside browser")
+                return
         if self.cookies.exists():
             self.logger.info("Found user's credentials cached as cookies")
             self.load_cookies()
             return
 
-        url = urlparse(self.chrome.current_url)
-        domain_name = (
-            ".".join(url.hostname.split(".")[-2:]) if url.hostname is not None else None
-        )
-        if domain_name != "https://facebook.com":
-            self.chrome.get("https://www.facebook.com")
+        self.open_facebook()
         if is_logged_in(self.chrome):
             self.logger.info("User is already logged in inside browser")
             return
@@ -173,11 +406,12 @@ class BaseCrawler:
         )
 
     def extract_urls_from_current_page(self):
-        url = self.chrome.current_url
+        url = canonicalize_url(self.chrome.current_url)
         html = self.chrome.page_source
 
-        new_nav_urls = self.navigate_link_extractor.extract(html)
-        new_parse_urls = self.parse_link_extractor.extract(html)
+        new_nav_urls, new_parse_urls = extract_links(
+            html, self.navigate_link_extractor, self.parse_link_extractor
+        )
         try:
             new_nav_urls.remove(url)
         except:
@@ -195,83 +429,175 @@ class BaseCrawler:
         )
         self.progress.selectively_enqueue_list(new_parse_urls)
 
-    def start(self, start_url: str):
+    def setup(self):
+        # Without a shared writer, persist data from a background thread of own
+        if self.async_pipeline and self.pipeline_writer is None:
+            self.pipeline_writer = PipelineWriter(
+                self.data_pipeline, flush_interval=self.pipeline_flush_interval
+            )
+            self.owns_pipeline_writer = True
+
         self.start_driver()
         self.on_start()
 
-        self.ensure_logged_in()
-        self.save_cookies()
+        with self.metrics.time("login"):
+            self.ensure_logged_in()
+            self.save_cookies()
         self.logger.info("Saved/Refreshed cookies")
 
-        if len(self.progress.queue) == 0 or self.progress.queue[0] != start_url:
-            self.progress.selectively_enqueue(start_url, side="left", ignore="history")
-        err_trial = 0
-
-        while (
-            self.progress.count_remaining() > 0 and err_trial <= self.max_error_trials
-        ):
-            try:
-                exc_type = None
-                url = self.progress.next_url()
+    def teardown(self):
+        try:
+            self.on_exit()
+        finally:
+            # Shared writers are flushed by their owner once all producers are done
+            if self.owns_pipeline_writer:
+                self.logger.info("Flushing pipeline writer...")
+                self.pipeline_writer.close()
+                self.pipeline_writer = None
+                self.owns_pipeline_writer = False
+            elif self.pipeline_writer is None:
+                self.flush_pipeline()
+            self.collect_write_acks()
+            # Shared metrics and profiler are reported by their owner
+            if self.owns_metrics:
+                self.report_metrics()
+            # Only the driver of an attached browser is stopped, the browser is left running
+            if self.debugger_address is not None:
+                self.driver_service.stop()
+            else:
+                self.chrome.quit()
+
+    def report_metrics(self):
+        self.metrics.export()
+        self.logger.info(f"Crawl summary:\n{self.metrics.summary()}")
+        if self.driver_profiler is not None:
+            self.driver_profiler.save(join(self.crawler_dir, "driver_profile.json"))
+            self.logger.info(
+                f"WebDriver commands by call site:\n{self.driver_profiler.report()}"
+            )
 
-                # If URL is for navigation
-                if self.navigate_link_extractor.match(url) or url == start_url:
-                    self._handle_navigation_url(url)
-                # If URL is for parsing
-                if self.parse_link_extractor.match(url):
-                    self._handle_parse_url(url)
+    def seed_frontier(self, start_urls: list[str]):
+        self.start_urls = start_urls
+        for start_url in reversed(start_urls):
+            if len(self.progress.queue) == 0 or self.progress.queue[0] != start_url:
+                self.progress.selectively_enqueue(
+                    start_url, side="left", ignore="history"
+                )
 
+    def crawl_url(self, url: str) -> type[BaseException] | None:
+        """Handle one URL, restoring it to queue upon error. Returns type of the raised exception, if any"""
+        self.collect_write_acks()
+        self.n_attempts += 1
+        attempt = (url, self.n_attempts)
+        # Time spent loading the URL's pages, counting toward the dwell after it
+        self.load_seconds = 0.0
+        try:
+            # If URL is for navigation
+            if self.navigate_link_extractor.match(url) or url in self.start_urls:
+                self._handle_navigation_url(url)
+            # If URL is for parsing
+            if self.parse_link_extractor.match(url):
+                self._handle_parse_url(url)
+
+            # URLs with records in flight are recorded once these are stored
+            if attempt not in self.pending_writes:
                 self.progress.add_history(url)
-                err_trial = 0
-                self.sleep()
-            except:
-                err_trial += 1
-                # Logging out error
-                exc_type, value, tb = sys.exc_info()
-                self.logger.error(
-                    f"Restore {grey(url)} to queue due to error: \n{red(exc_type.__name__)}: {value}\n{format_exc()}"
+            if (
+                self.pipeline_writer is None
+                and time.monotonic() - self.last_flush >= self.pipeline_flush_interval
+            ):
+                self.flush_pipeline()
+                self.collect_write_acks()
+            self.err_trial = 0
+            self.metrics.inc("urls", status="ok")
+            self.metrics.maybe_export()
+            self.sleep(elapsed=self.load_seconds)
+            return None
+        except:
+            self.err_trial += 1
+            # Logging out error
+            exc_type, value, tb = sys.exc_info()
+            self.logger.error(
+                f"Restore {grey(url)} to queue due to error: \n{red(exc_type.__name__)}: {value}\n{format_exc()}"
+            )
+            # If this url hasn't been crawled successfully
+            if not self.progress.propagated(url):
+                # Re-append URL to queue
+                self.progress.enqueue(url, "left")
+            # Records already handed over don't complete the URL either
+            if attempt in self.pending_writes:
+                self.failed_writes.add(attempt)
+
+            self.metrics.inc("urls", status="error")
+            self.on_parse_error()
+            self.close_all_new_tabs()
+            # If error due to no abstract method implementation, stop retrying
+            if exc_type in BaseCrawler.CRITICAL_EXCEPTIONS:
+                return exc_type
+            if self.err_trial <= self.max_error_trials:
+                self.logger.warning(
+                    f"Attempting {bold(ordinal(self.err_trial))} retrial..."
                 )
-                # If this url hasn't been crawled successfully
-                if not self.progress.propagated(url):
-                    # Re-append URL to queue
-                    self.progress.enqueue(url, "left")
-
-                self.on_parse_error()
-                self.close_all_new_tabs()
-                # If error due to no abstract method implementation, stop retrying
-                if exc_type in BaseCrawler.CRITICAL_EXCEPTIONS:
-                    break
-                if err_trial <= err_trial:
-                    self.logger.warning(
-                        f"Attempting {bold(ordinal(err_trial))} retrial..."
-                    )
-                self.sleep()
+            self.sleep("error")
+            return exc_type
+
+    def start(self, start_url: str | list[str] | None = None):
+        if start_url is None:
+            start_url = self.get_start_urls()
+        start_urls = [start_url] if isinstance(start_url, str) else list(start_url)
+
+        self.setup()
+        self.seed_frontier(start_urls)
+
+        exc_type = None
+        while (
+            self.progress.count_remaining() > 0
+            and self.err_trial <= self.max_error_trials
+        ):
+            url = self.progress.next_url()
+            exc_type = self.crawl_url(url)
+            if exc_type in BaseCrawler.CRITICAL_EXCEPTIONS:
+                break
 
         if exc_type is not None:
             self.logger.error(f"Closing driver due to an error occured...")
-        elif err_trial > self.max_error_trials:
+        elif self.err_trial > self.max_error_trials:
             self.logger.error(
                 "Maximum number of trials upon errors exceeded, exitting..."
             )
         elif self.progress.count_remaining() == 0:
             self.logger.info("Closing driver due to no URL left in queue...")
+        # Progress is saved once in-flight records are stored, and their URLs recorded
+        self.teardown()
         self.save_progress()
-        self.on_exit()
-        self.chrome.quit()
 
     def _handle_navigation_url(self, url: str):
         self.logger.info(f"Matched as URL for {bold('navigation')}: {grey(url)}")
-        self.chrome.get(url)
-        self.wait_DOM()
+        start = time.perf_counter()
+        with self.metrics.time("page_load", kind="navigation"):
+            self.chrome.get(url)
+            self.wait_DOM()
+        self.load_seconds += time.perf_counter() - start
 
         self.extract_urls_from_current_page()
 
     def _handle_parse_url(self, url: str):
         self.logger.info(f"Matched as URL for {bold('parsing')}: {grey(url)}")
-        self.new_tab(url)
-        self.wait_DOM()
+        start = time.perf_counter()
+        with self.metrics.time("page_load", kind="parsing"):
+            if self.reuse_tab:
+                self.chrome.get(url)
+            else:
+                self.new_tab(url)
+            self.wait_DOM()
+        self.load_seconds += time.perf_counter() - start
 
         data = self.parse()
-        self.data_pipeline(data)
+        # Streaming crawlers yield batches of records as they are parsed
+        if isinstance(data, Iterator):
+            for batch in data:
+                self.write_data(batch, url=url)
+        else:
+            self.write_data(data, url=url)
 
         self.close_all_new_tabs()
@@ -1,19 +1,46 @@
-from typing import Any, Sequence
+from typing import Any, Callable, Sequence, Iterator
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver import Chrome
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver import Keys, ActionChains
+from selenium.common.exceptions import TimeoutException
 
 import re
 import bs4
+import time
 from ..base_crawler import BaseCrawler
-from EC import more_posts_loaded
-from utils.parsing import parse_post_date, parse_text_from_element
+from .snapshot import FeedSnapshot, build_post_record, parse_post_link
+from .selectors import SELECTORS
+from .network import NetworkCapture, parse_payloads
+from .scripts import (
+    EXTRACT_POSTS_JS,
+    CLICK_ALL_JS,
+    COUNT_XPATH_JS,
+    MARK_PARSED_JS,
+    PRUNE_PARSED_POSTS_JS,
+    POST_HREFS_JS,
+    LAST_POST_DATE_HINTS_JS,
+    REACTION_SUMMARY_JS,
+)
+from utils.parsing import (
+    parse_post_date,
+    parse_post_date_hint,
+    parse_text_from_element,
+    parse_post_content,
+    parse_interaction_counts,
+    parse_count,
+    parse_reaction_labels,
+    hashtag_regex,
+)
 from utils.utils import to_bs4
+from utils.watermarks import Watermarks
+from utils.colors import bold
 
 from html import unescape
+from os.path import join
+from urllib.parse import urlparse
 from datetime import datetime
 from typing import Literal
 from psutil import virtual_memory
@@ -21,11 +48,13 @@ from tqdm import tqdm
 
 
 class Crawler(BaseCrawler):
-    posts_xpath = "(//div[@class='x9f619 x1n2onr6 x1ja2u2z xeuugli xs83m0k xjl7jj x1xmf6yo x1emribx x1e56ztr x1i64zmx x19h7ccj xu9j1y6 x7ep2pv']/div)[last()]/div/div[@class='x1yztbdb x1n2onr6 xh8yej3 x1ja2u2z']"
-    content_on_hover_xpath = (
-        "(//div[@class='x78zum5 xdt5ytf x1n2onr6 xat3117 xxzkxad']/div)[2]/div"
-    )
-    hashtag_regex = re.compile(r"#[^\s,]+")
+    posts_xpath = str(SELECTORS.posts)
+    content_on_hover_xpath = str(SELECTORS.hover_content)
+    unparsed_posts_xpath = str(SELECTORS.unparsed_posts)
+    show_more_xpath = str(SELECTORS.show_more)
+    hashtag_regex = hashtag_regex
+    # Posts are read from the DOM or GraphQL responses, never from the media they show
+    BLOCKED_RESOURCES = "feed"
     emoji_src_map = {
         "An-HX414PnqCVzyEq9OFFdayyrdj8c3jnyPbPcierija6hpzsUvw-1VPQ260B2M9EbxgmP7pYlNQSjYAXF782_vnvvpDLxvJQD74bwdWEJ0DhcErkDga6gazZZUYm_Q.png": "like",
         "An8VnwvdkGMXIQcr4C62IqyP-g1O5--yQu9PnL-k4yvIbj8yTSE32ea4ORp0OwFNGEWJbb86MHBaLY-SMvUKdUYJnNFcexEoUGoVzcVd50SaAIzBE-K5dxR8Y-MJn5E.png": "love",
@@ -39,11 +68,32 @@ class Crawler(BaseCrawler):
     class PostCollectCriterion:
         def __init__(
             self,
-            criterion: Literal["elapsed_minutes", "n_posts", "post_time"],
-            threshold: float | int | datetime,
+            criterion: Literal[
+                "elapsed_minutes", "n_posts", "post_time", "since_last_crawl"
+            ],
+            threshold: float | int | datetime | None,
+            watermarks: Watermarks | None = None,
+            max_skipped_hovers: int = 5,
         ) -> None:
+            # "since_last_crawl" stops at posts stored by the previous crawl of the page,
+            # with threshold as post date to stop at for pages never crawled before
             self.criterion = criterion
             self.threshold = threshold
+            self.watermarks = watermarks
+            self.page_id = None
+            self.known_links: set[str] = set()
+            self.watermark_date: datetime | None = None
+            # Post dates are only hovered when they can't be read from DOM and extrapolation says threshold is near,
+            # yet at least once every `max_skipped_hovers` scrolls
+            self.max_skipped_hovers = max_skipped_hovers
+            self.reset()
+
+        def set_page_id(self, page_id: str):
+            self.page_id = page_id
+            if self.criterion == "since_last_crawl":
+                self.known_links, self.watermark_date = self.watermarks.get(page_id)
+                if self.watermark_date is None:
+                    self.watermark_date = self.threshold
             self.reset()
 
         def reset(self):
@@ -54,32 +104,120 @@ class Crawler(BaseCrawler):
                 self.progress = 0
             elif self.criterion == "post_time":
                 self.progress = datetime.now()
-
-        def update_progress(self, driver: Chrome):
+            elif self.criterion == "since_last_crawl":
+                self.progress = datetime.now()
+                self.reached_known_post = False
+            # Number of posts already removed from DOM when streaming
+            self.pruned_posts = 0
+            # (number of loaded posts, exact date of the last one) of the first and latest exact readings
+            self.date_samples: list[tuple[int, datetime]] = []
+            self.n_loaded = 0
+            self.n_skipped_hovers = 0
+
+        def update_progress(self, driver: Chrome, n_loaded: int | None = None):
+            """`n_loaded`: number of posts in DOM, when already counted by the caller"""
             if self.criterion == "elapsed_minutes":
                 self.progress = (datetime.now() - self.start).total_seconds() / 60
-            elif self.criterion == "n_posts":
-                self.progress = len(driver.find_elements(By.XPATH, Crawler.posts_xpath))
+                return
+
+            if n_loaded is None:
+                n_loaded = driver.execute_script(COUNT_XPATH_JS, Crawler.posts_xpath)
+            prev_n_loaded, self.n_loaded = self.n_loaded, self.pruned_posts + n_loaded
+            if self.criterion == "n_posts":
+                self.progress = self.n_loaded
             elif self.criterion == "post_time":
-                datetime_div = driver.find_element(
-                    By.XPATH, Crawler.content_on_hover_xpath
+                self.progress = self.last_post_date(
+                    driver, self.threshold, self.n_loaded - prev_n_loaded
                 )
-                last_post_datetime_a = driver.find_element(
-                    By.XPATH,
-                    f"(({Crawler.posts_xpath})[last()]//h2/../../../../div)[2]//a",
+            elif self.criterion == "since_last_crawl":
+                # The first post may be pinned, thus old yet shown on top
+                post_hrefs = driver.execute_script(POST_HREFS_JS, Crawler.posts_xpath)
+                self.reached_known_post = any(
+                    self.is_known_post(href)
+                    for hrefs in post_hrefs[1:]
+                    for href in hrefs
                 )
-                ActionChains(driver).move_to_element(last_post_datetime_a).perform()
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            "(//div[@class='x78zum5 xdt5ytf x1n2onr6 xat3117 xxzkxad']/div)[2]/div/div",
-                        )
+                if not self.reached_known_post and self.watermark_date is not None:
+                    self.progress = self.last_post_date(
+                        driver, self.watermark_date, self.n_loaded - prev_n_loaded
                     )
+
+        def extrapolate_date(self) -> datetime | None:
+            # Assumes a steady posting rate between the first and latest exact readings
+            if len(self.date_samples) < 2:
+                return None
+            (first_n, first_date), (last_n, last_date) = self.date_samples
+            if last_n <= first_n:
+                return None
+            time_per_post = (first_date - last_date) / (last_n - first_n)
+            return last_date - time_per_post * (self.n_loaded - last_n)
+
+        def record_date(self, date: datetime):
+            sample = (self.n_loaded, date)
+            self.date_samples = (self.date_samples[:1] or [sample]) + [sample]
+            self.n_skipped_hovers = 0
+
+        def last_post_date(
+            self, driver: Chrome, threshold: datetime, n_new_posts: int
+        ) -> datetime:
+            hints = driver.execute_script(
+                LAST_POST_DATE_HINTS_JS,
+                Crawler.posts_xpath,
+                list(SELECTORS.post_datetime_anchor.xpaths),
+            )
+            earliest = None
+            for hint in hints:
+                date, exact = parse_post_date_hint(hint or "")
+                if date is not None and exact:
+                    self.record_date(date)
+                    return date
+                earliest = earliest or date
+            # Post is surely newer than threshold
+            if earliest is not None and earliest > threshold:
+                return earliest
+
+            # Far from threshold, measured in the span of posts a couple more scrolls load
+            estimate = self.extrapolate_date()
+            if estimate is not None and self.n_skipped_hovers < self.max_skipped_hovers:
+                (first_n, first_date), (last_n, last_date) = self.date_samples
+                time_per_post = (first_date - last_date) / (last_n - first_n)
+                if estimate - threshold > 2 * time_per_post * max(n_new_posts, 1):
+                    self.n_skipped_hovers += 1
+                    return estimate
+
+            date = self.hover_last_post_date(driver)
+            self.record_date(date)
+            return date
+
+        def is_known_post(self, href: str) -> bool:
+            # Links of posts not hovered yet may come without query string
+            return href.split("?")[0].rstrip("/") in self.known_links
+
+        def hover_last_post_date(self, driver: Chrome) -> datetime:
+            datetime_div = SELECTORS.hover_content.find_element(driver)
+            last_post_datetime_a = SELECTORS.post_datetime_anchor.find_element(
+                SELECTORS.last_post.find_element(driver)
+            )
+            ActionChains(driver).move_to_element(last_post_datetime_a).perform()
+            WebDriverWait(driver, 10).until(
+                lambda driver: len(SELECTORS.hover_content_loaded.find_elements(driver))
+                > 0
+            )
+            return parse_post_date(datetime_div.get_attribute("textContent"))
+
+        def filter_new_posts(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+            if self.criterion != "since_last_crawl":
+                return items
+            return [
+                item
+                for item in items
+                if item["Post_link"] not in self.known_links
+                and (
+                    self.watermark_date is None
+                    or item["Post_date"] is None
+                    or item["Post_date"] >= self.watermark_date
                 )
-                soup = to_bs4(datetime_div)
-                raw_datetime = soup.text
-                self.progress = parse_post_date(raw_datetime)
+            ]
 
         def condition_met(self):
             if self.criterion == "elapsed_minutes":
@@ -88,15 +226,27 @@ class Crawler(BaseCrawler):
                 return self.progress >= self.threshold
             elif self.criterion == "post_time":
                 return self.progress <= self.threshold
+            elif self.criterion == "since_last_crawl":
+                return self.reached_known_post or (
+                    self.watermark_date is not None
+                    and self.progress < self.watermark_date
+                )
 
     def __init__(
         self,
-        page_id: str,
-        post_collect_threshold: float | int | datetime,
+        page_id: str | list[str],
+        post_collect_threshold: float | int | datetime | None,
         post_collect_criterion: Literal[
-            "elapsed_minutes", "n_posts", "post_time"
+            "elapsed_minutes", "n_posts", "post_time", "since_last_crawl"
         ] = "n_posts",
         max_ram_percentage: float = 0.8,
+        extraction_mode: Literal[
+            "snapshot", "script", "selenium", "network"
+        ] = "snapshot",
+        stream: bool = False,
+        network_record_dir: str | None = None,
+        reaction_breakdown: Literal["never", "threshold", "always"] = "never",
+        reaction_breakdown_threshold: int = 100,
         *args,
         **kwargs,
     ):
@@ -105,15 +255,42 @@ class Crawler(BaseCrawler):
         self.post_collect_criteria = Crawler.PostCollectCriterion(
             criterion=post_collect_criterion,
             threshold=post_collect_threshold,
+            watermarks=Watermarks(
+                join(self.crawler_dir, "progress", "watermarks.json"),
+                fallback_csv_format=join(self.crawler_dir, "{page_id}", "data.csv"),
+            ),
         )
         self.max_ram_percentage = max_ram_percentage
-        self.page_id = page_id
-        self.set_pipeline_path_format(page_id=page_id)
+        self.extraction_mode = extraction_mode
+        if stream and extraction_mode == "selenium":
+            raise ValueError(
+                "Streaming requires 'snapshot', 'script' or 'network' extraction mode"
+            )
+        # "network" maps the feed's GraphQL responses to records instead of scraping the rendered posts
+        self.network_capture = None
+        if extraction_mode == "network":
+            NetworkCapture.enable_logging(self.driver_options)
+            self.network_capture = NetworkCapture(record_dir=network_record_dir)
+        self.stream = stream
+        # Reaction totals are always read from the post, per-reaction counts need opening a dialog per post
+        # unless all of them show up in the reaction bar's labels
+        assert reaction_breakdown in ["never", "threshold", "always"]
+        self.reaction_breakdown = reaction_breakdown
+        self.reaction_breakdown_threshold = reaction_breakdown_threshold
+        # New posts per page, recorded in watermarks once written through the pipeline
+        self.pending_watermarks: list[tuple[str, list[dict[str, Any]]]] = []
+        self.page_ids = [page_id] if isinstance(page_id, str) else list(page_id)
+        self.set_page_id(self.page_ids[0])
 
     def on_parse_error(self):
         self.post_collect_criteria.reset()
+        self.pending_watermarks = []
+
+    def parse(self) -> list[dict[str, Any]] | Iterator[list[dict[str, Any]]]:
+        if self.stream:
+            return self.parse_stream()
 
-    def parse(self) -> dict[str, Any | Sequence[Any]]:
+        n_loaded = self.wait_feed()
         with tqdm(
             total=round(virtual_memory().total / 1024**3, ndigits=2),
             desc="RAM Usage (GB)",
@@ -127,71 +304,313 @@ class Crawler(BaseCrawler):
                 bar.n = round(ram_usage.used / 1024**3, ndigits=2)
                 bar.refresh()
 
+                scroll_start = time.perf_counter()
                 self.chrome.execute_script(
                     "window.scrollTo(0, document.body.scrollHeight)"
                 )
-                WebDriverWait(self.chrome, self.max_loading_wait).until(
-                    more_posts_loaded(posts_locator=(By.XPATH, Crawler.posts_xpath))
+                try:
+                    n_loaded, elapsed = self.pacing.wait_for_items(
+                        self.chrome,
+                        Crawler.posts_xpath,
+                        min_count=n_loaded + 1,
+                        timeout=self.max_loading_wait,
+                    )
+                except TimeoutException:
+                    self.logger.info("No more posts loaded, stopping scroll")
+                    break
+                self.metrics.observe("scroll_wait", elapsed)
+                with self.metrics.time("stop_criterion"):
+                    self.post_collect_criteria.update_progress(
+                        self.chrome, n_loaded=n_loaded
+                    )
+                # Response bodies are only kept by the browser for a while
+                if self.network_capture is not None:
+                    self.network_capture.collect(self.chrome)
+                bar.set_postfix_str(f"# Loaded posts: {n_loaded}")
+                self.sleep("scroll", elapsed=time.perf_counter() - scroll_start)
+                self.metrics.maybe_export()
+
+        if met:
+            self.logger.info(
+                f"Post collect stopping criteria has met with threshold of {self.post_collect_criteria.threshold}"
+            )
+
+        self.remove_overlays()
+
+        parse_start = time.perf_counter()
+        if self.extraction_mode == "snapshot":
+            items = self.parse_snapshot()
+        elif self.extraction_mode == "script":
+            items = self.parse_script()
+        elif self.extraction_mode == "selenium":
+            items = self.parse_selenium()
+        elif self.extraction_mode == "network":
+            items = self.parse_network(html=self.chrome.page_source)
+        parse_elapsed = time.perf_counter() - parse_start
+        self.metrics.observe("parse", parse_elapsed, mode=self.extraction_mode)
+        self.logger.info(
+            f"Parsed {len(items)} posts in {parse_elapsed:.2f}s with {bold(self.extraction_mode)} extraction"
+        )
+
+        return self.keep_new_posts(items)
+
+    def parse_stream(self) -> Iterator[list[dict[str, Any]]]:
+        """Parse each newly loaded batch of posts while scrolling, then prune it from DOM"""
+        self.wait_feed()
+        self.remove_overlays()
+        n_parsed = 0
+        if self.network_capture is not None:
+            # First posts come embedded in the page rather than from responses
+            items = self.keep_new_posts(
+                self.parse_network(html=self.chrome.page_source)
+            )
+            self.mark_posts_parsed()
+            n_parsed += len(items)
+            yield items
+        with tqdm(
+            total=round(virtual_memory().total / 1024**3, ndigits=2),
+            desc="RAM Usage (GB)",
+        ) as bar:
+            while (
+                ram_usage := virtual_memory()
+            ).percent / 100 < self.max_ram_percentage and not (
+                met := self.post_collect_criteria.condition_met()
+            ):
+                bar.n = round(ram_usage.used / 1024**3, ndigits=2)
+                bar.refresh()
+
+                scroll_start = time.perf_counter()
+                self.chrome.execute_script(
+                    "window.scrollTo(0, document.body.scrollHeight)"
                 )
-                self.post_collect_criteria.update_progress(self.chrome)
-                bar.set_postfix_str(f"# Loaded posts: {len(self.get_loaded_posts())}")
-                self.sleep()
+                try:
+                    _, elapsed = self.pacing.wait_for_items(
+                        self.chrome,
+                        Crawler.unparsed_posts_xpath,
+                        min_count=1,
+                        timeout=self.max_loading_wait,
+                    )
+                except TimeoutException:
+                    self.logger.info("No more posts loaded, stopping scroll")
+                    break
+                self.metrics.observe("scroll_wait", elapsed)
+                with self.metrics.time("stop_criterion"):
+                    self.post_collect_criteria.update_progress(self.chrome)
+
+                items = self.parse_batch()
+                n_parsed += len(items)
+                yield items
+
+                self.post_collect_criteria.pruned_posts += self.prune_parsed_posts()
+                bar.set_postfix_str(f"# Parsed posts: {n_parsed}")
+                self.sleep("scroll", elapsed=time.perf_counter() - scroll_start)
+                self.metrics.maybe_export()
 
         if met:
             self.logger.info(
                 f"Post collect stopping criteria has met with threshold of {self.post_collect_criteria.threshold}"
             )
 
-        to_be_removed = self.chrome.find_element(
-            By.XPATH,
-            "(//div[@class='x9f619 x1n2onr6 x1ja2u2z x78zum5 xdt5ytf xeuugli x1r8uery x1iyjqo2 xs83m0k x1swvt13 x1pi30zi xqdwrps x16i7wwg x1y5dvz6'])[3]",
+        # Posts loaded before the loop when it never ran
+        items = self.parse_batch()
+        if len(items) > 0:
+            yield items
+
+    def wait_feed(self) -> int:
+        n_loaded, elapsed = self.pacing.wait_for_items(
+            self.chrome,
+            Crawler.posts_xpath,
+            min_count=1,
+            timeout=self.max_loading_wait,
+            phase="url",
         )
+        self.metrics.observe("feed_wait", elapsed)
+        return n_loaded
+
+    def parse_batch(self) -> list[dict[str, Any]]:
+        if (
+            self.chrome.execute_script(COUNT_XPATH_JS, Crawler.unparsed_posts_xpath)
+            == 0
+        ):
+            return []
+        with self.metrics.time("parse", mode=self.extraction_mode):
+            if self.extraction_mode == "snapshot":
+                items = self.parse_snapshot(posts_xpath=Crawler.unparsed_posts_xpath)
+            elif self.extraction_mode == "script":
+                items = self.parse_script(posts_xpath=Crawler.unparsed_posts_xpath)
+            elif self.extraction_mode == "network":
+                items = self.parse_network()
+                self.mark_posts_parsed()
+        return self.keep_new_posts(items)
+
+    def mark_posts_parsed(self):
+        self.chrome.execute_script(
+            MARK_PARSED_JS,
+            self.chrome.find_elements(By.XPATH, Crawler.unparsed_posts_xpath),
+        )
+
+    def keep_new_posts(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        new_items = self.post_collect_criteria.filter_new_posts(items)
+        if len(new_items) < len(items):
+            self.logger.info(
+                f"Skipped {len(items) - len(new_items)} posts stored by previous crawls"
+            )
+        if self.post_collect_criteria.criterion == "since_last_crawl":
+            self.pending_watermarks.append((self.page_id, new_items))
+        return new_items
+
+    def write_data(
+        self,
+        data: Any,
+        url: str | None = None,
+        on_persisted: Callable[[], Any] | None = None,
+    ):
+        # Watermarks advance only once the posts behind them are stored
+        updates, self.pending_watermarks = self.pending_watermarks, []
+        watermarks = self.post_collect_criteria.watermarks
+
+        def advance_watermarks():
+            for page_id, items in updates:
+                watermarks.update(page_id, items)
+            if on_persisted is not None:
+                on_persisted()
+
+        super().write_data(data, url=url, on_persisted=advance_watermarks)
+
+    def prune_parsed_posts(self) -> int:
+        # Keep the last parsed post as sentinel so the feed can still be scrolled
+        return self.chrome.execute_script(PRUNE_PARSED_POSTS_JS, Crawler.posts_xpath)
+
+    def remove_overlays(self):
+        to_be_removed = SELECTORS.sidebar.find_element(self.chrome)
         self.chrome.execute_script("arguments[0].remove();", to_be_removed)
 
-        to_be_removed = self.chrome.find_element(By.XPATH, "//div[@role='banner']")
+        to_be_removed = SELECTORS.banner.find_element(self.chrome)
         self.chrome.execute_script("arguments[0].remove();", to_be_removed)
 
-        post_divs = self.get_loaded_posts()
+    def parse_selenium(
+        self, post_divs: list[WebElement] | None = None
+    ) -> list[dict[str, Any]]:
+        if post_divs is None:
+            post_divs = self.get_loaded_posts()
         self.logger.info(f"Located {len(post_divs)} posts")
         items = []
         for i, post_div in tqdm(
             enumerate(post_divs, start=1), total=len(post_divs), desc="Parsing posts"
         ):
             ActionChains(self.chrome).move_to_element(post_div).pause(1).perform()
-            post = self.parse_post(i, post_div)
+            with self.metrics.time("parse_post"):
+                post = self.parse_post(i, post_div)
+            items.append(post)
+
+        return items
+
+    def parse_snapshot(self, posts_xpath: str = posts_xpath) -> list[dict[str, Any]]:
+        self.expand_posts_text(posts_xpath)
+        with self.metrics.time("parse_static_fields", mode="snapshot"):
+            snapshot = FeedSnapshot(
+                self.chrome.page_source,
+                posts_xpath=posts_xpath,
+                page_id=self.page_id,
+            )
+            items = snapshot.parse_posts()
+        post_divs = self.chrome.find_elements(By.XPATH, posts_xpath)
+        # Marked posts are left out of later batches when streaming
+        self.chrome.execute_script(MARK_PARSED_JS, post_divs)
+        # The feed changed between the snapshot and the lookup, so records can't be paired with posts
+        if len(items) != len(post_divs):
+            self.logger.warning(
+                f"Snapshot has {len(items)} posts but {len(post_divs)} are loaded, parsing them with Selenium"
+            )
+            return self.parse_selenium(post_divs)
+        self.logger.info(f"Located {len(post_divs)} posts")
+
+        for post, post_div in tqdm(
+            zip(items, post_divs), total=len(items), desc="Parsing posts"
+        ):
+            self.complete_post(post, post_div)
+
+        return items
+
+    def parse_script(self, posts_xpath: str = posts_xpath) -> list[dict[str, Any]]:
+        self.expand_posts_text(posts_xpath)
+        with self.metrics.time("parse_static_fields", mode="script"):
+            extracted = self.chrome.execute_script(
+                EXTRACT_POSTS_JS, posts_xpath, SELECTORS.as_js()
+            )
+        self.logger.info(f"Located {len(extracted)} posts")
+
+        items = []
+        for fields in tqdm(extracted, desc="Parsing posts"):
+            post_div = fields.pop("element")
+            post = build_post_record(
+                post_link=parse_post_link(
+                    fields.pop("post_link_href"), page_id=self.page_id
+                ),
+                **fields,
+            )
+            self.complete_post(post, post_div)
             items.append(post)
 
         return items
 
+    def parse_network(self, html: str | None = None) -> list[dict[str, Any]]:
+        self.network_capture.collect(self.chrome)
+        if html is not None and self.network_capture.record_dir is not None:
+            with open(
+                join(self.network_capture.record_dir, "page.html"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                f.write(html)
+        items = parse_payloads(self.network_capture.pop_bodies(), html=html)
+        self.logger.info(f"Mapped {len(items)} posts from network payloads")
+        return items
+
+    def complete_post(self, post: dict[str, Any], post_div: WebElement):
+        # Only date and reactions need live interaction with the post
+        ActionChains(self.chrome).move_to_element(post_div).pause(1).perform()
+        post_datetime_a = SELECTORS.post_datetime_anchor.find_element(post_div)
+        reaction_div = SELECTORS.reaction_bar.find_element(post_div)
+        with self.metrics.time("parse_field", field="Post_date"):
+            post["Post_date"] = parse_post_date(
+                self.hover_post_datetime(post_datetime_a)
+            )
+        if post["Post_link"] is None:
+            post["Post_link"] = self.parse_post_link(
+                post_datetime_a.get_attribute("href")
+            )
+        with self.metrics.time("parse_field", field="Reaction"):
+            post["Num_reactions"], post["Reaction"] = self.collect_reactions(
+                reaction_div
+            )
+
+    def expand_posts_text(self, posts_xpath: str = posts_xpath):
+        show_more_xpath = f"({posts_xpath}){Crawler.show_more_xpath[1:]}"
+        self.chrome.execute_script(CLICK_ALL_JS, show_more_xpath)
+        try:
+            WebDriverWait(self.chrome, 10).until(
+                lambda driver: driver.execute_script(COUNT_XPATH_JS, show_more_xpath)
+                == 0
+            )
+        except TimeoutException:
+            self.logger.warning("Some posts' text content could not be expanded")
+
     def get_loaded_posts(self):
         return self.chrome.find_elements(By.XPATH, Crawler.posts_xpath)
 
     def parse_post(self, i: int, post_div: WebElement):
-        hover_content_div = self.chrome.find_element(
-            By.XPATH, Crawler.content_on_hover_xpath
-        )
-
-        post_content_divs = self.chrome.find_elements(
-            By.XPATH,
-            f"(({Crawler.posts_xpath})[{i}]/descendant::div[@class='html-div xdj266r x11i5rnm xat24cr x1mh8g0r xexx8yu x4uap5 x18d9i69 xkhd6sd'])[2]/div",
-        )
+        # Lookups are relative to the post, only walking its subtree
+        post_content_divs = SELECTORS.post_content_divs.find_elements(post_div)
 
         # Profile
-        profile_div = post_content_divs[1].find_element(
-            By.XPATH,
-            f"({Crawler.posts_xpath})[{i}]/descendant::div[@data-ad-rendering-role='profile_name']",
-        )
-        owner_loc_anchors = profile_div.find_elements(
-            By.XPATH,
-            f"(({Crawler.posts_xpath})[{i}]//h2/../../../../div//a",
-        )
+        profile_div = SELECTORS.profile_name.find_element(post_div)
+        owner_loc_anchors = SELECTORS.owner_loc_anchors.find_elements(post_div)
 
         # Content
         content_div = post_content_divs[2]
-        num_content_modalities = len(content_div.find_elements(By.XPATH, "div"))
-        text_content_div = content_div.find_elements(
-            By.XPATH, "./descendant::div[@data-ad-comet-preview='message']"
-        )
+        num_content_modalities = len(SELECTORS.child_divs.find_elements(content_div))
+        text_content_div = SELECTORS.text_content.find_elements(content_div)
         text_content_div = text_content_div[0] if len(text_content_div) > 0 else None
         if (
             num_content_modalities == 2
@@ -199,131 +618,55 @@ class Crawler(BaseCrawler):
             or num_content_modalities == 1
             and text_content_div is None
         ):
-            visual_content_div = post_content_divs[2].find_element(
-                By.XPATH, "(./div)[last()]"
-            )
+            visual_content_div = SELECTORS.last_child_div.find_element(content_div)
         else:
             visual_content_div = None
 
         # User interaction
-        interaction_div = post_content_divs[3].find_element(
-            By.XPATH, "./descendant::div[@class='x1n2onr6']/div"
-        )
-        reaction_div = interaction_div.find_element(By.XPATH, "./div/div")
-        cmt_share_div = interaction_div.find_element(By.XPATH, "(./div)[last()]")
+        interaction_div = SELECTORS.interaction_div.find_element(post_content_divs[3])
+        reaction_div = SELECTORS.interaction_reaction_bar.find_element(interaction_div)
+        cmt_share_div = SELECTORS.last_child_div.find_element(interaction_div)
 
         num_comments, num_shares = 0, 0
         if len(to_bs4(cmt_share_div).find_all("div", {"role": "button"})) > 0:
-            for btn in cmt_share_div.find_elements(
-                By.XPATH, "./descendant::div[@role='button']"
-            ):
-                # ActionChains(self.chrome).move_to_element(btn).perform()
-                # WebDriverWait(self.chrome, 10).until(
-                #     EC.presence_of_element_located(
-                #         (
-                #             By.XPATH,
-                #             f"{Crawler.content_on_hover_xpath}/descendant::div[contains(@class, '__fb-light-mode')]/descendant::span[@dir='auto']",
-                #         )
-                #     )
-                # )
-                # _soup = to_bs4(hover_content_div).find("span", {"dir": "auto"})
-
-                # self.logger.info(_soup)
-                # users = _soup.find_all("span")
-                # has_others = (
-                #     re.match(r"^\d+ (bình luận|lượt chia sẻ)$", users[-1].text)
-                #     if len(users) > 0
-                #     else False
-                # )
-                # count = len(users) + int(
-                #     re.search(r"\d+", users[-1].text).group(0) if has_others else 0
-                # )
-                # btn_text = re.sub(r"\d+", "", btn.text).strip()
-                btn_text_match = re.search(r"^(\d+) (.+)$", btn.text)
-                count, btn_text = btn_text_match.group(1), btn_text_match.group(2)
-                if btn_text == "bình luận":
-                    num_comments = count
-                elif btn_text == "lượt chia sẻ":
-                    num_shares = count
+            num_comments, num_shares = parse_interaction_counts(
+                [btn.text for btn in SELECTORS.buttons.find_elements(cmt_share_div)]
+            )
 
         # Ensure date element appears
-        post_datetime_a = profile_div.find_element(By.XPATH, "(../../../div)[2]//a")
-        ActionChains(self.chrome).move_to_element(post_datetime_a).pause(0.3).perform()
-        WebDriverWait(self.chrome, 10).until(
-            EC.presence_of_element_located(
-                (
-                    By.XPATH,
-                    f"{Crawler.content_on_hover_xpath}/descendant::div[contains(@class, '__fb-light-mode')]",
-                )
-            )
-        )
-        datetime_soup = to_bs4(hover_content_div)
-        raw_datetime = datetime_soup.text
+        post_datetime_a = SELECTORS.datetime_anchor.find_element(profile_div)
+        raw_datetime = self.hover_post_datetime(post_datetime_a)
 
         # Ensure post's text content showing full version
         if (
             to_bs4(content_div).find("div", attrs={"role": "button"}, string="Xem thêm")
             is not None
         ):
-            show_more_btn = content_div.find_element(
-                By.XPATH, "./descendant::div[@role='button' and text()='Xem thêm']"
-            )
+            show_more_btn = SELECTORS.show_more.find_element(content_div)
             ActionChains(self.chrome, 10).move_to_element(show_more_btn).click(
                 show_more_btn
             ).pause(0.5).move_to_element(post_div).perform()
 
         # Gather reaction information
-        ActionChains(self.chrome).click(reaction_div).pause(2).perform()
-        # WebDriverWait(self.chrome, 10).until(
-        #     EC.visibility_of_element_located((By.XPATH, "//div[@role='dialog']"))
-        # )
-        reaction_modal = self.chrome.find_element(By.XPATH, "//div[@role='dialog']")
-        reaction_counts = reaction_modal.find_elements(
-            By.XPATH,
-            "./descendant::div[@class='x1swvt13 x1pi30zi']/descendant::div[@class='x6ikm8r x10wlt62 xlshs6z']/div",
-        )
-        modal_close = reaction_modal.find_element(
-            By.XPATH, "./descendant::div[@class='x1d52u69 xktsk01']/div"
-        )
-        reaction = ""
-        for _reaction in reaction_counts:
-            if (
-                text := to_bs4(_reaction.find_element(By.XPATH, ".//span")).text
-            ) == "Tất cả":
-                continue
-            icon_src = _reaction.find_element(By.XPATH, ".//img").get_attribute("src")
-            icon_src = re.search(r"/t6/([^\.]+\.png)\?", icon_src).group(1)
-            count = text
-            reaction += f"{Crawler.emoji_src_map[icon_src]} ({count});"
-        reaction = reaction.strip(";")
-        modal_close.click()
+        num_reactions, reaction = self.collect_reactions(reaction_div)
 
-        post_link = (
-            re.search(
-                rf"^https://www\.facebook\.com/{self.page_id}/[^/]+/[^\?\s]+\?",
-                post_datetime_a.get_attribute("href"),
-            )
-            .group(0)
-            .strip("/?")
-        )
+        post_link = self.parse_post_link(post_datetime_a.get_attribute("href"))
         post_date = parse_post_date(raw_datetime)
         owner = owner_loc_anchors[2].text
         location = (
             owner_loc_anchors[3].text
-            if owner_loc_anchors[3]
-            .find_element(By.XPATH, "span")
-            .get_attribute("class")
+            if SELECTORS.first_span.find_element(owner_loc_anchors[3]).get_attribute(
+                "class"
+            )
             == "xt0psk2"
             else None
         )
-        content = (
+        raw_content = (
             parse_text_from_element(text_content_div)
             if text_content_div is not None
             else ""
         )
-        hashtag = " ".join(Crawler.hashtag_regex.findall(content))
-        content = Crawler.hashtag_regex.sub("", content)
-        content = unescape(re.sub(r"href\(, [^\)]+\)", "", content).strip())
+        content, hashtag = parse_post_content(raw_content)
         visual_soup = (
             to_bs4(visual_content_div) if visual_content_div is not None else None
         )
@@ -349,10 +692,84 @@ class Crawler(BaseCrawler):
             "Is_Post_Image": is_post_image,
             "Is_Post_Video": is_post_video,
             "Reaction": reaction,
+            "Num_reactions": num_reactions,
             "Num_comments": num_comments,
             "Num_share": num_shares,
             "Crawl_time": datetime.now(),
         }
 
-    def start(self):
-        super().start(start_url=f"https://www.facebook.com/{self.page_id}")
+    def parse_post_link(self, href: str):
+        return parse_post_link(href, page_id=self.page_id)
+
+    def hover_post_datetime(self, post_datetime_a: WebElement) -> str:
+        hover_content_div = SELECTORS.hover_content.find_element(self.chrome)
+        ActionChains(self.chrome).move_to_element(post_datetime_a).pause(0.3).perform()
+        WebDriverWait(self.chrome, 10).until(
+            lambda driver: len(SELECTORS.hover_tooltip.find_elements(driver)) > 0
+        )
+        return to_bs4(hover_content_div).text
+
+    def collect_reactions(
+        self, reaction_div: WebElement
+    ) -> tuple[int | None, str | None]:
+        """Total number of reactions and, if requested, the per-reaction breakdown"""
+        summary = self.chrome.execute_script(REACTION_SUMMARY_JS, reaction_div)
+        labelled_counts = parse_reaction_labels(summary["labels"])
+        num_reactions = parse_count(summary["text"])
+        if num_reactions is None and len(labelled_counts) > 0:
+            num_reactions = sum(labelled_counts.values())
+
+        if self.reaction_breakdown == "never" or num_reactions in [None, 0]:
+            return num_reactions, None
+        # Labels account for all reactions, no need for the dialog
+        if sum(labelled_counts.values()) == num_reactions:
+            return num_reactions, ";".join(
+                f"{name} ({count})" for name, count in labelled_counts.items()
+            )
+        if (
+            self.reaction_breakdown == "threshold"
+            and num_reactions < self.reaction_breakdown_threshold
+        ):
+            return num_reactions, None
+        return num_reactions, self.open_reaction_dialog(reaction_div)
+
+    def open_reaction_dialog(self, reaction_div: WebElement) -> str:
+        ActionChains(self.chrome).click(reaction_div).perform()
+        reaction_modal = WebDriverWait(self.chrome, 10).until(
+            EC.visibility_of_element_located((By.XPATH, str(SELECTORS.reaction_dialog)))
+        )
+        reaction_counts = WebDriverWait(self.chrome, 10).until(
+            lambda driver: SELECTORS.dialog_reaction_tabs.find_elements(reaction_modal)
+        )
+        modal_close = SELECTORS.dialog_close.find_element(reaction_modal)
+        reaction = ""
+        for _reaction in reaction_counts:
+            if (
+                text := SELECTORS.tab_label.find_element(_reaction).get_attribute(
+                    "textContent"
+                )
+            ) == "Tất cả":
+                continue
+            icon_src = SELECTORS.img.find_element(_reaction).get_attribute("src")
+            icon_src = re.search(r"/t6/([^\.]+\.png)\?", icon_src).group(1)
+            count = text
+            reaction += f"{Crawler.emoji_src_map[icon_src]} ({count});"
+        reaction = reaction.strip(";")
+        modal_close.click()
+        WebDriverWait(self.chrome, 10).until(EC.staleness_of(reaction_modal))
+        return reaction
+
+    def set_page_id(self, page_id: str):
+        self.page_id = page_id
+        self.set_pipeline_path_format(page_id=page_id)
+        self.post_collect_criteria.set_page_id(page_id)
+
+    def get_start_urls(self) -> list[str]:
+        return [f"https://www.facebook.com/{page_id}" for page_id in self.page_ids]
+
+    def _handle_parse_url(self, url: str):
+        # Parsed page may be any of the page_ids, or one found through navigation
+        self.set_page_id(urlparse(url).path.strip("/"))
+        if self.network_capture is not None:
+            self.network_capture.clear(self.chrome)
+        super()._handle_parse_url(url)
@@ -0,0 +1,263 @@
+from selenium.webdriver import Chrome
+from selenium.common.exceptions import WebDriverException
+
+from utils.parsing import parse_post_content
+
+import os
+import re
+import json
+import argparse
+from glob import glob
+from os.path import join
+from datetime import datetime
+from typing import Any, Iterator
+
+graphql_url_regex = re.compile(r"/api/graphql/?")
+# Server-side rendered payloads the first feed stories are embedded in
+embedded_json_regex = re.compile(
+    r'<script type="application/json"[^>]*>(.*?)</script>', re.DOTALL
+)
+reaction_id_map = {
+    "1635855486666999": "like",
+    "1678524932434102": "love",
+    "613557422527858": "care",
+    "115940658764963": "haha",
+    "478547315650144": "wow",
+    "908563459236466": "sad",
+    "444813342392137": "angry",
+}
+
+
+class NetworkCapture:
+    """
+    Collects bodies of the feed's GraphQL responses from Chrome performance logs as the page scrolls.
+    Requires the driver to be started with `goog:loggingPrefs` {"performance": "ALL"}.
+    With `record_dir`, every collected body is saved as a fixture for `replay`
+    """
+
+    def __init__(self, record_dir: str | None = None) -> None:
+        self.record_dir = record_dir
+        self.bodies: list[str] = []
+        # GraphQL requests whose response started, but may not have finished loading yet
+        self.pending_requests: set[str] = set()
+        self.n_recorded = 0
+        if record_dir is not None:
+            os.makedirs(record_dir, exist_ok=True)
+            self.n_recorded = len(glob(join(record_dir, "*.txt")))
+
+    @staticmethod
+    def enable_logging(driver_options):
+        driver_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def clear(self, driver: Chrome):
+        """Drop logged responses so far, e.g. of earlier pages"""
+        driver.get_log("performance")
+        self.bodies = []
+        self.pending_requests = set()
+
+    def collect(self, driver: Chrome) -> int:
+        """Fetch bodies of GraphQL responses finished since last call. Returns number of new bodies"""
+        finished_requests = []
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.responseReceived" and graphql_url_regex.search(
+                params["response"]["url"]
+            ):
+                self.pending_requests.add(params["requestId"])
+            elif method == "Network.loadingFinished":
+                finished_requests.append(params["requestId"])
+
+        n_bodies = 0
+        for request_id in finished_requests:
+            if request_id not in self.pending_requests:
+                continue
+            self.pending_requests.remove(request_id)
+            try:
+                body = driver.execute_cdp_cmd(
+                    "Network.getResponseBody", {"requestId": request_id}
+                )["body"]
+            except WebDriverException:
+                # Body already evicted from browser's buffer
+                continue
+            self.add_body(body)
+            n_bodies += 1
+        return n_bodies
+
+    def add_body(self, body: str):
+        self.bodies.append(body)
+        if self.record_dir is not None:
+            with open(
+                join(self.record_dir, f"{self.n_recorded:05d}.txt"),
+                "w",
+                encoding="utf-8",
+            ) as f:
+                f.write(body)
+            self.n_recorded += 1
+
+    def pop_bodies(self) -> list[str]:
+        bodies, self.bodies = self.bodies, []
+        return bodies
+
+
+def iter_json_documents(body: str) -> Iterator[Any]:
+    # Streamed GraphQL responses hold one JSON document per line
+    for line in body.splitlines():
+        line = line.strip()
+        if line.startswith("for (;;);"):
+            line = line[len("for (;;);") :]
+        if len(line) == 0:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def iter_embedded_documents(html: str) -> Iterator[Any]:
+    for payload in embedded_json_regex.findall(html):
+        # Skip the many payloads unrelated to feed stories without decoding them
+        if '"Story"' not in payload:
+            continue
+        try:
+            yield json.loads(payload)
+        except json.JSONDecodeError:
+            continue
+
+
+def _find(obj: Any, key: str, skip: tuple[str, ...] = ("attached_story",)) -> Any:
+    """First value of `key` in a depth-first walk, not descending into `skip` keys"""
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            if key in current and current[key] is not None:
+                return current[key]
+            stack.extend(
+                value
+                for name, value in reversed(current.items())
+                if name not in skip and isinstance(value, (dict, list))
+            )
+        elif isinstance(current, list):
+            stack.extend(
+                value for value in reversed(current) if isinstance(value, (dict, list))
+            )
+    return None
+
+
+def iter_stories(document: Any) -> Iterator[dict[str, Any]]:
+    """Top-level feed story nodes of a payload, shared stories inside them excluded"""
+    stack = [document]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            if current.get("__typename") == "Story" and "post_id" in current:
+                yield current
+                continue
+            stack.extend(
+                value
+                for value in reversed(current.values())
+                if isinstance(value, (dict, list))
+            )
+        elif isinstance(current, list):
+            stack.extend(
+                value for value in reversed(current) if isinstance(value, (dict, list))
+            )
+
+
+def parse_reactions(story: dict[str, Any]) -> tuple[int, str]:
+    """Total number of reactions and per-reaction breakdown"""
+    top_reactions = _find(story, "top_reactions") or {}
+    reactions, total = [], 0
+    for edge in top_reactions.get("edges", []):
+        node = edge.get("node", {})
+        name = reaction_id_map.get(
+            str(node.get("id")), str(node.get("localized_name", "")).lower()
+        )
+        reactions.append(f"{name} ({edge.get('reaction_count', 0)})")
+        total += edge.get("reaction_count", 0)
+    # Total is also given apart, as {"count": n} next to the breakdown
+    reaction_count = _find(story, "reactors") or _find(story, "reaction_count")
+    if isinstance(reaction_count, dict) and "count" in reaction_count:
+        total = reaction_count["count"]
+    return total, ";".join(reactions)
+
+
+def parse_story(story: dict[str, Any]) -> dict[str, Any]:
+    """Map a GraphQL story node to the page crawler's record schema"""
+    post_link = story.get("url") or _find(story, "wwwURL")
+    actors = _find(story, "actors") or []
+    message = _find(story, "message") or {}
+    content, hashtag = parse_post_content(message.get("text", ""))
+    creation_time = _find(story, "creation_time")
+    media_types = {
+        media.get("__typename")
+        for attachment in story.get("attachments") or _find(story, "attachments") or []
+        if isinstance(media := _find(attachment, "media"), dict)
+    }
+    comments = _find(story, "comment_rendering_instance") or {}
+    total_comments = (
+        _find(comments, "total_count")
+        or _find(story, "total_comment_count")
+        or (_find(story, "comment_count") or {}).get("total_count")
+        or 0
+    )
+    share_count = _find(story, "share_count") or {}
+    num_reactions, reaction = parse_reactions(story)
+
+    return {
+        "Post_link": post_link.split("?")[0].rstrip("/") if post_link else None,
+        "Owner": actors[0].get("name") if len(actors) > 0 else None,
+        "Location": None,
+        "Post_date": (
+            datetime.fromtimestamp(creation_time) if creation_time is not None else None
+        ),
+        "Content": content,
+        "Hashtag": hashtag,
+        "Is_Post_Image": "Photo" in media_types,
+        "Is_Post_Video": "Video" in media_types,
+        "Reaction": reaction,
+        "Num_reactions": num_reactions,
+        "Num_comments": int(total_comments),
+        "Num_share": int(share_count.get("count", 0)),
+        "Crawl_time": datetime.now(),
+    }
+
+
+def parse_payloads(bodies: list[str], html: str | None = None) -> list[dict[str, Any]]:
+    """Records of all stories in page HTML and response bodies, in feed order, each post once"""
+    documents = []
+    if html is not None:
+        documents.extend(iter_embedded_documents(html))
+    for body in bodies:
+        documents.extend(iter_json_documents(body))
+
+    records = dict()
+    for document in documents:
+        for story in iter_stories(document):
+            record = parse_story(story)
+            records.setdefault(record["Post_link"] or story["post_id"], record)
+    return list(records.values())
+
+
+def replay(record_dir: str) -> list[dict[str, Any]]:
+    """Parse response bodies recorded by `NetworkCapture`, along with page HTML saved as `page.html` if any"""
+    bodies = []
+    for path in sorted(glob(join(record_dir, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            bodies.append(f.read())
+    html = None
+    if os.path.exists(html_path := join(record_dir, "page.html")):
+        with open(html_path, "r", encoding="utf-8") as f:
+            html = f.read()
+    return parse_payloads(bodies, html=html)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay recorded GraphQL responses through the record mapper"
+    )
+    parser.add_argument("record_dir", help="Directory of recorded response bodies")
+    args = parser.parse_args()
+    for record in replay(args.record_dir):
+        print(json.dumps(record, default=str, ensure_ascii=False))
@@ -0,0 +1,134 @@
+# Extracts raw fields of every loaded post that has not been extracted yet, in one round-trip.
+# Arguments: posts XPath, XPath fallback chains of the selector registry by name.
+# Mirrors `FeedSnapshot.parse_post`
+EXTRACT_POSTS_JS = """
+const [postsXpath, selectors] = arguments;
+const evaluate = (xpath, ctx) => {
+    const result = document.evaluate(xpath, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    return Array.from({ length: result.snapshotLength }, (_, i) => result.snapshotItem(i));
+};
+// Matches of the first XPath of the chain that matches
+const all = (name, ctx) => {
+    for (const xpath of selectors[name]) {
+        const result = evaluate(xpath, ctx);
+        if (result.length > 0) return result;
+    }
+    return [];
+};
+const first = (name, ctx) => all(name, ctx)[0] || null;
+
+const items = [];
+for (const post of evaluate(postsXpath, document)) {
+    if (post.dataset.crawlerParsed) continue;
+    post.dataset.crawlerParsed = "1";
+
+    const contentDivs = all("post_content_divs", post);
+    const profileDiv = first("profile_name", post);
+    const datetimeAnchor = profileDiv ? first("datetime_anchor", profileDiv) : null;
+    const anchors = all("owner_loc_anchors", post);
+
+    const contentDiv = contentDivs[2];
+    let textDiv = null, visualDiv = null;
+    if (contentDiv) {
+        const numModalities = all("child_divs", contentDiv).length;
+        textDiv = first("text_content", contentDiv);
+        if ((numModalities === 2 && textDiv) || (numModalities === 1 && !textDiv)) {
+            visualDiv = first("last_child_div", contentDiv);
+        }
+    }
+
+    let buttonTexts = [];
+    const interactionDiv = contentDivs[3] ? first("interaction_div", contentDivs[3]) : null;
+    if (interactionDiv) {
+        const cmtShareDiv = first("last_child_div", interactionDiv);
+        buttonTexts = all("buttons", cmtShareDiv).map((btn) => btn.innerText);
+    }
+
+    const locationSpan = anchors[3] ? anchors[3].querySelector(":scope > span") : null;
+    const img = visualDiv ? visualDiv.querySelector("img") : null;
+    items.push({
+        element: post,
+        post_link_href: datetimeAnchor ? datetimeAnchor.href : null,
+        owner: anchors[2] ? anchors[2].innerText : null,
+        location: locationSpan && locationSpan.className === "xt0psk2" ? anchors[3].innerText : null,
+        text_html: textDiv ? textDiv.innerHTML : null,
+        button_texts: buttonTexts,
+        is_post_image: !!img && !img.parentElement.hasAttribute("data-visualcompletion"),
+        is_post_video: !!visualDiv && !!visualDiv.querySelector("div[role='presentation']"),
+    });
+}
+return items;
+"""
+
+# Arguments: XPath of elements to click
+CLICK_ALL_JS = """
+const result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (let i = 0; i < result.snapshotLength; i++) result.snapshotItem(i).click();
+"""
+
+# Arguments: XPath to count matches of
+COUNT_XPATH_JS = """
+return document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+"""
+
+# Arguments: post elements
+MARK_PARSED_JS = """
+for (const post of arguments[0]) post.dataset.crawlerParsed = "1";
+"""
+
+# Removes parsed posts except the last one, which is kept as scroll sentinel.
+# Arguments: posts XPath. Returns number of removed posts
+PRUNE_PARSED_POSTS_JS = """
+const result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const parsed = [];
+for (let i = 0; i < result.snapshotLength; i++) {
+    const post = result.snapshotItem(i);
+    if (post.dataset.crawlerParsed) parsed.push(post);
+}
+const pruned = parsed.slice(0, -1);
+for (const post of pruned) post.remove();
+return pruned.length;
+"""
+
+# Hrefs of anchors in each loaded post, to spot already crawled posts without hovering.
+# Arguments: posts XPath. Returns one list of hrefs per post
+POST_HREFS_JS = """
+const result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+return Array.from({ length: result.snapshotLength }, (_, i) =>
+    Array.from(result.snapshotItem(i).querySelectorAll("a[href]"), (a) => a.href)
+);
+"""
+
+# Date related texts of the last post's timestamp link, readable without hovering.
+# Arguments: posts XPath, XPath fallback chain of the timestamp link.
+# Returns list of candidate strings, `utime:<epoch>` for embedded timestamps
+LAST_POST_DATE_HINTS_JS = """
+const [postsXpath, anchorXpaths] = arguments;
+const result = document.evaluate(`(${postsXpath})[last()]`, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null);
+const post = result.singleNodeValue;
+if (!post) return [];
+let anchor = null;
+for (const xpath of anchorXpaths) {
+    anchor = document.evaluate(xpath, post, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (anchor) break;
+}
+const hints = [];
+for (const el of post.querySelectorAll("[data-utime]")) hints.push(`utime:${el.dataset.utime}`);
+if (anchor) {
+    for (const attr of ["aria-label", "title"]) if (anchor.getAttribute(attr)) hints.push(anchor.getAttribute(attr));
+    for (const el of anchor.querySelectorAll("[aria-label], [title]"))
+        hints.push(el.getAttribute("aria-label") || el.getAttribute("title"));
+    hints.push(anchor.innerText);
+}
+return hints;
+"""
+
+# Total count and per-reaction aria-labels of a post's reaction bar, without opening the dialog.
+# Arguments: reaction bar element
+REACTION_SUMMARY_JS = """
+const bar = arguments[0];
+return {
+    text: bar.innerText,
+    labels: Array.from(bar.querySelectorAll("[aria-label]"), (el) => el.getAttribute("aria-label")),
+};
+"""
@@ -0,0 +1,78 @@
+from utils.selectors import SelectorRegistry
+
+post_content_div_class = (
+    "html-div xdj266r x11i5rnm xat24cr x1mh8g0r xexx8yu x4uap5 x18d9i69 xkhd6sd"
+)
+
+# Bump version whenever Facebook's markup changes and selectors are updated
+SELECTORS = SelectorRegistry(version="2024-09")
+
+## Feed
+SELECTORS.register(
+    "posts",
+    "(//div[@class='x9f619 x1n2onr6 x1ja2u2z xeuugli xs83m0k xjl7jj x1xmf6yo x1emribx x1e56ztr x1i64zmx x19h7ccj xu9j1y6 x7ep2pv']/div)[last()]/div/div[@class='x1yztbdb x1n2onr6 xh8yej3 x1ja2u2z']",
+)
+SELECTORS.add(SELECTORS.posts.derive("unparsed_posts", "{}[not(@data-crawler-parsed)]"))
+SELECTORS.add(SELECTORS.posts.derive("last_post", "({})[last()]"))
+SELECTORS.register(
+    "sidebar",
+    "(//div[@class='x9f619 x1n2onr6 x1ja2u2z x78zum5 xdt5ytf xeuugli x1r8uery x1iyjqo2 xs83m0k x1swvt13 x1pi30zi xqdwrps x16i7wwg x1y5dvz6'])[3]",
+)
+SELECTORS.register("banner", "//div[@role='banner']")
+
+## Relative to a post
+SELECTORS.register(
+    "post_content_divs",
+    f"(./descendant::div[@class='{post_content_div_class}'])[2]/div",
+)
+SELECTORS.register(
+    "profile_name", "./descendant::div[@data-ad-rendering-role='profile_name']"
+)
+SELECTORS.register("owner_loc_anchors", ".//h2/../../../../div//a")
+SELECTORS.register(
+    "post_datetime_anchor",
+    "(./descendant::div[@data-ad-rendering-role='profile_name']/../../../div)[2]//a",
+    "(.//h2/../../../../div)[2]//a",
+)
+SELECTORS.register(
+    "reaction_bar",
+    f"((./descendant::div[@class='{post_content_div_class}'])[2]/div)[4]/descendant::div[@class='x1n2onr6']/div/div/div",
+)
+SELECTORS.register(
+    "show_more", "./descendant::div[@role='button' and text()='Xem thêm']"
+)
+
+## Relative to parts of a post
+SELECTORS.register("datetime_anchor", "(../../../div)[2]//a")
+SELECTORS.register("child_divs", "./div")
+SELECTORS.register("last_child_div", "(./div)[last()]")
+SELECTORS.register(
+    "text_content", "./descendant::div[@data-ad-comet-preview='message']"
+)
+SELECTORS.register("interaction_div", "./descendant::div[@class='x1n2onr6']/div")
+SELECTORS.register("interaction_reaction_bar", "./div/div")
+SELECTORS.register("buttons", "./descendant::div[@role='button']")
+SELECTORS.register("first_span", "./span")
+SELECTORS.register("img", ".//img")
+SELECTORS.register("presentation_div", ".//div[@role='presentation']")
+
+## Post date tooltip shown on hover
+SELECTORS.register(
+    "hover_content",
+    "(//div[@class='x78zum5 xdt5ytf x1n2onr6 xat3117 xxzkxad']/div)[2]/div",
+)
+SELECTORS.add(SELECTORS.hover_content.derive("hover_content_loaded", "{}/div"))
+SELECTORS.add(
+    SELECTORS.hover_content.derive(
+        "hover_tooltip", "{}/descendant::div[contains(@class, '__fb-light-mode')]"
+    )
+)
+
+## Reaction dialog
+SELECTORS.register("reaction_dialog", "//div[@role='dialog']")
+SELECTORS.register(
+    "dialog_reaction_tabs",
+    "./descendant::div[@class='x1swvt13 x1pi30zi']/descendant::div[@class='x6ikm8r x10wlt62 xlshs6z']/div",
+)
+SELECTORS.register("dialog_close", "./descendant::div[@class='x1d52u69 xktsk01']/div")
+SELECTORS.register("tab_label", ".//span")
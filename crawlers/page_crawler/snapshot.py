@@ -0,0 +1,155 @@
+from utils.parsing import (
+    parse_text_from_html,
+    parse_post_content,
+    parse_interaction_counts,
+)
+
+from .selectors import SELECTORS
+from utils.selectors import compile_xpath
+
+import re
+from lxml import html as lxml_html
+from urllib.parse import urljoin
+from datetime import datetime
+from typing import Any
+
+
+def _text(element) -> str:
+    return " ".join(element.text_content().split())
+
+
+def _inner_html(element) -> str:
+    return (element.text or "") + "".join(
+        lxml_html.tostring(child, encoding="unicode") for child in element
+    )
+
+
+def parse_post_link(href: str | None, page_id: str) -> str | None:
+    if href is None:
+        return None
+    match = re.search(
+        rf"^https://www\.facebook\.com/{re.escape(page_id)}/[^/]+/[^\?\s]+\?",
+        urljoin("https://www.facebook.com", href),
+    )
+    return match.group(0).strip("/?") if match is not None else None
+
+
+def build_post_record(
+    post_link: str | None,
+    owner: str | None,
+    location: str | None,
+    text_html: str | None,
+    is_post_image: bool,
+    is_post_video: bool,
+    button_texts: list[str],
+) -> dict[str, Any]:
+    """Assemble a post record from raw extracted fields, leaving hover-only fields empty"""
+    raw_content = parse_text_from_html(text_html) if text_html is not None else ""
+    content, hashtag = parse_post_content(raw_content)
+    num_comments, num_shares = parse_interaction_counts(button_texts)
+    return {
+        "Post_link": post_link,
+        "Owner": owner,
+        "Location": location,
+        "Post_date": None,
+        "Content": content,
+        "Hashtag": hashtag,
+        "Is_Post_Image": is_post_image,
+        "Is_Post_Video": is_post_video,
+        "Reaction": None,
+        "Num_reactions": None,
+        "Num_comments": num_comments,
+        "Num_share": num_shares,
+        "Crawl_time": datetime.now(),
+    }
+
+
+class FeedSnapshot:
+    """
+    Offline parser over one `page_source` dump of a page's feed.
+    Extracts every field that does not require hovering (post date, reactions)
+    """
+
+    def __init__(self, html: str, posts_xpath: str, page_id: str) -> None:
+        self.tree = lxml_html.fromstring(html)
+        self.posts_xpath = compile_xpath(posts_xpath)
+        self.page_id = page_id
+
+    def get_posts(self) -> list:
+        return self.posts_xpath(self.tree)
+
+    def parse_posts(self) -> list[dict[str, Any]]:
+        return [self.parse_post(post) for post in self.get_posts()]
+
+    def parse_post(self, post) -> dict[str, Any]:
+        # Selectors are relative to the post, so each lookup only walks its subtree
+        post_content_divs = SELECTORS.post_content_divs.select(post)
+
+        # Profile
+        profile_div = SELECTORS.profile_name.select_one(post)
+        owner_loc_anchors = SELECTORS.owner_loc_anchors.select(post)
+        datetime_anchor = (
+            SELECTORS.datetime_anchor.select_one(profile_div)
+            if profile_div is not None
+            else None
+        )
+
+        # Content
+        content_div = post_content_divs[2] if len(post_content_divs) > 2 else None
+        text_content_div, visual_content_div = None, None
+        if content_div is not None:
+            num_content_modalities = len(SELECTORS.child_divs.select(content_div))
+            text_content_div = SELECTORS.text_content.select_one(content_div)
+            if (
+                num_content_modalities == 2
+                and text_content_div is not None
+                or num_content_modalities == 1
+                and text_content_div is None
+            ):
+                visual_content_div = SELECTORS.last_child_div.select_one(content_div)
+
+        # User interaction
+        button_texts = []
+        if len(post_content_divs) > 3:
+            interaction_div = SELECTORS.interaction_div.select_one(post_content_divs[3])
+            if interaction_div is not None:
+                cmt_share_div = SELECTORS.last_child_div.select_one(interaction_div)
+                button_texts = [
+                    _text(btn) for btn in SELECTORS.buttons.select(cmt_share_div)
+                ]
+
+        owner = _text(owner_loc_anchors[2]) if len(owner_loc_anchors) > 2 else None
+        location = None
+        if len(owner_loc_anchors) > 3:
+            span = SELECTORS.first_span.select_one(owner_loc_anchors[3])
+            if span is not None and span.get("class") == "xt0psk2":
+                location = _text(owner_loc_anchors[3])
+
+        img = (
+            SELECTORS.img.select_one(visual_content_div)
+            if visual_content_div is not None
+            else None
+        )
+        is_post_image = (
+            img is not None and "data-visualcompletion" not in img.getparent().attrib
+        )
+        is_post_video = (
+            SELECTORS.presentation_div.select_one(visual_content_div) is not None
+            if visual_content_div is not None
+            else False
+        )
+
+        return build_post_record(
+            post_link=parse_post_link(
+                datetime_anchor.get("href") if datetime_anchor is not None else None,
+                page_id=self.page_id,
+            ),
+            owner=owner,
+            location=location,
+            text_html=(
+                _inner_html(text_content_div) if text_content_div is not None else None
+            ),
+            is_post_image=is_post_image,
+            is_post_video=is_post_video,
+            button_texts=button_texts,
+        )
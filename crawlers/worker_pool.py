@@ -0,0 +1,115 @@
+from .base_crawler import BaseCrawler
+from utils import Logger, SharedProgress
+from utils.colors import *
+from pipeline import PipelineWriter
+
+import sys
+from threading import Thread
+from traceback import format_exc
+
+
+class WorkerPool:
+    """
+    Runs several crawlers concurrently, each driving its own browser,
+    pulling URLs from one shared frontier and writing through a single pipeline writer
+    """
+
+    def __init__(self, crawlers: list[BaseCrawler]) -> None:
+        assert len(crawlers) > 0
+        self.logger = Logger("Worker Pool")
+        self.crawlers = crawlers
+        self.progress = SharedProgress(
+            dir=crawlers[0].progress.progress_dir,
+            history_backend=crawlers[0].progress.history_backend,
+        )
+        self.writer = PipelineWriter(
+            crawlers[0].data_pipeline,
+            flush_interval=crawlers[0].pipeline_flush_interval,
+        )
+        # Timings and profiled commands of all workers add up to one report
+        self.metrics = crawlers[0].metrics
+        # Each crawler pointed the shared pipeline at its own metrics when setting its directory
+        crawlers[0].data_pipeline.metrics = self.metrics
+        self.driver_profiler = crawlers[0].driver_profiler
+
+        for i, crawler in enumerate(crawlers, start=1):
+            crawler.logger.name = f"{crawler.logger.name} #{i}"
+            crawler.progress = self.progress
+            crawler.pipeline_writer = self.writer
+            crawler.metrics = self.metrics
+            crawler.driver_profiler = self.driver_profiler
+            crawler.owns_metrics = False
+
+        debugger_addresses = [
+            crawler.debugger_address
+            for crawler in crawlers
+            if crawler.debugger_address is not None
+        ]
+        if len(set(debugger_addresses)) < len(debugger_addresses):
+            raise ValueError("Workers can't attach to the same browser")
+        # Workers logging in as the same user get a Chrome profile each
+        profiles: dict[str, int] = dict()
+        for crawler in crawlers:
+            if crawler.user_data_dir is None:
+                continue
+            n_sharing = profiles.get(crawler.user_data_dir, 0)
+            profiles[crawler.user_data_dir] = n_sharing + 1
+            if n_sharing > 0:
+                crawler.set_user_data_dir(f"{crawler.user_data_dir}-{n_sharing + 1}")
+
+    def work(self, crawler: BaseCrawler):
+        try:
+            crawler.setup()
+        except:
+            exc_type, value, _ = sys.exc_info()
+            crawler.logger.error(
+                f"Worker failed to start: \n{red(exc_type.__name__)}: {value}\n{format_exc()}"
+            )
+            return
+
+        exc_type = None
+        while crawler.err_trial <= crawler.max_error_trials:
+            url = self.progress.claim_url()
+            if url is None:
+                break
+            try:
+                exc_type = crawler.crawl_url(url)
+            finally:
+                self.progress.release_url()
+            if exc_type in BaseCrawler.CRITICAL_EXCEPTIONS:
+                break
+
+        if exc_type is not None:
+            crawler.logger.error(f"Closing driver due to an error occured...")
+        elif crawler.err_trial > crawler.max_error_trials:
+            crawler.logger.error(
+                "Maximum number of trials upon errors exceeded, exitting..."
+            )
+        else:
+            crawler.logger.info("Closing driver due to no URL left in queue...")
+        crawler.teardown()
+
+    def start(self):
+        start_urls = self.crawlers[0].get_start_urls()
+        for crawler in self.crawlers:
+            crawler.seed_frontier(start_urls)
+        self.logger.info(
+            f"Starting {len(self.crawlers)} workers on {self.progress.count_remaining()} queued URLs"
+        )
+
+        threads = [
+            Thread(target=self.work, args=(crawler,), name=crawler.logger.name)
+            for crawler in self.crawlers
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.logger.info("Flushing pipeline writer...")
+            self.writer.close()
+            for crawler in self.crawlers:
+                crawler.collect_write_acks()
+            self.progress.save()
+            self.crawlers[0].report_metrics()
@@ -1,4 +1,5 @@
-from crawlers import BaseCrawler
+from crawlers import BaseCrawler, WorkerPool
+from utils.resource_blocking import BLOCKING_PRESETS
 import config
 
 
@@ -16,7 +17,18 @@ def parse_args():
     )
     parser.add_argument("--crawler", "-c", help="Crawler option", required=True)
     parser.add_argument(
-        "--user", "-u", help="Facebook user in secrets.json", required=True
+        "--user",
+        "-u",
+        nargs="+",
+        help="Facebook user(s) in secrets.json, assigned to workers in turn",
+        required=True,
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        default=1,
+        type=int,
+        help="Number of concurrent browser workers sharing the URL queue",
     )
     parser.add_argument(
         "--crawler-dir",
@@ -33,6 +45,27 @@ def parse_args():
         help="Mode of sleep time. According to https://doi.org/10.1145/1835449.1835513, user dwelling time on a page follows Weibull distribution",
         dest="sleep_weibull_lambda",
     )
+    parser.add_argument(
+        "--scroll-sleep-lambda",
+        default=4.0,
+        type=float,
+        help="Mode of dwell time between feed scrolls. Time spent waiting for posts to render counts toward it",
+        dest="scroll_sleep_lambda",
+    )
+    parser.add_argument(
+        "--error-sleep-lambda",
+        default=None,
+        type=float,
+        help="Mode of dwell time after an error. Defaults to --sleep-weibull-lambda",
+        dest="error_sleep_lambda",
+    )
+    parser.add_argument(
+        "--implicit-wait",
+        default=10,
+        type=float,
+        help="Implicit wait for element lookups once a page is loaded",
+        dest="implicit_wait",
+    )
     parser.add_argument(
         "--max-loading-wait",
         "-max-wait",
@@ -77,6 +110,61 @@ def parse_args():
         help="Maximum number of error trials",
         dest="max_error_trials",
     )
+    parser.add_argument(
+        "--history-backend",
+        "-hist",
+        default="set",
+        choices=["set", "bloom"],
+        help="Storage of crawled URL history. 'bloom' uses a memory-mapped Bloom filter for very large histories",
+        dest="history_backend",
+    )
+    parser.add_argument(
+        "--sync-pipeline",
+        default=True,
+        action="store_false",
+        help="Run the data pipeline inline, blocking the browser, instead of from a background writer",
+        dest="async_pipeline",
+    )
+    parser.add_argument(
+        "--profile-driver",
+        default=False,
+        action="store_true",
+        help="Record every WebDriver command with its call site and duration, reported at exit",
+        dest="profile_driver",
+    )
+    parser.add_argument(
+        "--user-data-dir",
+        default=None,
+        help="Directory of persistent Chrome profiles, one per user, keeping login and cache across runs",
+        dest="user_data_dir",
+    )
+    parser.add_argument(
+        "--debugger-address",
+        default=None,
+        help="Attach to a running Chrome started with --remote-debugging-port, e.g. 127.0.0.1:9222, instead of launching one",
+        dest="debugger_address",
+    )
+    parser.add_argument(
+        "--reuse-tab",
+        default=False,
+        action="store_true",
+        help="Load parsing URLs in the main tab instead of opening a new tab each",
+        dest="reuse_tab",
+    )
+    parser.add_argument(
+        "--blocked-resources",
+        default=None,
+        choices=list(BLOCKING_PRESETS),
+        help="Preset of requests blocked in the browser. Defaults to the crawler's own preset, e.g. 'feed' blocks media, fonts and analytics but keeps GraphQL, or to 'none' when attached with --debugger-address",
+        dest="blocked_resources",
+    )
+    parser.add_argument(
+        "--low-memory",
+        default=False,
+        action="store_true",
+        help="Launch Chrome with flags trimming background work and renderer memory",
+        dest="low_memory",
+    )
     return parser.parse_args()
 
 
@@ -84,22 +172,41 @@ if __name__ == "__main__":
     args = parse_args()
     from datetime import datetime
 
-    crawler: BaseCrawler = import_module(
-        f".{args.crawler}.crawler", "crawlers"
-    ).Crawler(
-        chromedriver_path=args.chromedriver,
-        navigate_link_extractor=config.NAVIGATE_LINK_EXTRACTOR,
-        parse_link_extractor=config.PARSE_LINK_EXTRACTOR,
-        crawler_dir=args.crawler_dir,
-        data_pipeline=config.PIPELINE,
-        user=args.user,
-        secrets_file=args.secrets_json,
-        cookies_save_dir=args.cookies_dir,
-        headless=args.headless,
-        sleep_weibull_lambda=args.sleep_weibull_lambda,
-        max_loading_wait=args.max_loading_wait,
-        max_error_trials=args.max_error_trials,
-        **config.CRAWLER_ARGUMENTS.get(args.crawler, dict()),
-    )
+    crawler_cls = import_module(f".{args.crawler}.crawler", "crawlers").Crawler
+
+    def create_crawler(user: str) -> BaseCrawler:
+        return crawler_cls(
+            chromedriver_path=args.chromedriver,
+            navigate_link_extractor=config.NAVIGATE_LINK_EXTRACTOR,
+            parse_link_extractor=config.PARSE_LINK_EXTRACTOR,
+            crawler_dir=args.crawler_dir,
+            data_pipeline=config.PIPELINE,
+            user=user,
+            secrets_file=args.secrets_json,
+            cookies_save_dir=args.cookies_dir,
+            headless=args.headless,
+            sleep_weibull_lambda=args.sleep_weibull_lambda,
+            scroll_sleep_lambda=args.scroll_sleep_lambda,
+            error_sleep_lambda=args.error_sleep_lambda,
+            max_loading_wait=args.max_loading_wait,
+            implicit_wait=args.implicit_wait,
+            max_error_trials=args.max_error_trials,
+            history_backend=args.history_backend,
+            async_pipeline=args.async_pipeline,
+            profile_driver=args.profile_driver,
+            user_data_dir=args.user_data_dir,
+            debugger_address=args.debugger_address,
+            reuse_tab=args.reuse_tab,
+            blocked_resources=args.blocked_resources,
+            low_memory=args.low_memory,
+            **config.CRAWLER_ARGUMENTS.get(args.crawler, dict()),
+        )
 
-    crawler.start()
+    if args.workers > 1:
+        pool = WorkerPool(
+            [create_crawler(args.user[i % len(args.user)]) for i in range(args.workers)]
+        )
+        pool.start()
+    else:
+        crawler = create_crawler(args.user[0])
+        crawler.start()
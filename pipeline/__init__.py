@@ -1,8 +1,12 @@
 from .as_csv import SaveAsCSV
 from .as_excel import SaveAsExcel
+from .as_parquet import SaveAsParquet
 from .save_imgs import SaveImages
 from .handle_hrefs import HandleHrefs
+from .deduplicate import Deduplicate
 from .base_step import BaseStep
+from .writer import PipelineWriter
+from utils import Metrics
 from pandas import DataFrame
 from typing import Sequence, Callable, Any
 
@@ -10,16 +14,52 @@ from typing import Sequence, Callable, Any
 class Pipeline:
     def __init__(self, *steps: BaseStep) -> None:
         self.steps: list[BaseStep] = [AsDataFrame(), *steps]
+        # Set by crawlers to record time spent per step
+        self.metrics: Metrics | None = None
 
     def __call__(self, input: Any) -> Any:
         result = input
-        for step in self.steps:
-            result = step(result)
+        for i, step in enumerate(self.steps):
+            try:
+                if self.metrics is None:
+                    result = step(result)
+                    continue
+                with self.metrics.time("pipeline_step", step=type(step).__name__):
+                    result = step(result)
+            except Exception:
+                # Steps that already ran drop what they staged for this input, so it can be retried
+                for ran_step in self.steps[:i]:
+                    if isinstance(ran_step, BaseStep):
+                        ran_step.rollback()
+                raise
         return result
 
     def add(self, step: Callable[[Any], Any]):
         self.steps.append(step)
 
+    def flush(self):
+        # Sinks persist their buffered records before steps upstream commit what they staged for them
+        try:
+            for step in reversed(self.steps):
+                if isinstance(step, BaseStep):
+                    step.flush()
+        except Exception:
+            # Buffered records may be lost, so nothing staged for them is committed
+            for step in self.steps:
+                if isinstance(step, BaseStep):
+                    step.discard()
+            raise
+
+    def set_metrics(self, metrics: Metrics | None):
+        self.metrics = metrics
+        for step in self.steps:
+            if isinstance(step, BaseStep):
+                step.set_metrics(metrics)
+
+    def set_path_format(self, **format_kwargs):
+        for step in self.steps:
+            step.set_path_format(**format_kwargs)
+
 
 class AsDataFrame(BaseStep):
     def __call__(self, data: dict[str, Any]) -> Any:
@@ -1,30 +1,91 @@
 from utils import FormatablePath
 from .base_step import BaseStep
+from .deduplicate import split_updates
 
 import os
 from os.path import join
-from pandas import DataFrame
+from pandas import DataFrame, read_csv
 from pathlib import Path
 from typing import Any
 
 
 class SaveAsCSV(BaseStep):
-    def __init__(self, dst_dir: str, **csv_kwargs) -> None:
+    """
+    Appends records to `{dst_dir}/data.csv`. Updates of stored records (flagged by `Deduplicate` upserts)
+    are appended to `{dst_dir}/updates.csv`, until `merge_updates` applies them to `data.csv` in place,
+    on every flush with `merge_on_flush`
+    """
+
+    def __init__(
+        self, dst_dir: str, merge_on_flush: bool = False, **csv_kwargs
+    ) -> None:
         self.dst_dir = FormatablePath(dst_dir)
         self.dst_csv = FormatablePath(join(dst_dir, "data.csv"))
+        self.updates_csv = FormatablePath(join(dst_dir, "updates.csv"))
+        self.merge_on_flush = merge_on_flush
         self.csv_kwargs = csv_kwargs
+        self.updated_dirs: set[str] = set()
 
     def __call__(self, df: DataFrame) -> Any:
         if df.empty:
             return df
 
         os.makedirs(self.dst_dir, exist_ok=True)
-        df.to_csv(
-            self.dst_csv,
-            index=False,
-            mode="a",
-            header=not os.path.exists(self.dst_csv),
-            **self.csv_kwargs
-        )
+        new_df, updates_df = split_updates(df)
+        for frame, path in [(new_df, self.dst_csv), (updates_df, self.updates_csv)]:
+            if frame.empty:
+                continue
+            frame.to_csv(
+                path,
+                index=False,
+                mode="a",
+                header=not os.path.exists(path),
+                **self.csv_kwargs,
+            )
+        if not updates_df.empty:
+            self.updated_dirs.add(str(self.dst_dir))
 
         return df
+
+    def flush(self):
+        if self.merge_on_flush:
+            for dst_dir in self.updated_dirs:
+                SaveAsCSV.merge_updates(dst_dir, **self.csv_kwargs)
+        self.updated_dirs.clear()
+
+    @staticmethod
+    def merge_updates(
+        dst_dir: str, key: str = "Post_link", chunk_size: int = 100_000, **csv_kwargs
+    ):
+        """
+        Rewrite `data.csv` with the latest values of its updated records, streaming it in chunks,
+        then remove `updates.csv`. A crash midway leaves both files as they were
+        """
+        dst_csv, updates_csv = join(dst_dir, "data.csv"), join(dst_dir, "updates.csv")
+        if not os.path.exists(updates_csv):
+            return
+        if not os.path.exists(dst_csv):
+            os.remove(updates_csv)
+            return
+        updates = read_csv(
+            updates_csv, dtype=str, keep_default_na=False
+        ).drop_duplicates(key, keep="last")
+        updates = updates.set_index(key)
+
+        tmp_path = join(dst_dir, ".data.csv.tmp")
+        # Left by an interrupted merge
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        header = True
+        for chunk in read_csv(
+            dst_csv, dtype=str, keep_default_na=False, chunksize=chunk_size
+        ):
+            is_updated = chunk[key].isin(updates.index)
+            for column in updates.columns.intersection(chunk.columns):
+                chunk.loc[is_updated, column] = chunk.loc[is_updated, key].map(
+                    updates[column]
+                )
+            chunk.to_csv(tmp_path, index=False, mode="a", header=header, **csv_kwargs)
+            header = False
+        os.replace(tmp_path, dst_csv)
+        os.remove(updates_csv)
@@ -1,5 +1,6 @@
 from utils import FormatablePath
 from .base_step import BaseStep
+from .deduplicate import split_updates
 
 import os
 from os.path import join
@@ -9,6 +10,7 @@ from typing import Any
 
 
 class SaveAsExcel(BaseStep):
+    # Only new records are written, updates of stored records (flagged by `Deduplicate` upserts) are left out
     def __init__(self, dst_dir: str, **excel_kwargs) -> None:
         self.dst_dir = FormatablePath(dst_dir)
         self.dst_csv = FormatablePath(join(dst_dir, "data.xlsx"))
@@ -19,7 +21,8 @@ class SaveAsExcel(BaseStep):
             return df
 
         os.makedirs(self.dst_dir, exist_ok=True)
-        df.to_excel(
+        new_df, _ = split_updates(df)
+        new_df.to_excel(
             self.dst_csv, header=not os.path.exists(self.dst_csv), **self.excel_kwargs
         )
 
@@ -0,0 +1,231 @@
+from utils import FormatablePath
+from .base_step import BaseStep
+from .deduplicate import split_updates
+
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+from os.path import join
+from glob import glob
+from datetime import datetime
+from pandas import DataFrame, concat, to_datetime
+from typing import Any
+
+# Arrow types of known record columns, other columns are inferred
+POST_SCHEMA = {
+    "Post_date": pa.timestamp("us"),
+    "Crawl_time": pa.timestamp("us"),
+    "Num_reactions": pa.int64(),
+    "Num_comments": pa.int64(),
+    "Num_share": pa.int64(),
+    "Is_Post_Image": pa.bool_(),
+    "Is_Post_Video": pa.bool_(),
+}
+
+
+class SaveAsParquet(BaseStep):
+    """
+    Buffers records and writes them as typed Parquet files, partitioned as
+    `{dst_dir}/crawl_date=YYYY-MM-DD/part-*.parquet`. Each buffer flush writes one small file,
+    which `compact` merges per partition.
+    Updates of stored records (flagged by `Deduplicate` upserts) are written to `{dst_dir}/_updates/`,
+    which dataset readers skip, until `merge_updates` applies them to the records of their partitions
+    """
+
+    def __init__(
+        self,
+        dst_dir: str,
+        row_group_size: int = 10_000,
+        date_column: str = "Crawl_time",
+        column_types: dict[str, pa.DataType] = POST_SCHEMA,
+        compact_on_flush: bool = False,
+        key: str = "Post_link",
+        **parquet_kwargs,
+    ) -> None:
+        self.dst_dir = FormatablePath(dst_dir)
+        self.row_group_size = row_group_size
+        self.date_column = date_column
+        self.column_types = column_types
+        self.compact_on_flush = compact_on_flush
+        self.key = key
+        self.parquet_kwargs = dict(compression="zstd", **parquet_kwargs)
+        # Buffered frames of new and updated records per resolved destination,
+        # as path format may change between calls
+        self.buffers: dict[str, list[DataFrame]] = dict()
+        self.update_buffers: dict[str, list[DataFrame]] = dict()
+        self.written_partitions: set[str] = set()
+        self.updated_dirs: set[str] = set()
+
+    def __call__(self, df: DataFrame) -> Any:
+        if df.empty:
+            return df
+
+        new_df, updates_df = split_updates(df)
+        dst_dir = str(self.dst_dir)
+        for frame, buffers, write in [
+            (new_df, self.buffers, self._write),
+            (updates_df, self.update_buffers, self._write_updates),
+        ]:
+            if frame.empty:
+                continue
+            buffer = buffers.setdefault(dst_dir, [])
+            buffer.append(frame)
+            if sum(len(frame) for frame in buffer) >= self.row_group_size:
+                write(dst_dir)
+        return df
+
+    def to_table(self, df: DataFrame) -> pa.Table:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for name, pa_type in self.column_types.items():
+            idx = table.schema.get_field_index(name)
+            if idx >= 0 and table.schema.field(idx).type != pa_type:
+                table = table.set_column(idx, name, table.column(idx).cast(pa_type))
+        return table
+
+    def _write(self, dst_dir: str):
+        frames = self.buffers.pop(dst_dir, [])
+        if len(frames) == 0:
+            return
+        df = concat(frames, ignore_index=True)
+
+        if self.date_column in df.columns:
+            crawl_dates = to_datetime(df[self.date_column]).dt.strftime("%Y-%m-%d")
+        else:
+            crawl_dates = [datetime.now().strftime("%Y-%m-%d")] * len(df)
+        for crawl_date, partition_df in df.groupby(crawl_dates, sort=False):
+            partition_dir = join(dst_dir, f"crawl_date={crawl_date}")
+            os.makedirs(partition_dir, exist_ok=True)
+            pq.write_table(
+                self.to_table(partition_df),
+                join(partition_dir, file_name("part")),
+                row_group_size=self.row_group_size,
+                **self.parquet_kwargs,
+            )
+            self.written_partitions.add(partition_dir)
+
+    def _write_updates(self, dst_dir: str):
+        frames = self.update_buffers.pop(dst_dir, [])
+        if len(frames) == 0:
+            return
+        updates_dir = join(dst_dir, "_updates")
+        os.makedirs(updates_dir, exist_ok=True)
+        pq.write_table(
+            self.to_table(concat(frames, ignore_index=True)),
+            join(updates_dir, file_name("part")),
+            row_group_size=self.row_group_size,
+            **self.parquet_kwargs,
+        )
+        self.updated_dirs.add(dst_dir)
+
+    def flush(self):
+        for dst_dir in list(self.buffers.keys()):
+            self._write(dst_dir)
+        for dst_dir in list(self.update_buffers.keys()):
+            self._write_updates(dst_dir)
+        if self.compact_on_flush:
+            # Updates are merged first, rewriting the partitions they touch as one file
+            for dst_dir in self.updated_dirs:
+                SaveAsParquet.merge_updates(
+                    dst_dir, self.key, self.date_column, **self.parquet_kwargs
+                )
+            for partition_dir in self.written_partitions:
+                SaveAsParquet.compact(partition_dir, **self.parquet_kwargs)
+            self.updated_dirs.clear()
+            self.written_partitions.clear()
+
+    @staticmethod
+    def compact(
+        partition_dir: str,
+        row_group_size: int = 100_000,
+        min_files: int = 2,
+        **parquet_kwargs,
+    ):
+        """Merge files of a partition into one file, removing them only once it is fully written"""
+        part_files = sorted(glob(join(partition_dir, "*.parquet")))
+        if len(part_files) < min_files:
+            return
+
+        table = read_tables(part_files)
+        replace_files(
+            partition_dir, part_files, table, row_group_size, **parquet_kwargs
+        )
+
+    @staticmethod
+    def merge_updates(
+        dst_dir: str,
+        key: str = "Post_link",
+        date_column: str = "Crawl_time",
+        row_group_size: int = 100_000,
+        **parquet_kwargs,
+    ):
+        """
+        Apply the latest update of each record to its partition, rewriting touched partitions as one file,
+        then remove the update files. Columns other than `key` and `date_column` are updated.
+        A crash midway leaves the update files, which are applied again on the next merge
+        """
+        update_files = sorted(glob(join(dst_dir, "_updates", "*.parquet")))
+        if len(update_files) == 0:
+            return
+        updates = (
+            read_tables(update_files)
+            .to_pandas()
+            .drop_duplicates(key, keep="last")
+            .set_index(key)
+        )
+        columns = updates.columns.drop(date_column, errors="ignore")
+
+        for partition_dir in sorted(glob(join(dst_dir, "crawl_date=*"))):
+            part_files = sorted(glob(join(partition_dir, "*.parquet")))
+            if len(part_files) == 0:
+                continue
+            keys = read_tables(part_files, columns=[key])[key].to_pandas()
+            if not keys.isin(updates.index).any():
+                continue
+            table = read_tables(part_files)
+            df = table.to_pandas()
+            is_updated = df[key].isin(updates.index)
+            for column in columns.intersection(df.columns):
+                df.loc[is_updated, column] = df.loc[is_updated, key].map(
+                    updates[column]
+                )
+            replace_files(
+                partition_dir,
+                part_files,
+                pa.Table.from_pandas(df, schema=table.schema, preserve_index=False),
+                row_group_size,
+                **parquet_kwargs,
+            )
+        for update_file in update_files:
+            os.remove(update_file)
+
+    @staticmethod
+    def compact_all(root_dir: str, key: str | None = None, **kwargs):
+        """Compact every partition under `root_dir`, merging updates of their records first when `key` is given"""
+        if key is not None:
+            for updates_dir in glob(join(root_dir, "**", "_updates"), recursive=True):
+                SaveAsParquet.merge_updates(os.path.dirname(updates_dir), key, **kwargs)
+        for partition_dir in glob(join(root_dir, "**", "crawl_date=*"), recursive=True):
+            SaveAsParquet.compact(partition_dir, **kwargs)
+
+
+def file_name(prefix: str) -> str:
+    # Microsecond timestamps keep files of a directory in write order when sorted
+    return f"{prefix}-{datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+
+
+def read_tables(paths: list[str], columns: list[str] | None = None) -> pa.Table:
+    tables = [pq.read_table(path, columns=columns) for path in paths]
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def replace_files(
+    dir: str, paths: list[str], table: pa.Table, row_group_size: int, **parquet_kwargs
+):
+    """Write `table` as one compacted file of `dir`, removing `paths` only once it is fully written"""
+    compacted_name = file_name("compacted")
+    tmp_path = join(dir, f".{compacted_name}.tmp")
+    pq.write_table(table, tmp_path, row_group_size=row_group_size, **parquet_kwargs)
+    os.replace(tmp_path, join(dir, compacted_name))
+    for path in paths:
+        os.remove(path)
@@ -1,4 +1,4 @@
-from utils import FormatablePath
+from utils import FormatablePath, Metrics
 
 
 class BaseStep:
@@ -8,3 +8,19 @@ class BaseStep:
             if isinstance(attr, FormatablePath):
                 new_formats = dict(**format_kwargs)
                 attr.format_kwargs.update(new_formats)
+
+    def set_metrics(self, metrics: Metrics | None):
+        # Steps with their own counters record them in `metrics` here
+        pass
+
+    def flush(self):
+        # Steps buffering records write them out here
+        pass
+
+    def rollback(self):
+        # Steps staging state for each input drop the last one here, when a later step failed on it
+        pass
+
+    def discard(self):
+        # Steps staging state until `flush` drop all of it here, when flushing failed
+        pass
@@ -0,0 +1,230 @@
+from utils import FormatablePath
+from .base_step import BaseStep
+
+import os
+import time
+import sqlite3
+import hashlib
+from os.path import join
+from pandas import DataFrame, concat
+from typing import Any
+
+# Flags records passed on by `Deduplicate` as updates of records already stored, for sinks to apply
+UPDATE_COLUMN = "Is_update"
+
+
+def split_updates(df: DataFrame) -> tuple[DataFrame, DataFrame]:
+    """New records and updated records of `df`, without the update flag"""
+    if UPDATE_COLUMN not in df.columns:
+        return df, df.iloc[0:0]
+    is_update = df[UPDATE_COLUMN].fillna(False).astype(bool)
+    df = df.drop(columns=UPDATE_COLUMN)
+    return df[~is_update], df[is_update]
+
+
+class Deduplicate(BaseStep):
+    """
+    Drops records already seen, keyed on `key`, through a persistent index at `{index_dir}/post_index.db`.
+    Keys of passed records are committed to the index on `flush`, once steps downstream stored them,
+    so records lost further down the pipeline aren't dropped as seen by later crawls.
+    With `upsert_columns`, these columns (e.g. engagement counts) are kept in the index too, and seen records
+    whose values changed are passed on flagged in `UPDATE_COLUMN` instead of being dropped.
+    Sinks store updates apart from new records (`updates.csv`, `_updates/` Parquet files) and merge them
+    into their records in place with `merge_updates`. Latest values are also read from the index with `lookup`
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        key: str = "Post_link",
+        upsert_columns: list[str] | None = None,
+        chunk_size: int = 500,
+    ) -> None:
+        self.index_dir = FormatablePath(index_dir)
+        self.key = key
+        self.upsert_columns = upsert_columns or []
+        self.chunk_size = chunk_size
+        # Connections per resolved index directory, as path format may change between calls
+        self.dbs: dict[str, sqlite3.Connection] = dict()
+        # Index writes per input, as (index directory, upserted columns, new rows, seen rows), until flushed
+        self.staged: list[tuple[str, list[str], list[tuple], list[tuple]]] = []
+
+    @staticmethod
+    def hash_key(key: str) -> int:
+        # 64-bit keys keep the index compact at tens of millions of records
+        return int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "big", signed=True
+        )
+
+    def connect(self, index_dir: str) -> sqlite3.Connection:
+        if index_dir in self.dbs:
+            return self.dbs[index_dir]
+
+        os.makedirs(index_dir, exist_ok=True)
+        db = sqlite3.connect(
+            join(index_dir, "post_index.db"),
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        upsert_columns = "".join(f', "{column}"' for column in self.upsert_columns)
+        db.execute(
+            f"CREATE TABLE IF NOT EXISTS posts (key INTEGER PRIMARY KEY, link TEXT NOT NULL, updated_at REAL NOT NULL{upsert_columns})"
+        )
+        # Upsert columns added after the index was created
+        existing_columns = {row[1] for row in db.execute("PRAGMA table_info(posts)")}
+        for column in self.upsert_columns:
+            if column not in existing_columns:
+                db.execute(f'ALTER TABLE posts ADD COLUMN "{column}"')
+        self.dbs[index_dir] = db
+        return db
+
+    def indexed(
+        self, db: sqlite3.Connection, keys: list[int]
+    ) -> dict[int, tuple[str, dict[str, Any]]]:
+        """Link and upserted values of indexed keys"""
+        quoted_columns = "".join(f', "{column}"' for column in self.upsert_columns)
+        indexed = dict()
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = keys[i : i + self.chunk_size]
+            for key, link, *values in db.execute(
+                f"SELECT key, link{quoted_columns} FROM posts WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                indexed[key] = (link, dict(zip(self.upsert_columns, values)))
+        return indexed
+
+    def __call__(self, df: DataFrame) -> Any:
+        if df.empty or self.key not in df.columns:
+            return df
+
+        # Records without key can't be deduplicated, pass them through
+        has_key = df[self.key].notna()
+        keyless_df = df[~has_key]
+        df = df[has_key].drop_duplicates(self.key, keep="last")
+        links = df[self.key].astype(str).tolist()
+        keys = [Deduplicate.hash_key(link) for link in links]
+
+        index_dir = str(self.index_dir)
+        db = self.connect(index_dir)
+        seen = self.indexed(db, keys)
+        for staged_dir, staged_columns, new_rows, seen_rows in self.staged:
+            if staged_dir == index_dir:
+                for row in new_rows + seen_rows:
+                    seen[row[0]] = (row[1], dict(zip(staged_columns, row[3:])))
+        # Links are compared too, as distinct links may share a 64-bit key. Such records are kept but not indexed
+        is_new = [seen.get(key, (None,))[0] != link for key, link in zip(keys, links)]
+        upsert_columns = [
+            column for column in self.upsert_columns if column in df.columns
+        ]
+        # Frames without columns iterate no rows at all
+        values = (
+            list(
+                df[upsert_columns]
+                .astype(object)
+                .where(df[upsert_columns].notna(), None)
+                .itertuples(index=False, name=None)
+            )
+            if len(upsert_columns) > 0
+            else [()] * len(df)
+        )
+        is_updated = [
+            not new
+            and any(
+                value != seen[key][1].get(column)
+                for column, value in zip(upsert_columns, upserted)
+            )
+            for key, new, upserted in zip(keys, is_new, values)
+        ]
+
+        now = time.time()
+        rows = [
+            (key, link, now, *upserted)
+            for key, link, upserted in zip(keys, links, values)
+        ]
+        self.staged.append(
+            (
+                index_dir,
+                upsert_columns,
+                [row for row, new in zip(rows, is_new) if new],
+                [row for row, new in zip(rows, is_new) if not new],
+            )
+        )
+
+        if len(self.upsert_columns) == 0:
+            new_df = df[is_new]
+            if len(keyless_df) > 0:
+                return concat([new_df, keyless_df])
+            return new_df
+
+        passed = [new or updated for new, updated in zip(is_new, is_updated)]
+        new_df = df[passed].copy()
+        new_df[UPDATE_COLUMN] = [
+            updated for updated, kept in zip(is_updated, passed) if kept
+        ]
+        if len(keyless_df) > 0:
+            return concat([new_df, keyless_df.assign(**{UPDATE_COLUMN: False})])
+        return new_df
+
+    def lookup(self, links: list[str]) -> DataFrame:
+        """Indexed records, with upserted columns, of given keys under the current path format"""
+        db = self.connect(str(self.index_dir))
+        keys = [Deduplicate.hash_key(link) for link in links]
+        columns = ["link", "updated_at", *self.upsert_columns]
+        quoted_columns = ", ".join(f'"{column}"' for column in columns)
+        rows = []
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = keys[i : i + self.chunk_size]
+            rows.extend(
+                db.execute(
+                    f"SELECT {quoted_columns} FROM posts WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return DataFrame(rows, columns=[self.key, *columns[1:]])
+
+    def commit(self, db: sqlite3.Connection, staged: list[tuple]):
+        db.execute("BEGIN")
+        try:
+            for _, upsert_columns, new_rows, seen_rows in staged:
+                columns = ", ".join(
+                    [
+                        "key",
+                        "link",
+                        "updated_at",
+                        *(f'"{column}"' for column in upsert_columns),
+                    ]
+                )
+                placeholders = ", ".join("?" * (3 + len(upsert_columns)))
+                # Inserting in key order keeps B-tree writes sequential
+                db.executemany(
+                    f"INSERT OR IGNORE INTO posts ({columns}) VALUES ({placeholders})",
+                    sorted(new_rows),
+                )
+                if len(upsert_columns) > 0:
+                    assignments = ", ".join(
+                        f'"{column}" = ?' for column in ["updated_at", *upsert_columns]
+                    )
+                    db.executemany(
+                        f"UPDATE posts SET {assignments} WHERE key = ?",
+                        [(*row[2:], row[0]) for row in seen_rows],
+                    )
+            db.execute("COMMIT")
+        except:
+            db.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        staged, self.staged = self.staged, []
+        for index_dir in dict.fromkeys(entry[0] for entry in staged):
+            db = self.connect(index_dir)
+            self.commit(db, [entry for entry in staged if entry[0] == index_dir])
+            db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def rollback(self):
+        if len(self.staged) > 0:
+            self.staged.pop()
+
+    def discard(self):
+        self.staged = []
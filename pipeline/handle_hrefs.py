@@ -1,11 +1,13 @@
 from .base_step import BaseStep
 
 import re
-from pandas import DataFrame
+from pandas import DataFrame, Series
 from typing import Any, Literal, Callable
 
 
 class HandleHrefs(BaseStep):
+    href_regex = re.compile(r"href\(([^,]+), ([^\)]+)\)")
+
     def __init__(
         self,
         action: Literal["ignore", "keep_content", "replace"] = "ignore",
@@ -15,33 +17,37 @@ class HandleHrefs(BaseStep):
         self.action = action
         self.replace_predicate = replace_predicate
 
-    @staticmethod
-    def _keep_content_fn(value: Any):
-        if isinstance(value, str):
-            result = re.sub(r"href\(([^,]+), [^\)]+\)", r"\1", value)
-            return result
-        return value
-
-    @staticmethod
-    def _replace_fn(value: Any, predicate: Callable[[str, str], str]):
-        if isinstance(value, str):
-            hrefs = re.findall(r"href\(([^,]+), ([^\)]+)\)", value)
-            replace_dict = {
-                f"href({content}, {url})": predicate(content, url)
-                for content, url in hrefs
-            }
-            result = re.sub(
-                r"href\([^,]+, [^\)]+\)",
-                repl=lambda m: replace_dict.get(m.group(), None),
-                string=value,
+    def _handle_column(self, column: Series) -> Series:
+        # Only rows holding a href are rewritten, the rest (incl. non-string cells) are kept as is
+        try:
+            has_href = column.str.contains("href(", regex=False)
+        except AttributeError:
+            # Object column without any string
+            return column
+        has_href = has_href.fillna(False).astype(bool)
+        if not has_href.any():
+            return column
+
+        if self.action == "keep_content":
+            # Pattern passed as string so arrow-backed columns use the native regex kernel
+            replaced = column[has_href].str.replace(
+                HandleHrefs.href_regex.pattern, r"\1", regex=True
+            )
+        elif self.action == "replace":
+            replaced = column[has_href].str.replace(
+                HandleHrefs.href_regex,
+                lambda m: self.replace_predicate(m.group(1), m.group(2)),
+                regex=True,
             )
-            return result
-        return value
+        column = column.copy()
+        column[has_href] = replaced
+        return column
 
     def __call__(self, df: DataFrame) -> DataFrame:
         if self.action == "ignore":
             return df
-        elif self.action == "keep_content":
-            return df.map(HandleHrefs._keep_content_fn)
-        elif self.action == "replace":
-            return df.map(HandleHrefs._replace_fn, self.replace_predicate)
+
+        df = df.copy()
+        for col in df.select_dtypes(include=["object", "string"]).columns:
+            df[col] = self._handle_column(df[col])
+        return df
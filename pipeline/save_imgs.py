@@ -1,65 +1,203 @@
 from .base_step import BaseStep
+from utils import Logger, AssetCache, Metrics
 from utils.utils import FormatablePath
+from utils.colors import grey, red
 
 import os
+import uuid
+import hashlib
+import shutil
 from os.path import join
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from pandas import DataFrame
-from pathlib import Path
 from typing import Any
 
 
 class SaveImages(BaseStep):
+    """
+    Downloads images of posts and comments through a pooled session with bounded concurrency.
+    Existing files are never fetched again, and images with identical content are stored once
+    and hard-linked under the other names. With an `AssetCache`, images fetched by earlier crawls
+    are linked from the cache instead of downloaded
+    """
+
     def __init__(
         self,
         save_dir: str,
         img_url_col: str,
         img_name_format: str = "{post_id}_{cmt_id}_{ordinal}.jpg",
+        max_workers: int = 8,
+        timeout: float = 30,
+        max_retries: int = 3,
+        chunk_size: int = 64 * 1024,
+        cache: AssetCache | None = None,
     ) -> None:
         self.img_url_col = img_url_col
         self.save_dir = FormatablePath(save_dir)
         self.img_name_format = img_name_format
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.logger = Logger("Save Images")
 
-    def save_img(self, url: str, post_id: str, cmt_id: str, ordinal: int):
-        img_name = self.img_name_format.format(
-            post_id=post_id, cmt_id=cmt_id, ordinal=ordinal
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=max_retries,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
         )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Content hash -> path of the first file stored with that content
+        self.content_paths: dict[str, str] = dict()
+
+    def download(self, url: str, img_path: str) -> str:
+        """Stream `url` to `img_path` through a temporary file. Returns SHA-256 of its content"""
+        tmp_path = f"{img_path}.{uuid.uuid4().hex[:8]}.part"
+        digest = hashlib.sha256()
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        digest.update(chunk)
+                        f.write(chunk)
+            content_hash = digest.hexdigest()
+
+            if self.cache is not None:
+                cached_path = self.cache.put(url, tmp_path, content_hash)
+                if cached_path is not None:
+                    link_or_copy(cached_path, img_path)
+                    return content_hash
+
+            # Content already stored under another name
+            existing_path = self.content_paths.get(content_hash)
+            if existing_path is not None and os.path.exists(existing_path):
+                try:
+                    os.link(existing_path, img_path)
+                    return content_hash
+                except OSError:
+                    # e.g. file system without hard links, keep the copy
+                    pass
+            os.replace(tmp_path, img_path)
+            self.content_paths.setdefault(content_hash, img_path)
+            return content_hash
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save_img(self, url: str, img_name: str) -> str:
+        """
+        Name of the saved image, or "" if the server answered it doesn't exist (e.g. expired CDN link).
+        Other failures are raised, so the batch fails and its URL is crawled again
+        """
         img_path = join(self.save_dir, img_name)
-        img_data = requests.get(url).content
         if os.path.exists(img_path):
             return img_name
-
-        with open(img_path, "wb") as f:
-            f.write(img_data)
-        return img_name
+        try:
+            if (
+                self.cache is not None
+                and (cached_path := self.cache.get(url)) is not None
+            ):
+                link_or_copy(cached_path, img_path)
+                return img_name
+            self.download(url, img_path)
+            return img_name
+        except Exception as e:
+            self.logger.warning(
+                f"Failed to save {grey(url)}: {red(type(e).__name__)}: {e}"
+            )
+            if is_gone(e):
+                return ""
+            raise
 
     def __call__(
         self,
         df: DataFrame,
     ) -> Any:
-        if not df.empty:
-            is_post = df["type"] == "post"
-
-        if not self.save_dir.exists():
-            os.makedirs(self.save_dir, exist_ok=True)
-
-        for row in df.itertuples():
-            post_img = df.loc[
-                (df["post_id"] == row.post_id) & is_post, self.img_url_col
-            ].values[0]
-
-            img_files = []
-            imgs = row.images.split()
-            for i, url in enumerate(imgs):
-                img_file = self.save_img(
-                    url=url,
-                    post_id=row.post_id,
-                    cmt_id=(
-                        row.cmt_id if getattr(row, self.img_url_col) != post_img else ""
-                    ),
-                    ordinal=i,
-                )
-                img_files.append(img_file)
-            df.loc[row.Index, "image_paths"] = "   ".join(img_files)
+        if df.empty:
+            return df
+
+        os.makedirs(self.save_dir, exist_ok=True)
+
+        # Rows repeating their post's images are named after the post instead of the comment
+        is_post = df["type"] == "post"
+        post_imgs = (
+            df.loc[is_post]
+            .drop_duplicates("post_id")
+            .set_index("post_id")[self.img_url_col]
+        )
+        is_own_img = df[self.img_url_col] != df["post_id"].map(post_imgs)
+        cmt_ids = df["cmt_id"].where(is_own_img, "")
+        imgs_col = df["images"].fillna("").astype(str)
 
+        img_names = [
+            [
+                self.img_name_format.format(post_id=post_id, cmt_id=cmt_id, ordinal=i)
+                for i in range(len(imgs.split()))
+            ]
+            for post_id, cmt_id, imgs in zip(df["post_id"], cmt_ids, imgs_col)
+        ]
+
+        # Each file is fetched once, even when several rows share a name
+        jobs = dict()
+        for names, imgs in zip(img_names, imgs_col):
+            for img_name, url in zip(names, imgs.split()):
+                jobs.setdefault(img_name, url)
+
+        # Every job runs to completion before failures are raised, so images saved are not fetched again on retry
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                img_name: executor.submit(self.save_img, url, img_name)
+                for img_name, url in jobs.items()
+            }
+        failed = [
+            future.exception()
+            for future in futures.values()
+            if future.exception() is not None
+        ]
+        if len(failed) > 0:
+            raise RuntimeError(
+                f"Failed to save {len(failed)}/{len(jobs)} images"
+            ) from failed[0]
+        saved = {img_name: future.result() for img_name, future in futures.items()}
+
+        df = df.copy()
+        df["image_paths"] = [
+            "   ".join(saved[img_name] for img_name in names) for names in img_names
+        ]
         return df
+
+    def set_metrics(self, metrics: Metrics | None):
+        if self.cache is not None:
+            self.cache.metrics = metrics
+
+    def flush(self):
+        if self.cache is not None:
+            self.logger.info(f"Asset cache: {self.cache.summary()}")
+
+
+def is_gone(e: Exception) -> bool:
+    """Whether `e` is a client error response other than rate limiting, so retrying won't help"""
+    return (
+        isinstance(e, requests.HTTPError)
+        and e.response is not None
+        and 400 <= e.response.status_code < 500
+        and e.response.status_code != 429
+    )
+
+
+def link_or_copy(src_path: str, dst_path: str):
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        # e.g. file system without hard links, or across devices
+        shutil.copyfile(src_path, dst_path)
@@ -0,0 +1,211 @@
+from utils import Logger
+from utils.colors import bold, red
+
+import sys
+import time
+from queue import Queue, Empty, Full
+from threading import Thread
+from traceback import format_exc
+from pandas import DataFrame, concat
+from typing import Any, Callable
+
+
+class PipelineWriter:
+    """
+    Feeds a pipeline from a single background thread, so browsers keep scrolling while data is persisted
+    and records from concurrent crawlers never run through steps in parallel.
+    Records are batched per path format until `batch_size` records or `batch_interval` seconds,
+    producers block once `max_queue_size` batches are pending.
+    Failed batches are retried `max_retries` times. Each record's `on_done` callback is called with
+    whether it was persisted, once the pipeline is flushed (every `flush_interval` seconds and on close)
+    or once its batch is given up on. Errors never stop the thread: a batch failing to be batched,
+    written or flushed fails its callbacks, and later batches are still written
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        max_queue_size: int = 64,
+        batch_size: int = 500,
+        batch_interval: float = 5.0,
+        flush_interval: float = 60.0,
+        max_retries: int = 2,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.logger = Logger("Pipeline Writer")
+        self.queue: Queue[
+            tuple[Any, dict[str, str], Callable[[bool], Any] | None] | None
+        ] = Queue(maxsize=max_queue_size)
+        # Pending records per path format, with the time their first record arrived, their callbacks and count
+        self.batches: dict[
+            tuple, tuple[float, list[Any], list[Callable[[bool], Any]], int]
+        ] = dict()
+        # Callbacks of records written through the pipeline but not flushed yet
+        self.unflushed: list[Callable[[bool], Any]] = []
+        self.last_flush = time.monotonic()
+        self.closed = False
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __call__(
+        self,
+        data: Any,
+        on_done: Callable[[bool], Any] | None = None,
+        **path_format: str,
+    ):
+        job = (data, path_format, on_done)
+        try:
+            self.queue.put_nowait(job)
+        except Full:
+            # Backpressure, producer waits for the pipeline to catch up
+            self.logger.warning(
+                f"Pipeline lagging behind, {bold(self.queue.qsize())} batches pending..."
+            )
+            self.queue.put(job)
+
+    @staticmethod
+    def _len(data: Any) -> int:
+        if isinstance(data, dict):
+            return len(next(iter(data.values()), []))
+        return len(data)
+
+    @staticmethod
+    def _merge(items: list[Any]) -> Any:
+        if len(items) == 1:
+            return items[0]
+        if all(isinstance(item, list) for item in items):
+            return [record for item in items for record in item]
+        return concat([DataFrame(item) for item in items], ignore_index=True)
+
+    def _add(
+        self,
+        data: Any,
+        path_format: dict[str, str],
+        on_done: Callable[[bool], Any] | None,
+    ):
+        try:
+            key = tuple(sorted(path_format.items()))
+            n_records = self._len(data)
+        except Exception:
+            self._log_error("Failed to batch records")
+            self._notify([on_done] if on_done is not None else [], False)
+            return
+        first_time, items, callbacks, n_batched = self.batches.get(
+            key, (time.monotonic(), [], [], 0)
+        )
+        items.append(data)
+        if on_done is not None:
+            callbacks.append(on_done)
+        self.batches[key] = (first_time, items, callbacks, n_batched + n_records)
+        if n_batched + n_records >= self.batch_size:
+            self._write(key)
+
+    def _write(self, key: tuple):
+        _, items, callbacks, n_records = self.batches.pop(key)
+        try:
+            data = self._merge(items)
+        except Exception:
+            self._log_error(f"Failed to merge {n_records} records")
+            self._notify(callbacks, False)
+            return
+        for trial in range(self.max_retries + 1):
+            try:
+                self.pipeline.set_path_format(**dict(key))
+                self.pipeline(data)
+                self.unflushed.extend(callbacks)
+                return
+            except Exception:
+                exc_type, value, _ = sys.exc_info()
+                trace = format_exc()
+                if trial < self.max_retries:
+                    self.logger.warning(
+                        f"Failed to write {n_records} records, retrying in {self.retry_interval}s: {red(exc_type.__name__)}: {value}"
+                    )
+                    time.sleep(self.retry_interval)
+        self.logger.error(
+            f"Gave up on {n_records} records after {self.max_retries + 1} trials: \n{red(exc_type.__name__)}: {value}\n{trace}"
+        )
+        self._notify(callbacks, False)
+
+    def _flush(self):
+        callbacks, self.unflushed = self.unflushed, []
+        self.last_flush = time.monotonic()
+        try:
+            self.pipeline.flush()
+            persisted = True
+        except Exception:
+            self._log_error("Failed to flush pipeline")
+            persisted = False
+        self._notify(callbacks, persisted)
+
+    def _notify(self, callbacks: list[Callable[[bool], Any]], persisted: bool):
+        for callback in callbacks:
+            try:
+                callback(persisted)
+            except Exception:
+                self._log_error("Record callback failed")
+
+    def _log_error(self, message: str):
+        exc_type, value, _ = sys.exc_info()
+        self.logger.error(
+            f"{message}: \n{red(exc_type.__name__)}: {value}\n{format_exc()}"
+        )
+
+    def _write_due(self, now: float):
+        for key, (first_time, *_) in list(self.batches.items()):
+            if now - first_time >= self.batch_interval:
+                self._write(key)
+        if len(self.unflushed) > 0 and now - self.last_flush >= self.flush_interval:
+            self._flush()
+
+    def _next_timeout(self) -> float | None:
+        deadlines = [
+            first_time + self.batch_interval for first_time, *_ in self.batches.values()
+        ]
+        if len(self.unflushed) > 0:
+            deadlines.append(self.last_flush + self.flush_interval)
+        if len(deadlines) == 0:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _run(self):
+        while True:
+            try:
+                job = self.queue.get(timeout=self._next_timeout())
+            except Empty:
+                job = False
+
+            if job is None:
+                break
+            # Keep the thread alive whatever fails, or producers would block on a full queue forever
+            try:
+                if job is not False:
+                    self._add(*job)
+                self._write_due(time.monotonic())
+            except Exception:
+                self._log_error("Pipeline writer iteration failed")
+            finally:
+                if job is not False:
+                    self.queue.task_done()
+
+        try:
+            for key in list(self.batches.keys()):
+                self._write(key)
+            self._flush()
+        except Exception:
+            self._log_error("Failed to close pipeline writer")
+        finally:
+            self.queue.task_done()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,24 @@
+from benchmarks.suite import make_crawler, PAGE_URL
+from benchmarks.replay_driver import ReplayDriver
+from benchmarks.feed import synthetic_posts, synthetic_feed
+
+import os
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture
+def replay_crawler(tmp_path):
+    """Page crawler driving a replayed feed, from its HTML or `n_posts` synthetic posts"""
+
+    def create(
+        html: str | None = None, n_posts: int = 5, extraction_mode: str = "selenium"
+    ):
+        if html is None:
+            html = synthetic_feed(synthetic_posts(n_posts))
+        driver = ReplayDriver(html, url=PAGE_URL, page_size=n_posts)
+        return make_crawler(str(tmp_path), driver, n_posts, extraction_mode)
+
+    return create
@@ -0,0 +1,107 @@
+from pipeline import SaveAsParquet
+
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from glob import glob
+from os.path import join
+from pandas import DataFrame, Timestamp
+
+
+def posts(*ids: int, crawl_time: str = "2024-09-01 10:00") -> DataFrame:
+    return DataFrame(
+        {
+            "Post_link": [f"https://www.facebook.com/bench/posts/{i}" for i in ids],
+            "Crawl_time": [crawl_time] * len(ids),
+            "Num_comments": [str(i) for i in ids],
+            "Is_Post_Image": [i % 2 == 0 for i in ids],
+        }
+    )
+
+
+def part_files(dst_dir, partition: str = "*") -> list[str]:
+    return sorted(glob(join(dst_dir, f"crawl_date={partition}", "*.parquet")))
+
+
+def test_records_are_buffered_until_row_group_size(tmp_path):
+    sink = SaveAsParquet(str(tmp_path), row_group_size=4)
+
+    sink(posts(0, 1))
+    assert part_files(tmp_path) == []
+    sink(posts(2, 3))
+    assert len(part_files(tmp_path)) == 1
+    sink(posts(4))
+    sink.flush()
+
+    assert len(part_files(tmp_path)) == 2
+    assert sorted(pq.read_table(tmp_path)["Post_link"].to_pylist()) == sorted(
+        posts(0, 1, 2, 3, 4)["Post_link"]
+    )
+
+
+def test_records_are_partitioned_by_crawl_date_with_typed_columns(tmp_path):
+    sink = SaveAsParquet(str(tmp_path))
+
+    sink(posts(0, 1, crawl_time="2024-09-01 23:59"))
+    sink(posts(2, crawl_time="2024-09-02 00:01"))
+    sink.flush()
+
+    assert [os.path.basename(path) for path in sorted(glob(join(tmp_path, "*")))] == [
+        "crawl_date=2024-09-01",
+        "crawl_date=2024-09-02",
+    ]
+    table = pq.read_table(part_files(tmp_path, "2024-09-01")[0])
+    assert table.num_rows == 2
+    assert table.schema.field("Num_comments").type == pa.int64()
+    assert table.schema.field("Crawl_time").type == pa.timestamp("us")
+    assert table.schema.field("Is_Post_Image").type == pa.bool_()
+    assert table["Crawl_time"][0].as_py() == Timestamp("2024-09-01 23:59")
+
+
+def test_path_format_routes_records_to_their_destination(tmp_path):
+    sink = SaveAsParquet(str(tmp_path.joinpath("{page_id}")))
+
+    sink.set_path_format(page_id="a")
+    sink(posts(0))
+    sink.set_path_format(page_id="b")
+    sink(posts(1, 2))
+    sink.flush()
+
+    assert pq.read_table(tmp_path.joinpath("a")).num_rows == 1
+    assert pq.read_table(tmp_path.joinpath("b")).num_rows == 2
+
+
+def test_compaction_merges_partition_files(tmp_path):
+    sink = SaveAsParquet(str(tmp_path), row_group_size=1)
+    for i in range(3):
+        sink(posts(i))
+    sink.flush()
+    partition_dir = join(tmp_path, "crawl_date=2024-09-01")
+    assert len(part_files(tmp_path)) == 3
+
+    SaveAsParquet.compact(partition_dir)
+
+    (compacted,) = part_files(tmp_path)
+    assert os.path.basename(compacted).startswith("compacted-")
+    assert sorted(pq.read_table(compacted)["Num_comments"].to_pylist()) == [0, 1, 2]
+    # No temporary file is left behind
+    assert os.listdir(partition_dir) == [os.path.basename(compacted)]
+
+
+def test_compaction_on_flush_and_of_all_partitions(tmp_path):
+    sink = SaveAsParquet(str(tmp_path), row_group_size=1, compact_on_flush=True)
+    sink(posts(0))
+    sink(posts(1))
+    sink.flush()
+    assert len(part_files(tmp_path)) == 1
+
+    sink = SaveAsParquet(str(tmp_path), row_group_size=1)
+    sink(posts(2))
+    sink(posts(3, crawl_time="2024-09-02 10:00"))
+    sink.flush()
+    SaveAsParquet.compact_all(str(tmp_path))
+
+    # Partitions with a single file are left as is
+    assert len(part_files(tmp_path, "2024-09-01")) == 1
+    assert len(part_files(tmp_path, "2024-09-02")) == 1
+    assert pq.read_table(tmp_path).num_rows == 4
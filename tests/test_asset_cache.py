@@ -0,0 +1,65 @@
+from utils import AssetCache, Metrics
+
+import hashlib
+
+
+def put(cache: AssetCache, tmp_path, url: str, content: bytes):
+    src_path = tmp_path / hashlib.sha256(url.encode()).hexdigest()
+    src_path.write_bytes(content)
+    return cache.put(url, str(src_path), hashlib.sha256(content).hexdigest())
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = AssetCache(str(tmp_path / "cache"), max_bytes=10)
+    put(cache, tmp_path, "https://cdn.com/a.jpg", b"a" * 4)
+    put(cache, tmp_path, "https://cdn.com/b.jpg", b"b" * 4)
+    assert cache.get("https://cdn.com/a.jpg") is not None
+
+    path = put(cache, tmp_path, "https://cdn.com/c.jpg", b"c" * 4)
+
+    assert path.exists()
+    assert cache.get("https://cdn.com/b.jpg") is None
+    assert cache.get("https://cdn.com/a.jpg") is not None
+    assert cache.total_bytes() == 8
+    cache.close()
+
+
+def test_assets_over_budget_are_not_cached(tmp_path):
+    cache = AssetCache(str(tmp_path / "cache"), max_bytes=10)
+    put(cache, tmp_path, "https://cdn.com/a.jpg", b"a" * 4)
+
+    # Fits only once everything else is evicted
+    path = put(cache, tmp_path, "https://cdn.com/b.jpg", b"b" * 8)
+    assert path.read_bytes() == b"b" * 8
+    assert cache.get("https://cdn.com/a.jpg") is None
+
+    # Never fits, the fetched file is left to the caller
+    src_path = tmp_path / hashlib.sha256(b"https://cdn.com/c.jpg").hexdigest()
+    assert put(cache, tmp_path, "https://cdn.com/c.jpg", b"c" * 11) is None
+    assert src_path.exists()
+    assert cache.get("https://cdn.com/b.jpg") == path
+    assert cache.total_bytes() == 8
+    cache.close()
+
+
+def test_lookups_are_counted_in_metrics(tmp_path):
+    metrics = Metrics()
+    cache = AssetCache(str(tmp_path / "cache"), max_bytes=10, metrics=metrics)
+    put(cache, tmp_path, "https://cdn.com/a.jpg", b"a" * 4)
+
+    cache.get("https://cdn.com/a.jpg")
+    cache.get("https://cdn.com/a.jpg")
+    cache.get("https://cdn.com/b.jpg")
+    put(cache, tmp_path, "https://cdn.com/b.jpg", b"b" * 8)
+
+    counters = {
+        (counter["name"], tuple(counter["labels"].values())): counter["value"]
+        for counter in metrics.to_dict()["counters"]
+    }
+    assert counters == {
+        ("asset_cache_lookups", ("hit",)): 2,
+        ("asset_cache_lookups", ("miss",)): 1,
+        ("asset_cache_bytes_saved", ()): 8,
+        ("asset_cache_evictions", ()): 1,
+    }
+    cache.close()
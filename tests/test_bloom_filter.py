@@ -0,0 +1,47 @@
+from utils.bloom_filter import ScalableBloomFilter
+
+
+def urls(start: int, stop: int) -> list[str]:
+    return [f"https://www.facebook.com/page/posts/{i}" for i in range(start, stop)]
+
+
+def test_filter_grows_past_its_capacity(tmp_path):
+    bloom = ScalableBloomFilter(tmp_path, initial_capacity=100, error_rate=1e-3)
+
+    bloom.update(urls(0, 1000))
+
+    assert len(bloom.stages) > 1
+    assert all(url in bloom for url in urls(0, 1000))
+    # False positive rate stays within the error budget, up to sampling noise
+    false_positives = sum(url in bloom for url in urls(1000, 11000))
+    assert false_positives <= 10 * 3
+    bloom.close()
+
+
+def test_filter_reopens_from_disk(tmp_path):
+    bloom = ScalableBloomFilter(tmp_path, initial_capacity=100, error_rate=1e-3)
+    bloom.update(urls(0, 300))
+    bloom.close()
+
+    reopened = ScalableBloomFilter(tmp_path, initial_capacity=100, error_rate=1e-3)
+
+    assert reopened.exists()
+    assert len(reopened) == len(bloom) == 300
+    assert [stage.capacity for stage in reopened.stages] == [
+        stage.capacity for stage in bloom.stages
+    ]
+    assert all(url in reopened for url in urls(0, 300))
+    # Additions after reopening go on from the last stage
+    reopened.add("https://www.facebook.com/page/posts/new")
+    assert len(reopened) == 301
+    reopened.close()
+
+
+def test_duplicates_are_counted_once(tmp_path):
+    bloom = ScalableBloomFilter(tmp_path)
+
+    bloom.update(urls(0, 10) + urls(0, 10))
+
+    assert len(bloom) == 10
+    assert not ScalableBloomFilter(tmp_path.joinpath("empty")).exists()
+    bloom.close()
@@ -0,0 +1,181 @@
+from benchmarks.suite import PAGE_URL
+from benchmarks.replay_driver import ReplayDriver
+from benchmarks.feed import synthetic_posts, synthetic_feed
+from crawlers.page_crawler.crawler import Crawler
+from crawlers.page_crawler.scripts import LAST_POST_DATE_HINTS_JS
+from crawlers.page_crawler.selectors import SELECTORS
+from utils.parsing import parse_post_date_hint
+
+import shutil
+import pytest
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+UTIME = 1725174000
+# Timestamp link of the last post, with the date embedded and labelled below the link instead of on it
+LAST_ANCHOR = (
+    '<span data-utime="{utime}"></span><a href="{href}">'
+    '<span aria-label="1 tháng 9, 2024"><abbr title="1 tháng 9, 2024 lúc 7:00">1 giờ</abbr></span></a>'
+)
+
+
+def feed_html(n_posts: int = 3) -> str:
+    posts = synthetic_posts(n_posts)
+    html = synthetic_feed(posts)
+    last = posts[-1]
+    start = html.rindex(f'<a href="{last.link}')
+    end = html.index("</a>", start) + len("</a>")
+    return (
+        html[:start]
+        + LAST_ANCHOR.format(utime=UTIME, href=html[start:end].split('"')[1])
+        + html[end:]
+    )
+
+
+def hints(driver) -> list[str]:
+    return driver.execute_script(
+        LAST_POST_DATE_HINTS_JS,
+        Crawler.posts_xpath,
+        list(SELECTORS.post_datetime_anchor.xpaths),
+    )
+
+
+@pytest.mark.parametrize(
+    "hint, expected",
+    [
+        (f"utime:{UTIME}", (datetime.fromtimestamp(UTIME), True)),
+        ("1 tháng 9, 2024 lúc 7:05", (datetime(2024, 9, 1, 7, 5), True)),
+        ("Chủ Nhật, 1 tháng 9, 2024 lúc 7:05", (datetime(2024, 9, 1, 7, 5), True)),
+        ("1 tháng 9, 2024", (datetime(2024, 9, 1), False)),
+        ("  1 Tháng 9, 2024 ", (datetime(2024, 9, 1), False)),
+        ("31 tháng 2, 2024", (None, False)),
+        ("Facebook", (None, False)),
+        ("", (None, False)),
+    ],
+)
+def test_parse_post_date_hint(hint, expected):
+    assert parse_post_date_hint(hint) == expected
+
+
+def test_parse_relative_and_yearless_hints():
+    date, exact = parse_post_date_hint("5 giờ")
+    assert not exact
+    # Earliest the post could date from, rounding the shown amount up
+    assert timedelta(hours=6) <= datetime.now() - date < timedelta(hours=6, minutes=1)
+
+    date, exact = parse_post_date_hint("3 tháng 9 lúc 10:05")
+    assert exact and (date.month, date.day, date.hour) == (9, 3, 10)
+    # Dates shown without year are of the last year they could be
+    assert date <= datetime.now() < date.replace(year=date.year + 1)
+
+
+def test_hints_follow_the_script_order():
+    driver = ReplayDriver(feed_html(), url=PAGE_URL, page_size=3)
+
+    assert hints(driver) == [
+        f"utime:{UTIME}",
+        "1 tháng 9, 2024",
+        "1 tháng 9, 2024 lúc 7:00",
+        "1 giờ",
+    ]
+
+
+def test_hints_fall_back_when_the_primary_selector_misses():
+    driver = ReplayDriver(synthetic_feed(synthetic_posts(3)), url=PAGE_URL, page_size=3)
+    anchor_xpaths = list(SELECTORS.post_datetime_anchor.xpaths)
+    date = synthetic_posts(3)[-1].date
+
+    assert driver.execute_script(
+        LAST_POST_DATE_HINTS_JS,
+        Crawler.posts_xpath,
+        ["./descendant::div[@data-outdated]//a", *anchor_xpaths[1:]],
+    )[0] == (f"{date.day} tháng {date.month}, {date.year}")
+    assert (
+        driver.execute_script(
+            LAST_POST_DATE_HINTS_JS, Crawler.posts_xpath, ["./descendant::nav//a"]
+        )
+        == []
+    )
+
+
+class HintsDriver:
+    """Driver answering the date hints script with fixed hints"""
+
+    def __init__(self, hints: list[str | None]) -> None:
+        self.hints = hints
+
+    def execute_script(self, script: str, *args):
+        assert script == LAST_POST_DATE_HINTS_JS
+        return self.hints
+
+
+@pytest.fixture
+def criterion(monkeypatch):
+    criterion = Crawler.PostCollectCriterion(
+        "post_time", threshold=datetime(2024, 8, 1)
+    )
+    criterion.hovered = 0
+
+    def hover_last_post_date(driver):
+        criterion.hovered += 1
+        return datetime(2024, 8, 15, 12, 0)
+
+    monkeypatch.setattr(criterion, "hover_last_post_date", hover_last_post_date)
+    return criterion
+
+
+def test_exact_hint_is_used_without_hovering(criterion):
+    driver = HintsDriver([None, "Facebook", "1 giờ", "1 tháng 9, 2024 lúc 7:05"])
+
+    date = criterion.last_post_date(driver, criterion.threshold, n_new_posts=3)
+
+    assert date == datetime(2024, 9, 1, 7, 5)
+    assert criterion.hovered == 0
+    assert criterion.date_samples == [(0, date), (0, date)]
+
+
+def test_inexact_hint_newer_than_threshold_skips_hovering(criterion):
+    driver = HintsDriver(["1 tháng 9, 2024", "Facebook"])
+
+    date = criterion.last_post_date(driver, criterion.threshold, n_new_posts=3)
+
+    assert date == datetime(2024, 9, 1)
+    assert criterion.hovered == 0
+    # Inexact dates are no sample to extrapolate from
+    assert criterion.date_samples == []
+
+
+def test_hint_near_threshold_is_hovered(criterion):
+    driver = HintsDriver(["1 tháng 8, 2024", "Facebook"])
+
+    date = criterion.last_post_date(driver, datetime(2024, 8, 2), n_new_posts=3)
+
+    assert date == datetime(2024, 8, 15, 12, 0)
+    assert criterion.hovered == 1
+
+
+@pytest.fixture
+def chrome():
+    if not any(
+        shutil.which(name)
+        for name in ["google-chrome", "chromium", "chromium-browser", "chrome"]
+    ):
+        pytest.skip("No Chrome browser installed")
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    try:
+        driver = webdriver.Chrome(options=options)
+    except Exception as e:
+        pytest.skip(f"Chrome failed to start: {e}")
+    yield driver
+    driver.quit()
+
+
+def test_script_in_browser_matches_replay(chrome):
+    html = feed_html()
+    chrome.get(f"data:text/html;charset=utf-8,{quote(html)}")
+
+    assert hints(chrome) == hints(ReplayDriver(html, url=PAGE_URL, page_size=3))
@@ -0,0 +1,172 @@
+from pipeline import Pipeline, Deduplicate, SaveAsCSV, SaveAsParquet, BaseStep
+from pipeline.deduplicate import UPDATE_COLUMN
+
+import pytest
+import pyarrow.parquet as pq
+from os.path import join, exists
+from pandas import DataFrame, read_csv
+
+UPSERT_COLUMNS = ["Num_comments", "Num_share"]
+
+
+def posts(*ids: int, comments: int = 0, crawl_time: str = "2024-09-01 10:00") -> dict:
+    return {
+        "Post_link": [f"https://www.facebook.com/bench/posts/{i}" for i in ids],
+        "Content": [f"post {i}" for i in ids],
+        "Num_comments": [comments] * len(ids),
+        "Num_share": [0] * len(ids),
+        "Crawl_time": [crawl_time] * len(ids),
+    }
+
+
+class FailingStep(BaseStep):
+    def __init__(self) -> None:
+        self.fail = False
+
+    def __call__(self, df: DataFrame) -> DataFrame:
+        if self.fail:
+            raise OSError("disk unavailable")
+        return df
+
+
+def links(df: DataFrame) -> list[int]:
+    return [int(link.rsplit("/", 1)[1]) for link in df["Post_link"]]
+
+
+def test_seen_records_are_dropped_once_flushed(tmp_path):
+    dedup = Deduplicate(str(tmp_path))
+    pipeline = Pipeline(dedup)
+
+    assert links(pipeline(posts(0, 1, 1))) == [0, 1]
+    # Staged keys already count within the same flush interval
+    assert links(pipeline(posts(1, 2))) == [2]
+    pipeline.flush()
+
+    reopened = Pipeline(Deduplicate(str(tmp_path)))
+    assert links(reopened(posts(0, 2, 3))) == [3]
+    assert UPDATE_COLUMN not in reopened(posts(4)).columns
+
+
+def test_keys_are_not_committed_when_later_steps_fail(tmp_path):
+    failing = FailingStep()
+    pipeline = Pipeline(Deduplicate(str(tmp_path)), failing)
+
+    failing.fail = True
+    with pytest.raises(OSError):
+        pipeline(posts(0))
+    failing.fail = False
+    # The retried input is not dropped as seen
+    assert links(pipeline(posts(0))) == [0]
+
+
+def test_keys_are_discarded_when_flush_fails(tmp_path):
+    class FailingSink(BaseStep):
+        def flush(self):
+            raise OSError("disk unavailable")
+
+        def __call__(self, df):
+            return df
+
+    pipeline = Pipeline(Deduplicate(str(tmp_path)), FailingSink())
+    pipeline(posts(0))
+    with pytest.raises(OSError):
+        pipeline.flush()
+
+    assert links(Pipeline(Deduplicate(str(tmp_path)))(posts(0))) == [0]
+
+
+def test_colliding_keys_keep_both_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(Deduplicate, "hash_key", staticmethod(lambda key: 1))
+    pipeline = Pipeline(Deduplicate(str(tmp_path)))
+
+    pipeline(posts(0))
+    pipeline.flush()
+
+    assert links(pipeline(posts(1))) == [1]
+
+
+def test_upsert_passes_changed_records_as_updates(tmp_path):
+    dedup = Deduplicate(str(tmp_path), upsert_columns=UPSERT_COLUMNS)
+    pipeline = Pipeline(dedup)
+    pipeline(posts(0, 1, comments=1))
+    pipeline.flush()
+
+    df = pipeline(
+        {
+            **posts(0, 1, 2, comments=1),
+            "Num_comments": [5, 1, 1],
+        }
+    )
+
+    assert links(df) == [0, 2]
+    assert df[UPDATE_COLUMN].tolist() == [True, False]
+    pipeline.flush()
+    latest = dedup.lookup(posts(0, 1)["Post_link"]).set_index("Post_link")
+    assert latest.loc[posts(0, 1)["Post_link"], "Num_comments"].tolist() == [5, 1]
+    # Unchanged since
+    assert len(pipeline(posts(0, comments=5))) == 0
+
+
+def test_csv_updates_are_merged_in_place(tmp_path):
+    pipeline = Pipeline(
+        Deduplicate(str(tmp_path), upsert_columns=UPSERT_COLUMNS),
+        SaveAsCSV(str(tmp_path)),
+    )
+    pipeline(posts(0, 1, comments=1))
+    pipeline.flush()
+    pipeline(posts(1, 2, comments=7, crawl_time="2024-09-02 10:00"))
+    pipeline.flush()
+
+    assert read_csv(join(tmp_path, "data.csv"))["Num_comments"].tolist() == [1, 1, 7]
+    updates = read_csv(join(tmp_path, "updates.csv"))
+    assert links(updates) == [1] and UPDATE_COLUMN not in updates.columns
+
+    SaveAsCSV.merge_updates(str(tmp_path))
+
+    data = read_csv(join(tmp_path, "data.csv"))
+    assert links(data) == [0, 1, 2]
+    assert data["Num_comments"].tolist() == [1, 7, 7]
+    assert data["Crawl_time"].tolist()[1] == "2024-09-02 10:00"
+    assert not exists(join(tmp_path, "updates.csv"))
+
+
+def test_csv_updates_are_merged_on_flush(tmp_path):
+    pipeline = Pipeline(
+        Deduplicate(str(tmp_path), upsert_columns=UPSERT_COLUMNS),
+        SaveAsCSV(str(tmp_path), merge_on_flush=True),
+    )
+    pipeline(posts(0, comments=1))
+    pipeline.flush()
+    pipeline(posts(0, comments=2))
+    pipeline.flush()
+
+    assert read_csv(join(tmp_path, "data.csv"))["Num_comments"].tolist() == [2]
+    assert not exists(join(tmp_path, "updates.csv"))
+
+
+def test_parquet_updates_are_merged_into_their_partition(tmp_path):
+    data_dir = tmp_path.joinpath("data")
+    pipeline = Pipeline(
+        Deduplicate(str(tmp_path), upsert_columns=UPSERT_COLUMNS),
+        SaveAsParquet(str(data_dir)),
+    )
+    pipeline(posts(0, 1, comments=1))
+    pipeline.flush()
+    pipeline(posts(1, 2, comments=7, crawl_time="2024-09-02 10:00"))
+    pipeline({**posts(1, crawl_time="2024-09-03 10:00"), "Num_comments": [9]})
+    pipeline.flush()
+
+    # Updates are stored apart, out of the dataset
+    dataset = pq.read_table(data_dir).to_pandas()
+    assert sorted(links(dataset)) == [0, 1, 2]
+    assert UPDATE_COLUMN not in dataset.columns
+
+    SaveAsParquet.compact_all(str(data_dir), key="Post_link")
+
+    first_day = pq.read_table(join(data_dir, "crawl_date=2024-09-01")).to_pandas()
+    assert links(first_day) == [0, 1]
+    assert first_day["Num_comments"].tolist() == [1, 9]
+    assert pq.read_table(data_dir).num_rows == 3
+    assert pq.read_table(join(data_dir, "crawl_date=2024-09-01")).schema.equals(
+        pq.read_table(join(data_dir, "crawl_date=2024-09-02")).schema
+    )
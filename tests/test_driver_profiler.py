@@ -0,0 +1,23 @@
+from utils import DriverProfiler
+
+from .conftest import ROOT_DIR
+
+
+def test_lookups_from_parse_post_rank_under_crawler(replay_crawler):
+    crawler = replay_crawler(n_posts=5)
+    profiler = DriverProfiler(root_dir=ROOT_DIR)
+    profiler.attach(crawler.chrome)
+
+    for i, post_div in enumerate(crawler.get_loaded_posts()):
+        crawler.parse_post(i, post_div)
+
+    ranked = profiler.ranked()
+    assert len(ranked) > 0
+    assert ranked[0]["location"].startswith("crawlers/page_crawler/crawler.py:")
+    assert all(
+        not item["location"].startswith(("utils/selectors.py", "benchmarks/"))
+        for item in ranked
+    )
+    lookups = [item for item in ranked if item["command"] == "findChildElement"]
+    assert len(lookups) > 0
+    assert all("(parse_post)" in item["location"] for item in lookups)
@@ -0,0 +1,110 @@
+from crawlers.page_crawler.network import (
+    NetworkCapture,
+    iter_json_documents,
+    parse_payloads,
+    replay,
+)
+from benchmarks.replay_driver import ReplayDriver
+
+import os
+from glob import glob
+from datetime import datetime
+
+from .conftest import FIXTURES_DIR
+
+RECORD_DIR = os.path.join(FIXTURES_DIR, "network")
+PAGE = "https://www.facebook.com/UnderArmourVietnam/posts/"
+
+
+def read_recording() -> tuple[list[str], str]:
+    bodies = []
+    for path in sorted(glob(os.path.join(RECORD_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            bodies.append(f.read())
+    with open(os.path.join(RECORD_DIR, "page.html"), "r", encoding="utf-8") as f:
+        return bodies, f.read()
+
+
+def test_replay_maps_stories_to_records_in_feed_order():
+    records = replay(RECORD_DIR)
+
+    # Shared story inside pfbid0c is not a post of its own, pfbid0c sent twice is kept once
+    assert [record["Post_link"] for record in records] == [
+        PAGE + "pfbid0a",
+        PAGE + "pfbid0b",
+        PAGE + "pfbid0c",
+        PAGE + "pfbid0d",
+        PAGE + "pfbid0e",
+    ]
+    assert all(record["Owner"] == "Under Armour Vietnam" for record in records)
+    assert [record["Post_date"] for record in records] == [
+        datetime.fromtimestamp(timestamp)
+        for timestamp in [1725148800, 1725062400, 1724976000, 1724889600, 1724803200]
+    ]
+
+
+def test_replay_extracts_content_and_media():
+    first, second, shared, _, image_only = replay(RECORD_DIR)
+
+    assert first["Content"] == "Ra mắt giày chạy bộ mới"
+    assert first["Hashtag"] == "#UnderArmour #Running"
+    assert (first["Is_Post_Image"], first["Is_Post_Video"]) == (False, True)
+    assert (second["Is_Post_Image"], second["Is_Post_Video"]) == (True, False)
+    # Text of the shared story doesn't leak into the sharing post
+    assert shared["Content"] == "Chia sẻ lại bài viết 😀"
+    assert (shared["Is_Post_Image"], shared["Is_Post_Video"]) == (False, False)
+    assert image_only["Content"] == ""
+    assert image_only["Is_Post_Image"]
+
+
+def test_replay_extracts_engagement():
+    first, second, shared, fourth, image_only = replay(RECORD_DIR)
+
+    assert first["Reaction"] == "like (120);love (14)"
+    assert first["Num_reactions"] == 134
+    assert (first["Num_comments"], first["Num_share"]) == (31, 9)
+    assert second["Reaction"] == "like (12);love (3)"
+    # Total given apart from the top reactions takes precedence over their sum
+    assert shared["Reaction"] == "like (10);haha (5)"
+    assert shared["Num_reactions"] == 18
+    # First occurrence wins over the copy sent later in the stream
+    assert shared["Num_share"] == 0
+    assert fourth["Reaction"] == "wow (2)"
+    assert image_only["Reaction"] == ""
+    assert image_only["Num_reactions"] == 0
+    assert (image_only["Num_comments"], image_only["Num_share"]) == (5, 0)
+
+
+def test_parse_payloads_without_page_html():
+    bodies, _ = read_recording()
+
+    records = parse_payloads(bodies)
+
+    assert [record["Post_link"] for record in records] == [
+        PAGE + f"pfbid0{letter}" for letter in "bcde"
+    ]
+
+
+def test_iter_json_documents_skips_prefix_and_garbage():
+    body = 'for (;;);{"a": 1}\n\nnot json\n{"b": 2}\n'
+
+    assert list(iter_json_documents(body)) == [{"a": 1}, {"b": 2}]
+
+
+def test_capture_collects_and_records_graphql_bodies(tmp_path):
+    bodies, html = read_recording()
+    driver = ReplayDriver(html, responses=bodies)
+    capture = NetworkCapture(record_dir=str(tmp_path))
+
+    assert capture.collect(driver) == 1
+    driver.scroll()
+    assert capture.collect(driver) == 1
+    assert capture.collect(driver) == 0
+
+    assert capture.pop_bodies() == bodies
+    assert capture.pop_bodies() == []
+    recorded = sorted(glob(os.path.join(tmp_path, "*.txt")))
+    assert [os.path.basename(path) for path in recorded] == ["00000.txt", "00001.txt"]
+    assert [record["Post_link"] for record in replay(str(tmp_path))] == [
+        record["Post_link"] for record in parse_payloads(bodies)
+    ]
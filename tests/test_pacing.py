@@ -0,0 +1,64 @@
+from utils.pacing import PacingController, RENDER_STATE_JS
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+
+class RenderStateDriver:
+    """Driver reporting a fixed render state, as a page that never settles"""
+
+    def __init__(self, n_items: int, quiet_ms: float, n_resources=None) -> None:
+        self.n_items = n_items
+        self.quiet_ms = quiet_ms
+        self.n_resources = n_resources
+        self.n_calls = 0
+
+    def execute_script(self, script: str, xpath: str):
+        assert script == RENDER_STATE_JS
+        self.n_calls += 1
+        return dict(
+            n_items=self.n_items,
+            quiet_ms=self.quiet_ms,
+            n_resources=(
+                self.n_calls if self.n_resources is None else self.n_resources
+            ),
+        )
+
+
+@pytest.fixture
+def pacing() -> PacingController:
+    return PacingController(budgets={"scroll": 1.0}, poll_interval=0.01)
+
+
+def test_settled_page_returns_before_timeout(pacing):
+    driver = RenderStateDriver(n_items=5, quiet_ms=1000, n_resources=3)
+
+    n_items, elapsed = pacing.wait_for_items(driver, "//post", 5, timeout=10)
+
+    assert n_items == 5
+    assert elapsed < 1
+    assert driver.n_calls == 2
+    assert "scroll" in pacing.latency
+
+
+@pytest.mark.parametrize(
+    "driver",
+    [
+        RenderStateDriver(n_items=5, quiet_ms=0, n_resources=3),
+        RenderStateDriver(n_items=5, quiet_ms=1000),
+    ],
+    ids=["mutating", "loading"],
+)
+def test_unsettled_page_returns_rendered_items_after_timeout(pacing, driver):
+    n_items, elapsed = pacing.wait_for_items(driver, "//post", 5, timeout=0.05)
+
+    assert n_items == 5
+    assert elapsed > 0.05
+
+
+def test_missing_items_time_out(pacing):
+    driver = RenderStateDriver(n_items=4, quiet_ms=1000, n_resources=3)
+
+    with pytest.raises(TimeoutException):
+        pacing.wait_for_items(driver, "//post", 5, timeout=0.05)
+    assert "scroll" not in pacing.latency
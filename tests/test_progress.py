@@ -0,0 +1,166 @@
+from utils.progress import Progress, SharedProgress
+
+import sys
+import textwrap
+import threading
+import subprocess
+import pytest
+
+from .conftest import ROOT_DIR
+
+
+def run_killed(code: str):
+    """Run `code` in a fresh interpreter, which is killed without any cleanup where it calls `kill()`"""
+    script = "import os\nkill = lambda: os._exit(1)\n" + textwrap.dedent(code)
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    assert result.returncode == 1, result.stderr
+
+
+@pytest.fixture(params=["set", "bloom"])
+def history_backend(request) -> str:
+    return request.param
+
+
+def test_journal_reloads_queue_and_history(tmp_path, history_backend):
+    progress = Progress(tmp_path, history_backend=history_backend)
+    progress.enqueue_list(["b", "c"])
+    progress.enqueue("a", side="left")
+    progress.add_history(progress.next_url())
+    progress.enqueue("d")
+    progress.db.close()
+
+    progress = Progress(tmp_path, history_backend=history_backend)
+
+    assert list(progress.queue) == ["b", "c", "d"]
+    assert "a" in progress.history
+    assert progress.is_known("a") and progress.is_known("c")
+    assert not progress.is_known("e")
+
+
+def test_dedup_checks_follow_queue_and_history(tmp_path):
+    progress = Progress(tmp_path)
+    progress.selectively_enqueue_list(["a", "b", "a"])
+    progress.selectively_enqueue("b")
+    assert list(progress.queue) == ["a", "b"]
+
+    progress.add_history(progress.next_url())
+    progress.selectively_enqueue("a")
+    progress.selectively_enqueue("a", ignore="history")
+    assert list(progress.queue) == ["b", "a"]
+    assert dict(progress.queued) == {"a": 1, "b": 1}
+
+
+def test_text_files_are_imported(tmp_path):
+    tmp_path.joinpath("history.txt").write_text("a\nb\n")
+    tmp_path.joinpath("queue.txt").write_text("c\nd\n")
+
+    progress = Progress(tmp_path)
+
+    assert progress.history == {"a", "b"}
+    assert list(progress.queue) == ["c", "d"]
+
+
+def test_claimed_urls_survive_a_kill(tmp_path, history_backend):
+    run_killed(f"""
+        from utils.progress import Progress
+        progress = Progress({str(tmp_path)!r}, history_backend={history_backend!r})
+        progress.enqueue_list(["a", "b", "c", "d"])
+        progress.add_history(progress.next_url())
+        progress.next_url()
+        progress.next_url()
+        kill()
+        """)
+
+    progress = Progress(tmp_path, history_backend=history_backend)
+
+    assert list(progress.queue) == ["b", "c", "d"]
+    assert "a" in progress.history
+    assert not progress.propagated("b")
+    # Restored claims are not restored twice
+    progress.db.close()
+    assert list(Progress(tmp_path, history_backend=history_backend).queue) == [
+        "b",
+        "c",
+        "d",
+    ]
+
+
+def test_restored_claims_are_not_duplicated(tmp_path):
+    progress = Progress(tmp_path)
+    progress.enqueue_list(["a", "b"])
+    # Crawl failed, URL back to queue
+    progress.enqueue(progress.next_url(), side="left")
+    progress.next_url()
+    progress.db.close()
+
+    assert list(Progress(tmp_path).queue) == ["a", "b"]
+
+
+def test_crawler_killed_before_history_write_recovers_url(tmp_path):
+    # Records are acknowledged, and the URL recorded in history, only once the pipeline is flushed
+    run_killed(f"""
+        import logging
+        logging.disable(logging.INFO)
+        from benchmarks.suite import make_crawler, PAGE_URL
+        from benchmarks.replay_driver import ReplayDriver
+        from benchmarks.feed import synthetic_posts, synthetic_feed
+
+        driver = ReplayDriver(synthetic_feed(synthetic_posts(3)), url=PAGE_URL, page_size=3)
+        crawler = make_crawler({str(tmp_path)!r}, driver, 3, "snapshot")
+        crawler.seed_frontier([PAGE_URL])
+        url = crawler.progress.next_url()
+        assert crawler.crawl_url(url) is None
+        assert url in crawler.pending_writes and url not in crawler.progress.history
+        kill()
+        """)
+
+    progress = Progress(tmp_path.joinpath("progress"))
+
+    assert list(progress.queue) == ["https://www.facebook.com/bench"]
+    assert len(progress.history) == 0
+
+
+def test_shared_progress_waits_for_busy_workers(tmp_path):
+    progress = SharedProgress(tmp_path)
+    progress.enqueue("a")
+    assert progress.claim_url() == "a"
+
+    claimed = []
+    waiter = threading.Thread(target=lambda: claimed.append(progress.claim_url()))
+    waiter.start()
+    # Busy worker enqueues a new URL, then completes its own
+    progress.enqueue("b")
+    progress.add_history("a")
+    progress.release_url()
+    waiter.join(timeout=5)
+    assert claimed == ["b"]
+
+    # No URL left and no worker busy but the one asking
+    progress.add_history("b")
+    progress.release_url()
+    assert progress.claim_url() is None
+    progress.db.close()
+    assert list(SharedProgress(tmp_path).queue) == []
+
+
+def test_queue_index_stays_in_sync(tmp_path):
+    progress = Progress(tmp_path)
+    progress.enqueue_list(["a", "b", "a"])
+    progress.enqueue("c", side="left")
+
+    assert progress.queued == {"a": 2, "b": 1, "c": 1}
+    assert progress.next_url() == "c"
+    assert progress.next_url() == "a"
+    # Still queued once more
+    assert progress.is_known("a")
+    assert progress.next_url() == "b"
+    assert progress.next_url() == "a"
+    assert not progress.is_known("a") and len(progress.queued) == 0
+
+    for url in "abc":
+        progress.add_history(url)
+    progress.enqueue_list(["d", "d"])
+    progress.db.close()
+    assert Progress(tmp_path).queued == {"d": 2}
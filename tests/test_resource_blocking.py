@@ -0,0 +1,100 @@
+from crawlers.page_crawler.crawler import Crawler
+from pipeline import Pipeline
+from utils.resource_blocking import (
+    BLOCKING_PRESETS,
+    KEPT_URLS,
+    ResourceBlocker,
+    url_pattern_regex,
+)
+
+import pytest
+
+# Requests of a feed load each preset is expected to block
+BLOCKED_URLS = {
+    "media": [
+        "https://scontent.fhan2-3.fna.fbcdn.net/v/t39.30808-6/461_n.jpg?_nc_cat=1&oh=00_AYB",
+        "https://external.fhan2-4.fna.fbcdn.net/emg1/v/t13/123?url=https%3A%2F%2Fshop.vn%2Fa.png",
+        "https://static.xx.fbcdn.net/rsrc.php/v3/yb/r/GJ9dcJCfzHK.png",
+        "https://static.xx.fbcdn.net/images/emoji.php/v9/t5e/1/16/1f600.svg",
+        "https://video.fhan2-1.fna.fbcdn.net/o1/v/t2/f2/m69/AQN.mp4?efg=eyJ2",
+        "https://static.xx.fbcdn.net/rsrc.php/v3/yP/r/Optimistic.woff2",
+    ],
+    "analytics": [
+        "https://www.facebook.com/ajax/bz",
+        "https://www.facebook.com/tr/?id=1&ev=PageView",
+        "https://connect.facebook.net/en_US/fbevents.js",
+        "https://www.googletagmanager.com/gtag/js?id=G-1",
+        "https://stats.g.doubleclick.net/g/collect?v=2",
+    ],
+}
+BLOCKED_URLS["feed"] = BLOCKED_URLS["media"] + BLOCKED_URLS["analytics"]
+
+
+def is_blocked(url: str, patterns: list[str]) -> bool:
+    return any(url_pattern_regex(pattern).fullmatch(url) for pattern in patterns)
+
+
+@pytest.mark.parametrize("preset", list(BLOCKING_PRESETS))
+def test_presets_keep_required_requests(preset):
+    patterns = ResourceBlocker(preset).patterns
+
+    assert [url for url in KEPT_URLS if is_blocked(url, patterns)] == []
+
+
+@pytest.mark.parametrize("preset", ["media", "analytics", "feed"])
+def test_presets_block_their_requests(preset):
+    patterns = ResourceBlocker(preset).patterns
+
+    assert [url for url in BLOCKED_URLS[preset] if not is_blocked(url, patterns)] == []
+
+
+def test_pattern_matching_follows_cdp_wildcards():
+    assert url_pattern_regex("*.png").fullmatch("https://a.com/x.png")
+    assert not url_pattern_regex("*.png").fullmatch("https://a.com/x.pngs")
+    assert not url_pattern_regex("*.png").fullmatch("https://a.com/x.png?size=2")
+    # '?' stands for any single character, not a query string
+    assert url_pattern_regex("*.png?*").fullmatch("https://a.com/x.pngs")
+    assert not url_pattern_regex("*.png?*").fullmatch("https://a.com/x.png")
+
+
+@pytest.mark.parametrize(
+    "pattern", ["*.gif*", "*.ico*", "*.mp4*", "*://www.facebook.com/tr*"]
+)
+def test_substring_patterns_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        ResourceBlocker([pattern])
+
+
+def make_crawler(tmp_path, **kwargs) -> Crawler:
+    return Crawler(
+        page_id="bench",
+        post_collect_threshold=1,
+        chromedriver_path="chromedriver",
+        navigate_link_extractor=None,
+        parse_link_extractor=None,
+        crawler_dir=str(tmp_path),
+        data_pipeline=Pipeline(),
+        user="bench",
+        secrets_file="",
+        cookies_save_dir=str(tmp_path),
+        async_pipeline=False,
+        **kwargs,
+    )
+
+
+def test_blocking_is_opt_in_when_attached(tmp_path):
+    assert make_crawler(tmp_path).resource_blocker.patterns == (
+        BLOCKING_PRESETS["feed"]
+    )
+    assert (
+        make_crawler(
+            tmp_path, debugger_address="127.0.0.1:9222", reuse_tab=True
+        ).resource_blocker.patterns
+        == []
+    )
+    assert (
+        make_crawler(
+            tmp_path, debugger_address="127.0.0.1:9222", blocked_resources="analytics"
+        ).resource_blocker.patterns
+        == BLOCKING_PRESETS["analytics"]
+    )
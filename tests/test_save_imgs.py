@@ -0,0 +1,169 @@
+from pipeline import Pipeline, SaveImages
+from utils import AssetCache, Metrics
+
+import os
+import logging
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pandas import DataFrame
+
+IMAGES = {
+    "/a.jpg": b"\xff\xd8 image a",
+    "/b.jpg": b"\xff\xd8 image b",
+    # Same content as /a.jpg, as served by another CDN node
+    "/a-copy.jpg": b"\xff\xd8 image a",
+}
+
+logging.disable(logging.INFO)
+
+
+class ImageServer(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), ImageHandler)
+        self.requests: list[str] = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        content = IMAGES.get(self.path)
+        if self.path == "/error.jpg":
+            self.send_error(500)
+            return
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ImageServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def posts(server: ImageServer, images: dict[str, list[str]]) -> DataFrame:
+    """One post row per post id, with the served `images` paths"""
+    return DataFrame(
+        [
+            {
+                "type": "post",
+                "post_id": post_id,
+                "cmt_id": "",
+                "images": " ".join(server.url(path) for path in paths),
+            }
+            for post_id, paths in images.items()
+        ]
+    )
+
+
+def test_identical_content_is_stored_once(server, tmp_path):
+    save_images = SaveImages(str(tmp_path / "imgs"), img_url_col="images")
+
+    df = save_images(posts(server, {"p1": ["/a.jpg", "/b.jpg"], "p2": ["/a-copy.jpg"]}))
+
+    assert df["image_paths"].tolist() == ["p1__0.jpg   p1__1.jpg", "p2__0.jpg"]
+    first, copy = tmp_path / "imgs" / "p1__0.jpg", tmp_path / "imgs" / "p2__0.jpg"
+    assert copy.read_bytes() == IMAGES["/a.jpg"]
+    assert os.path.samefile(first, copy)
+    assert not os.path.samefile(first, tmp_path / "imgs" / "p1__1.jpg")
+    # No partial download is left behind
+    assert sorted(os.listdir(tmp_path / "imgs")) == [
+        "p1__0.jpg",
+        "p1__1.jpg",
+        "p2__0.jpg",
+    ]
+
+
+def test_existing_files_are_not_fetched_again(server, tmp_path):
+    save_images = SaveImages(str(tmp_path / "imgs"), img_url_col="images")
+    df = posts(server, {"p1": ["/a.jpg"]})
+
+    save_images(df)
+    save_images(df)
+
+    assert server.requests == ["/a.jpg"]
+
+
+def test_cached_assets_are_hard_linked(server, tmp_path):
+    cache = AssetCache(str(tmp_path / "cache"))
+    df = posts(server, {"p1": ["/a.jpg", "/a-copy.jpg"]})
+
+    SaveImages(str(tmp_path / "crawl1"), img_url_col="images", cache=cache)(df)
+    SaveImages(str(tmp_path / "crawl2"), img_url_col="images", cache=cache)(df)
+
+    # The second crawl is served from the cache only
+    assert sorted(server.requests) == ["/a-copy.jpg", "/a.jpg"]
+    assert (cache.hits, cache.misses) == (2, 2)
+    blob = cache.get(server.url("/a.jpg"))
+    assert blob == cache.get(server.url("/a-copy.jpg"))
+    for crawl in ("crawl1", "crawl2"):
+        for name in ("p1__0.jpg", "p1__1.jpg"):
+            assert os.path.samefile(tmp_path / crawl / name, blob)
+    assert blob.read_bytes() == IMAGES["/a.jpg"]
+    cache.close()
+
+
+def test_images_over_cache_budget_are_saved(server, tmp_path):
+    metrics = Metrics()
+    cache = AssetCache(str(tmp_path / "cache"), max_bytes=len(IMAGES["/a.jpg"]) - 1)
+    pipeline = Pipeline(
+        SaveImages(str(tmp_path / "imgs"), img_url_col="images", cache=cache)
+    )
+    pipeline.set_metrics(metrics)
+
+    df = pipeline(posts(server, {"p1": ["/a.jpg"]}).to_dict("list"))
+
+    assert df["image_paths"].tolist() == ["p1__0.jpg"]
+    assert (tmp_path / "imgs" / "p1__0.jpg").read_bytes() == IMAGES["/a.jpg"]
+    assert cache.total_bytes() == 0
+    assert metrics.count("asset_cache_lookups") == 1
+    cache.close()
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_missing_images_are_skipped(server, tmp_path, use_cache):
+    cache = AssetCache(str(tmp_path / "cache")) if use_cache else None
+    save_images = SaveImages(str(tmp_path / "imgs"), img_url_col="images", cache=cache)
+
+    df = save_images(posts(server, {"p1": ["/missing.jpg", "/b.jpg"]}))
+
+    assert df["image_paths"].tolist() == ["   p1__1.jpg"]
+    # A 404 is not retried
+    assert sorted(server.requests) == ["/b.jpg", "/missing.jpg"]
+    assert os.listdir(tmp_path / "imgs") == ["p1__1.jpg"]
+    if cache is not None:
+        assert cache.get(server.url("/missing.jpg")) is None
+        assert cache.total_bytes() == len(IMAGES["/b.jpg"])
+        cache.close()
+
+
+def test_failed_images_fail_the_batch(server, tmp_path):
+    save_images = SaveImages(
+        str(tmp_path / "imgs"), img_url_col="images", max_retries=0
+    )
+
+    with pytest.raises(RuntimeError, match="1/2 images"):
+        save_images(posts(server, {"p1": ["/b.jpg", "/error.jpg"]}))
+
+    # Images saved before the failure are kept, the retried batch fetches the others only
+    assert os.listdir(tmp_path / "imgs") == ["p1__0.jpg"]
+    server.requests.clear()
+    with pytest.raises(RuntimeError):
+        save_images(posts(server, {"p1": ["/b.jpg", "/error.jpg"]}))
+    assert server.requests == ["/error.jpg"]
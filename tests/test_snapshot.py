@@ -0,0 +1,110 @@
+from crawlers.page_crawler.crawler import Crawler
+from crawlers.page_crawler.snapshot import FeedSnapshot, parse_post_link
+
+import os
+import json
+import pytest
+
+from .conftest import FIXTURES_DIR
+
+# Hand-written feed in the page markup the selectors target, not a saved page
+FEED_DIR = os.path.join(FIXTURES_DIR, "synthetic_feed")
+# Fields read without hovering, which snapshot parsing extracts on its own
+FIELDS = [
+    "Post_link",
+    "Owner",
+    "Location",
+    "Content",
+    "Hashtag",
+    "Is_Post_Image",
+    "Is_Post_Video",
+    "Num_comments",
+    "Num_share",
+]
+
+
+@pytest.fixture
+def feed_html() -> str:
+    with open(os.path.join(FEED_DIR, "page.html"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def selenium_records() -> list[dict]:
+    """Records of the synthetic feed as parsed post by post by the Selenium extraction path"""
+    with open(
+        os.path.join(FEED_DIR, "selenium_records.json"), "r", encoding="utf-8"
+    ) as f:
+        return json.load(f)
+
+
+def test_snapshot_matches_recorded_selenium_records_on_synthetic_feed(
+    feed_html, selenium_records
+):
+    snapshot = FeedSnapshot(feed_html, posts_xpath=Crawler.posts_xpath, page_id="bench")
+
+    records = snapshot.parse_posts()
+
+    assert [{field: record[field] for field in FIELDS} for record in records] == (
+        selenium_records
+    )
+
+
+def test_snapshot_leaves_hover_fields_empty(feed_html):
+    snapshot = FeedSnapshot(feed_html, posts_xpath=Crawler.posts_xpath, page_id="bench")
+
+    for record in snapshot.parse_posts():
+        assert record["Post_date"] is None
+        assert record["Reaction"] is None
+        assert record["Num_reactions"] is None
+
+
+def test_snapshot_matches_live_selenium_path_on_synthetic_feed(
+    feed_html, replay_crawler
+):
+    crawler = replay_crawler(html=feed_html, n_posts=12)
+    live_records = [
+        crawler.parse_post(i, post_div)
+        for i, post_div in enumerate(crawler.get_loaded_posts())
+    ]
+
+    records = FeedSnapshot(
+        crawler.chrome.page_source, posts_xpath=Crawler.posts_xpath, page_id="bench"
+    ).parse_posts()
+
+    assert len(records) == 12
+    for record, live_record in zip(records, live_records):
+        assert {field: record[field] for field in FIELDS} == {
+            field: live_record[field] for field in FIELDS
+        }
+
+
+def test_parse_post_link_strips_tracking_parameters():
+    href = "https://www.facebook.com/bench/posts/pfbid0123?__cft__[0]=AZ1&__tn__=%2CO%2CP-R"
+
+    assert (
+        parse_post_link(href, page_id="bench")
+        == "https://www.facebook.com/bench/posts/pfbid0123"
+    )
+    assert parse_post_link(None, page_id="bench") is None
+
+
+def test_snapshot_out_of_sync_falls_back_to_selenium(replay_crawler, monkeypatch):
+    class StaleSnapshot(FeedSnapshot):
+        def parse_posts(self):
+            # As if the last post loaded after the page source was taken
+            return super().parse_posts()[:-1]
+
+    crawler = replay_crawler(n_posts=6)
+    live_records = [
+        crawler.parse_post(i, post_div)
+        for i, post_div in enumerate(crawler.get_loaded_posts(), start=1)
+    ]
+    monkeypatch.setattr("crawlers.page_crawler.crawler.FeedSnapshot", StaleSnapshot)
+
+    records = crawler.parse_snapshot()
+
+    assert len(records) == 6
+    assert [{field: record[field] for field in FIELDS} for record in records] == [
+        {field: record[field] for field in FIELDS} for record in live_records
+    ]
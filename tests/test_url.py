@@ -0,0 +1,41 @@
+from utils.url import canonicalize_url
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "url, canonical",
+    [
+        (
+            "HTTPS://M.Facebook.com/page/posts/123/?__cft__[0]=AZ&__tn__=R&ref=share#x",
+            "https://www.facebook.com/page/posts/123",
+        ),
+        (
+            "https://www.facebook.com/profile.php?id=5&sk=photos&mibextid=abc",
+            "https://www.facebook.com/profile.php?id=5&sk=photos",
+        ),
+        ("https://web.facebook.com/page", "https://www.facebook.com/page"),
+        ("https://www.facebook.com/", "https://www.facebook.com"),
+        ("https://example.com/a/?b=2&a=1", "https://example.com/a?a=1&b=2"),
+    ],
+)
+def test_urls_are_canonicalized(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+
+@pytest.mark.parametrize(
+    "url", ["/relative/path?__tn__=1", "mailto:page@example.com", "#comments"]
+)
+def test_relative_and_non_http_urls_are_unchanged(url):
+    assert canonicalize_url(url) == url
+
+
+def test_canonicalization_is_idempotent():
+    url = (
+        "https://m.facebook.com/page/photos/a.1/2/?type=3&__tn__=%2CO&ref=page_internal"
+    )
+
+    canonical = canonicalize_url(url)
+
+    assert canonicalize_url(canonical) == canonical
+    assert canonical == "https://www.facebook.com/page/photos/a.1/2?type=3"
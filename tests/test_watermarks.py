@@ -0,0 +1,32 @@
+from utils.watermarks import Watermarks
+
+from datetime import datetime
+
+
+def test_fallback_csv_sets_watermark(tmp_path):
+    (tmp_path / "page.csv").write_text(
+        "Post_link,Post_date,Text\n"
+        "https://fb.com/1,2024-01-01 10:00:00,a\n"
+        "https://fb.com/2,2024-01-02 10:00:00,b\n"
+    )
+    watermarks = Watermarks(
+        str(tmp_path / "watermarks.json"), str(tmp_path / "{page_id}.csv")
+    )
+    links, post_date = watermarks.get("page")
+    assert links == {"https://fb.com/1", "https://fb.com/2"}
+    assert post_date == datetime(2024, 1, 2, 10)
+
+
+def test_fallback_csv_without_columns_has_no_watermark(tmp_path):
+    (tmp_path / "no_date.csv").write_text("Post_link,Text\nhttps://fb.com/1,a\n")
+    (tmp_path / "empty.csv").write_text("")
+    watermarks = Watermarks(
+        str(tmp_path / "watermarks.json"), str(tmp_path / "{page_id}.csv")
+    )
+    assert watermarks.get("no_date") == (set(), None)
+    assert watermarks.get("empty") == (set(), None)
+
+    watermarks.update(
+        "no_date", [dict(Post_link="https://fb.com/2", Post_date=datetime(2024, 1, 3))]
+    )
+    assert watermarks.get("no_date") == ({"https://fb.com/2"}, datetime(2024, 1, 3))
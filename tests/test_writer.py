@@ -0,0 +1,183 @@
+from benchmarks.suite import PAGE_URL
+from pipeline import Pipeline, PipelineWriter, BaseStep
+
+import logging
+import pytest
+from pandas import DataFrame
+
+logging.disable(logging.INFO)
+
+
+class RecordingStep(BaseStep):
+    """Sink recording written frames with their path format, failing its first `n_failures` writes"""
+
+    def __init__(self, n_failures: int = 0, fail_flush: bool = False) -> None:
+        self.n_failures = n_failures
+        self.fail_flush = fail_flush
+        self.path_format: dict[str, str] = dict()
+        self.written: list[tuple[dict[str, str], DataFrame]] = []
+        self.n_calls = 0
+
+    def set_path_format(self, **format_kwargs):
+        self.path_format = format_kwargs
+
+    def __call__(self, df: DataFrame) -> DataFrame:
+        self.n_calls += 1
+        if self.n_calls <= self.n_failures:
+            raise OSError("disk unavailable")
+        self.written.append((self.path_format, df))
+        return df
+
+    def flush(self):
+        if self.fail_flush:
+            raise OSError("disk unavailable")
+
+
+def records(*ids: int) -> list[dict]:
+    return [{"id": i} for i in ids]
+
+
+def make_writer(step: RecordingStep, **kwargs) -> PipelineWriter:
+    kwargs = dict(batch_size=1000, batch_interval=60, retry_interval=0) | kwargs
+    return PipelineWriter(Pipeline(step), **kwargs)
+
+
+def test_records_are_batched_per_path_format(tmp_path):
+    step = RecordingStep()
+    writer = make_writer(step, batch_size=4)
+
+    writer(records(0, 1), page="a")
+    writer(records(10), page="b")
+    writer(records(2, 3), page="a")
+    writer(records(11), page="b")
+    writer.close()
+
+    written = {
+        path_format["page"]: df["id"].tolist() for path_format, df in step.written
+    }
+    assert written == {"a": [0, 1, 2, 3], "b": [10, 11]}
+    assert len(step.written) == 2
+
+
+def test_records_are_acknowledged_once_flushed_in_order():
+    step = RecordingStep()
+    writer = make_writer(step, batch_size=1, flush_interval=3600)
+    acks = []
+
+    for i in range(3):
+        writer(records(i), on_done=lambda persisted, i=i: acks.append((i, persisted)))
+    # Written batches count as persisted only once the pipeline is flushed
+    writer.queue.join()
+    assert len(step.written) == 3 and acks == []
+
+    writer.close()
+    assert acks == [(0, True), (1, True), (2, True)]
+
+
+def test_failed_batches_are_retried():
+    step = RecordingStep(n_failures=2)
+    writer = make_writer(step, max_retries=2)
+    acks = []
+
+    writer(records(0), on_done=acks.append)
+    writer.close()
+
+    assert step.n_calls == 3
+    assert acks == [True]
+
+
+def test_batches_are_given_up_after_retries():
+    step = RecordingStep(n_failures=3)
+    writer = make_writer(step, max_retries=2)
+    acks = []
+
+    writer(records(0), on_done=acks.append)
+    writer.close()
+
+    assert step.written == []
+    assert acks == [False]
+
+
+def test_failed_flush_fails_acknowledgements():
+    writer = make_writer(RecordingStep(fail_flush=True))
+    acks = []
+
+    writer(records(0), on_done=acks.append)
+    writer.close()
+
+    assert acks == [False]
+
+
+def test_writer_survives_failing_batches_and_callbacks():
+    step = RecordingStep()
+    writer = make_writer(step, batch_size=2, max_queue_size=1)
+    acks = []
+
+    def failing_callback(persisted: bool):
+        raise RuntimeError("callback failed")
+
+    # Not batchable
+    writer(42, on_done=lambda persisted: acks.append(("unbatchable", persisted)))
+    # Batchable, yet not mergeable into one frame
+    writer(records(0), on_done=lambda persisted: acks.append(("list", persisted)))
+    writer({"id": [1, 2], "x": [1]}, on_done=failing_callback)
+    # Later records are still written, without producers blocking on the bounded queue
+    for i in range(2, 6):
+        writer(records(i), on_done=lambda persisted, i=i: acks.append((i, persisted)))
+    writer.close()
+
+    assert not writer.thread.is_alive()
+    assert [df["id"].tolist() for _, df in step.written] == [[2, 3], [4, 5]]
+    assert acks == [
+        ("unbatchable", False),
+        ("list", False),
+        (2, True),
+        (3, True),
+        (4, True),
+        (5, True),
+    ]
+
+
+class DeferredWriter:
+    """Writer of a crawler, holding each record's acknowledgement until the test delivers it"""
+
+    def __init__(self) -> None:
+        self.callbacks = []
+
+    def __call__(self, data, on_done=None, **path_format):
+        self.callbacks.append(on_done)
+
+
+def test_failed_attempt_does_not_undo_successful_retry(replay_crawler):
+    crawler = replay_crawler(n_posts=3)
+    crawler.pipeline_writer = DeferredWriter()
+    html = crawler.chrome.page_source
+
+    assert crawler.crawl_url(PAGE_URL) is None
+    crawler.chrome = type(crawler.chrome)(html, url=PAGE_URL, page_size=3)
+    assert crawler.crawl_url(PAGE_URL) is None
+    first_attempt, retry = crawler.pipeline_writer.callbacks
+
+    # The retry is stored before the first attempt's records are given up on
+    retry(True)
+    crawler.collect_write_acks()
+    assert crawler.progress.propagated(PAGE_URL)
+    first_attempt(False)
+    crawler.collect_write_acks()
+
+    assert list(crawler.progress.queue) == []
+    assert crawler.pending_writes == dict()
+    assert crawler.failed_writes == set()
+
+
+def test_failed_attempt_restores_url(replay_crawler):
+    crawler = replay_crawler(n_posts=3)
+    crawler.pipeline_writer = DeferredWriter()
+
+    assert crawler.crawl_url(PAGE_URL) is None
+    (on_done,) = crawler.pipeline_writer.callbacks
+    on_done(False)
+    crawler.collect_write_acks()
+
+    assert list(crawler.progress.queue) == [PAGE_URL]
+    assert not crawler.progress.propagated(PAGE_URL)
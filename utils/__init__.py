@@ -1,6 +1,14 @@
-from .progress import Progress
+from .progress import Progress, SharedProgress
 from .logger import Logger
 from .link_extractor import LinkExtractor
 from .cookies import Cookies
 from .utils import FormatablePath
+from .url import canonicalize_url
+from .bloom_filter import ScalableBloomFilter
+from .asset_cache import AssetCache
+from .watermarks import Watermarks
+from .selectors import Selector, SelectorRegistry
+from .metrics import Metrics
+from .driver_profiler import DriverProfiler
+from .resource_blocking import ResourceBlocker
 from . import colors
@@ -0,0 +1,153 @@
+from .url import canonicalize_url
+from .metrics import Metrics
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class AssetCache:
+    """
+    On-disk content-addressed cache of fetched assets, shared across crawls.
+    Entries are keyed by canonical URL and point to blobs stored once per SHA-256 of their content.
+    Entries expire after `ttl` seconds, and least recently used ones are evicted beyond `max_bytes`.
+    Assets larger than `max_bytes` are not cached. Lookups are counted in `metrics`, if set
+    """
+
+    def __init__(
+        self,
+        dir: str = "cache/assets",
+        max_bytes: int = 2 * 1024**3,
+        ttl: float = 7 * 24 * 3600,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.dir = Path(dir)
+        self.blobs_dir = self.dir.joinpath("blobs")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.metrics = metrics
+        self.lock = threading.Lock()
+
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self.db = sqlite3.connect(
+            self.dir.joinpath("index.db"), isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            ) WITHOUT ROWID""")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_sha256 ON entries (sha256)")
+
+    def blob_path(self, content_hash: str) -> Path:
+        # Fan out by hash prefix, keeping directories small
+        return self.blobs_dir.joinpath(content_hash[:2], content_hash)
+
+    def get(self, url: str) -> Path | None:
+        """Path of the cached blob of `url`, or None on a miss"""
+        url = canonicalize_url(url)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT sha256, size, fetched_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                content_hash, size, fetched_at = row
+                path = self.blob_path(content_hash)
+                if now - fetched_at <= self.ttl and path.exists():
+                    self.db.execute(
+                        "UPDATE entries SET last_access = ? WHERE url = ?", (now, url)
+                    )
+                    self.hits += 1
+                    self.bytes_saved += size
+                    self._count("asset_cache_lookups", result="hit")
+                    self._count("asset_cache_bytes_saved", size)
+                    return path
+                self._remove_entry(url, content_hash)
+            self.misses += 1
+            self._count("asset_cache_lookups", result="miss")
+            return None
+
+    def _count(self, name: str, value: float = 1, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **labels)
+
+    def put(self, url: str, src_path: str, content_hash: str) -> Path | None:
+        """
+        Move fetched file `src_path` into the cache. Returns path of its blob,
+        or None if it doesn't fit in the cache, leaving `src_path` in place
+        """
+        url = canonicalize_url(url)
+        now = time.time()
+        path = self.blob_path(content_hash)
+        with self.lock:
+            if not path.exists() and os.path.getsize(src_path) > self.max_bytes:
+                return None
+            if path.exists():
+                os.remove(src_path)
+            else:
+                os.makedirs(path.parent, exist_ok=True)
+                os.replace(src_path, path)
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (url, content_hash, path.stat().st_size, now, now),
+            )
+            self._evict(keep=content_hash)
+        return path
+
+    def _remove_entry(self, url: str, content_hash: str):
+        self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        # Blobs are shared by URLs with identical content
+        if (
+            self.db.execute(
+                "SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (content_hash,)
+            ).fetchone()
+            is None
+        ):
+            self.blob_path(content_hash).unlink(missing_ok=True)
+
+    def total_bytes(self) -> int:
+        (total,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM entries)"
+        ).fetchone()
+        return total
+
+    def _evict(self, keep: str):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        # The blob just stored is returned to the caller, so it's never evicted
+        for url, content_hash, size in self.db.execute(
+            "SELECT url, sha256, size FROM entries WHERE sha256 != ? ORDER BY last_access",
+            (keep,),
+        ).fetchall():
+            self._remove_entry(url, content_hash)
+            self._count("asset_cache_evictions")
+            if not self.blob_path(content_hash).exists():
+                total -= size
+            if total <= self.max_bytes:
+                break
+
+    def summary(self) -> str:
+        n_lookups = self.hits + self.misses
+        hit_rate = self.hits / n_lookups if n_lookups > 0 else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate), "
+            f"{self.bytes_saved / 1024**2:.1f} MB saved, "
+            f"{self.total_bytes() / 1024**2:.1f}/{self.max_bytes / 1024**2:.0f} MB used"
+        )
+
+    def close(self):
+        self.db.close()
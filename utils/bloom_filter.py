@@ -0,0 +1,153 @@
+import os
+import json
+import math
+import mmap
+import hashlib
+from pathlib import Path
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter whose bit array is a memory-mapped file"""
+
+    def __init__(self, path: str, capacity: int, error_rate: float) -> None:
+        self.path = Path(path)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.count = 0
+
+        n_bytes = math.ceil(self.n_bits / 8)
+        with open(self.path, "a+b") as f:
+            if os.path.getsize(self.path) < n_bytes:
+                f.truncate(n_bytes)
+        self.file = open(self.path, "r+b")
+        self.bits = mmap.mmap(self.file.fileno(), n_bytes)
+
+    def _indices(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(
+            digest[8:], "little"
+        )
+        # Double hashing (Kirsch-Mitzenmacher) to derive all k indices from one digest
+        return ((h1 + i * h2) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, item: str) -> bool:
+        """Add item, returns whether it was (probably) new"""
+        is_new = False
+        for idx in self._indices(item):
+            byte, mask = idx >> 3, 1 << (idx & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                is_new = True
+        if is_new:
+            self.count += 1
+        return is_new
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[idx >> 3] & (1 << (idx & 7)) for idx in self._indices(item)
+        )
+
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def flush(self):
+        self.bits.flush()
+
+    def close(self):
+        self.bits.close()
+        self.file.close()
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows by chaining filters of increasing capacity and tightening error rate,
+    keeping the overall false positive rate bounded by `error_rate`.
+    Stages are persisted under `dir` so the filter reopens without re-adding items
+    """
+
+    def __init__(
+        self,
+        dir: str,
+        initial_capacity: int = 1_000_000,
+        error_rate: float = 1e-4,
+        growth: int = 2,
+        tightening: float = 0.5,
+    ) -> None:
+        self.dir = Path(dir)
+        self.meta_path = self.dir.joinpath("bloom.json")
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.stages: list[BloomFilter] = []
+
+        os.makedirs(self.dir, exist_ok=True)
+        if self.meta_path.exists():
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            for stage_meta in meta["stages"]:
+                stage = BloomFilter(
+                    self.dir.joinpath(stage_meta["file"]),
+                    capacity=stage_meta["capacity"],
+                    error_rate=stage_meta["error_rate"],
+                )
+                stage.count = stage_meta["count"]
+                self.stages.append(stage)
+
+    def exists(self) -> bool:
+        return len(self.stages) > 0
+
+    def _add_stage(self):
+        i = len(self.stages)
+        self.stages.append(
+            BloomFilter(
+                self.dir.joinpath(f"bloom-{i}.bin"),
+                capacity=self.initial_capacity * self.growth**i,
+                # First stage takes (1 - tightening) of error budget, and so on geometrically
+                error_rate=self.error_rate * (1 - self.tightening) * self.tightening**i,
+            )
+        )
+        self.save()
+
+    def add(self, item: str):
+        if item in self:
+            return
+        if len(self.stages) == 0 or self.stages[-1].is_full():
+            self._add_stage()
+        self.stages[-1].add(item)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in stage for stage in reversed(self.stages))
+
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    def save(self):
+        for stage in self.stages:
+            stage.flush()
+        meta = {
+            "stages": [
+                {
+                    "file": stage.path.name,
+                    "capacity": stage.capacity,
+                    "error_rate": stage.error_rate,
+                    "count": stage.count,
+                }
+                for stage in self.stages
+            ]
+        }
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def close(self):
+        self.save()
+        for stage in self.stages:
+            stage.close()
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import threading
+from typing import Any
+
+# Frames of these modules are skipped when looking for the code that issued a command,
+# so lookups through the selector registry are attributed to their caller
+_skipped_modules = ("selenium", "utils.selectors", __name__)
+
+
+def _payload_size(payload: Any) -> int:
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def caller_location(root_dir: str | None = None) -> str:
+    """`file:line (function)` of the innermost frame outside Selenium and the selector registry"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(
+        _skipped_modules
+    ):
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>"
+    file_name = frame.f_code.co_filename
+    if root_dir is not None and file_name.startswith(root_dir):
+        file_name = os.path.relpath(file_name, root_dir)
+    return f"{file_name}:{frame.f_lineno} ({frame.f_code.co_name})"
+
+
+class CallSiteStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            count=self.count,
+            total_seconds=round(self.total_seconds, 6),
+            mean_seconds=round(self.total_seconds / self.count, 6),
+            max_seconds=round(self.max_seconds, 6),
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+        )
+
+
+class DriverProfiler:
+    """
+    Records every WebDriver command (element lookups, attribute reads, scripts, actions...) sent through a driver,
+    with the call site that issued it, its round-trip duration and payload sizes,
+    aggregated per call site and command
+    """
+
+    def __init__(self, root_dir: str | None = None) -> None:
+        # Call sites are shown relative to this directory
+        self.root_dir = root_dir or os.getcwd()
+        self.stats: dict[tuple[str, str], CallSiteStats] = dict()
+        self.lock = threading.Lock()
+
+    def attach(self, driver):
+        # Element commands and action chains are all sent through the driver's `execute`
+        execute = driver.execute
+
+        def profiled_execute(driver_command: str, params: dict | None = None):
+            location = caller_location(self.root_dir)
+            bytes_sent = _payload_size(params)
+            start = time.perf_counter()
+            response = execute(driver_command, params)
+            elapsed = time.perf_counter() - start
+            self.record(
+                location,
+                driver_command,
+                elapsed,
+                bytes_sent,
+                _payload_size(response.get("value") if response else None),
+            )
+            return response
+
+        driver.execute = profiled_execute
+
+    def record(
+        self,
+        location: str,
+        command: str,
+        seconds: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ):
+        with self.lock:
+            stats = self.stats.setdefault((location, command), CallSiteStats())
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def ranked(self) -> list[dict[str, Any]]:
+        """Call sites and commands, by total time spent in round-trips"""
+        with self.lock:
+            items = sorted(
+                self.stats.items(),
+                key=lambda item: item[1].total_seconds,
+                reverse=True,
+            )
+            return [
+                dict(location=location, command=command, **stats.to_dict())
+                for (location, command), stats in items
+            ]
+
+    def report(self, top: int = 20) -> str:
+        ranked = self.ranked()
+        n_commands = sum(item["count"] for item in ranked)
+        total_seconds = sum(item["total_seconds"] for item in ranked)
+        rows = [
+            ("Call site", "Command", "Count", "Total (s)", "Mean (ms)", "KB out/in")
+        ]
+        for item in ranked[:top]:
+            rows.append(
+                (
+                    item["location"],
+                    item["command"],
+                    str(item["count"]),
+                    f"{item['total_seconds']:.2f}",
+                    f"{item['mean_seconds'] * 1000:.1f}",
+                    f"{item['bytes_sent'] / 1024:.1f}/{item['bytes_received'] / 1024:.1f}",
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        table = "\n".join(
+            "  ".join(
+                cell.ljust(width) if i < 2 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+        return (
+            f"{n_commands} WebDriver round-trips taking {total_seconds:.2f}s\n{table}"
+        )
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.ranked(), f, indent=2)
@@ -1,9 +1,17 @@
-import bs4
+from .url import canonicalize_url
+
 import re
+from html import unescape
+from functools import lru_cache
+
+# Matches href attribute values of anchor tags, whether double-quoted, single-quoted or bare
+href_regex = re.compile(
+    r"""<a\b[^>]*?\shref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE
+)
 
 
 class LinkExtractor:
-    def __init__(self, allow_regex: str, deny_regex: str):
+    def __init__(self, allow_regex: str, deny_regex: str, canonicalize: bool = True):
         # Empty string means rejecting all possible strings
         if allow_regex == r"":
             allow_regex = r"^[^a-zA-Z0-9]$"
@@ -12,13 +20,59 @@ class LinkExtractor:
 
         self.allow_re = re.compile(allow_regex)
         self.deny_re = re.compile(deny_regex)
+        self.canonicalize = canonicalize
 
     def match(self, link: str):
         return self.allow_re.search(link) and not self.deny_re.search(link)
 
     def extract(self, html: str):
-        soup = bs4.BeautifulSoup(html, features="lxml")
-        anchors = soup.find_all("a")
-        links = [anchor.get("href", "") for anchor in anchors]
-        links = [link for link in links if self.match(link)]
-        return links
+        return extract_links(html, self)[0]
+
+
+def extract_hrefs(html: str) -> list[str]:
+    """Unique anchor hrefs of a page, in document order, scanned without building a DOM"""
+    hrefs = dict.fromkeys(
+        unescape(double or single or bare)
+        for double, single, bare in href_regex.findall(html)
+    )
+    return list(hrefs)
+
+
+@lru_cache(maxsize=None)
+def _any_allow_regex(*allow_patterns: str):
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in allow_patterns))
+    except re.error:
+        # e.g. patterns with global inline flags can't be embedded, match everything instead
+        return re.compile("")
+
+
+def extract_links(html: str, *extractors: LinkExtractor) -> list[list[str]]:
+    """
+    Extract links for several extractors from one scan of the page.
+    Returns one list of matched links per extractor
+    """
+    hrefs = extract_hrefs(html)
+    canonical_hrefs = (
+        list(dict.fromkeys(canonicalize_url(href) for href in hrefs))
+        if any(extractor.canonicalize for extractor in extractors)
+        else []
+    )
+
+    # Cheaply drop links no extractor allows, through one combined alternation
+    any_allow_re = _any_allow_regex(
+        *(extractor.allow_re.pattern for extractor in extractors)
+    )
+    candidates = [href for href in hrefs if any_allow_re.search(href)]
+    canonical_candidates = [
+        href for href in canonical_hrefs if any_allow_re.search(href)
+    ]
+
+    return [
+        [
+            link
+            for link in (canonical_candidates if extractor.canonicalize else candidates)
+            if extractor.match(link)
+        ]
+        for extractor in extractors
+    ]
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Upper bounds (seconds) of histogram buckets, spanning DOM lookups to page loads
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    25.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict[str, Any]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # Last slot counts observations above the largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile"""
+        if self.count == 0:
+            return 0.0
+        rank, cumulative = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            count=self.count,
+            sum=round(self.sum, 6),
+            mean=round(self.sum / self.count, 6) if self.count > 0 else 0.0,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            max=round(self.max, 6),
+        )
+
+
+class Metrics:
+    """
+    Timings (as histograms) and counters of a crawl, optionally labelled.
+    Periodically exported to `{export_dir}/metrics.json` and `{export_dir}/metrics.prom` (Prometheus text format).
+    Safe to share between worker threads
+    """
+
+    def __init__(
+        self,
+        export_dir: str | None = None,
+        export_interval: float = 30.0,
+        namespace: str = "crawler",
+    ) -> None:
+        self.export_dir = export_dir
+        self.export_interval = export_interval
+        self.namespace = namespace
+        self.histograms: dict[Key, Histogram] = dict()
+        self.counters: dict[Key, float] = dict()
+        self.start_time = time.time()
+        self.last_export = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        key = _key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    @contextmanager
+    def time(self, name: str, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def count(self, name: str) -> float:
+        """Total of a counter over all its labels"""
+        with self.lock:
+            return sum(
+                value
+                for (counter, _), value in self.counters.items()
+                if counter == name
+            )
+
+    def instrument_driver(self, driver):
+        """Count WebDriver commands sent by `driver`, by command name"""
+        execute = driver.execute
+
+        def counted_execute(driver_command: str, params: dict | None = None):
+            self.inc("webdriver_commands", command=driver_command)
+            return execute(driver_command, params)
+
+        driver.execute = counted_execute
+
+    def to_dict(self) -> dict[str, Any]:
+        with self.lock:
+            return dict(
+                start_time=self.start_time,
+                elapsed_seconds=round(time.time() - self.start_time, 3),
+                timings=[
+                    dict(name=name, labels=dict(labels), **histogram.to_dict())
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+                counters=[
+                    dict(name=name, labels=dict(labels), value=value)
+                    for (name, labels), value in self.counters.items()
+                ],
+            )
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            families: dict[str, list[tuple[Any, Any]]] = dict()
+            for (name, labels), histogram in self.histograms.items():
+                families.setdefault(f"{self.namespace}_{name}_seconds", []).append(
+                    (labels, histogram)
+                )
+            for family, series in families.items():
+                lines.append(f"# TYPE {family} histogram")
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f"{family}_bucket{_format_labels(labels, le=str(bound))} {cumulative}"
+                        )
+                    lines.append(
+                        f"{family}_bucket{_format_labels(labels, le='+Inf')} {histogram.count}"
+                    )
+                    lines.append(
+                        f"{family}_sum{_format_labels(labels)} {histogram.sum:.6f}"
+                    )
+                    lines.append(
+                        f"{family}_count{_format_labels(labels)} {histogram.count}"
+                    )
+
+            families = dict()
+            for (name, labels), value in self.counters.items():
+                families.setdefault(f"{self.namespace}_{name}_total", []).append(
+                    (labels, value)
+                )
+            for family, series in families.items():
+                lines.append(f"# TYPE {family} counter")
+                for labels, value in series:
+                    lines.append(f"{family}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        if self.export_dir is None:
+            return
+        os.makedirs(self.export_dir, exist_ok=True)
+        for file_name, content in [
+            ("metrics.json", json.dumps(self.to_dict(), indent=2)),
+            ("metrics.prom", self.to_prometheus()),
+        ]:
+            path = os.path.join(self.export_dir, file_name)
+            # Written aside then swapped in, so scrapers never read a partial file
+            with open(f"{path}.tmp", "w") as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+        self.last_export = time.perf_counter()
+
+    def maybe_export(self):
+        """Export if `export_interval` seconds passed since last export"""
+        if time.perf_counter() - self.last_export >= self.export_interval:
+            self.export()
+
+    def summary(self, records_counter: str = "records", top: int = 10) -> str:
+        """Table of throughput and the top time sinks"""
+        elapsed = time.time() - self.start_time
+        n_records = self.count(records_counter)
+        with self.lock:
+            sinks = sorted(
+                self.histograms.items(), key=lambda item: item[1].sum, reverse=True
+            )[:top]
+            n_commands = sum(
+                value
+                for (name, _), value in self.counters.items()
+                if name == "webdriver_commands"
+            )
+
+        rows = [("Time sink", "Count", "Total (s)", "Mean (s)", "p95 (s)", "Share")]
+        for (name, labels), histogram in sinks:
+            rows.append(
+                (
+                    name + _format_labels(labels),
+                    str(histogram.count),
+                    f"{histogram.sum:.2f}",
+                    f"{histogram.sum / histogram.count:.3f}",
+                    f"{histogram.quantile(0.95):.3f}",
+                    f"{histogram.sum / elapsed:.1%}" if elapsed > 0 else "-",
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        table = "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+        return (
+            f"Ran {elapsed / 60:.1f} min, {n_records:g} {records_counter} "
+            f"({n_records / (elapsed / 60) if elapsed > 0 else 0:.1f}/min), "
+            f"{n_commands:g} WebDriver commands\n{table}"
+        )
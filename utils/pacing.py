@@ -0,0 +1,125 @@
+from selenium.webdriver import Chrome
+from selenium.common.exceptions import TimeoutException
+
+import time
+from scipy.stats import weibull_min
+
+# Installs (once per document) a MutationObserver recording when DOM last changed and a PerformanceObserver
+# counting finished resource requests, then reports quiet time, that count and the number of items matching an XPath.
+# Resources are counted as they are observed, since the resource timing buffer stops growing once full (250 entries).
+# Arguments: items XPath
+RENDER_STATE_JS = """
+if (!window.__crawlerPacing) {
+    const state = (window.__crawlerPacing = { lastMutation: performance.now(), nResources: 0 });
+    new MutationObserver(() => (state.lastMutation = performance.now())).observe(document.body, {
+        childList: true,
+        subtree: true,
+    });
+    new PerformanceObserver((list) => (state.nResources += list.getEntries().length)).observe({
+        type: "resource",
+        buffered: true,
+    });
+}
+return {
+    quiet_ms: performance.now() - window.__crawlerPacing.lastMutation,
+    n_resources: window.__crawlerPacing.nResources,
+    n_items: document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength,
+};
+"""
+
+
+class PacingController:
+    """
+    Paces crawling by waiting on actual render signals instead of fixed sleeps.
+    Dwell times still follow a Weibull distribution per phase (`scroll`, `url`, `error`),
+    but time already spent waiting for content counts toward the dwell.
+    Observed load latency paces polling for render signals, and dwell times back off
+    (up to `max_backoff` times) as latency grows over the fastest seen, a sign of a slowing site
+    """
+
+    def __init__(
+        self,
+        budgets: dict[str, float],
+        shape: float = 10.0,
+        quiet_ms: float = 500,
+        poll_interval: float = 0.2,
+        max_poll_interval: float = 1.0,
+        smoothing: float = 0.3,
+        max_backoff: float = 4.0,
+    ) -> None:
+        self.budgets = budgets
+        self.shape = shape
+        self.quiet_ms = quiet_ms
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.smoothing = smoothing
+        self.max_backoff = max_backoff
+        # Exponentially smoothed load latency (seconds) per phase, and its lowest value
+        self.latency: dict[str, float] = dict()
+        self.baseline_latency: dict[str, float] = dict()
+
+    def observe_latency(self, phase: str, seconds: float):
+        prev = self.latency.get(phase, seconds)
+        self.latency[phase] = (1 - self.smoothing) * prev + self.smoothing * seconds
+        self.baseline_latency[phase] = min(
+            self.baseline_latency.get(phase, self.latency[phase]), self.latency[phase]
+        )
+
+    def backoff(self, phase: str) -> float:
+        """Factor of dwell times, by how much load latency grew over the fastest seen"""
+        baseline = self.baseline_latency.get(phase, 0.0)
+        if baseline <= 0:
+            return 1.0
+        return min(self.max_backoff, max(1.0, self.latency[phase] / baseline))
+
+    def next_poll_interval(self, phase: str) -> float:
+        # No point polling much faster than content usually takes to load
+        return min(
+            self.max_poll_interval,
+            max(self.poll_interval, self.latency.get(phase, 0.0) / 4),
+        )
+
+    def wait_for_items(
+        self,
+        driver: Chrome,
+        xpath: str,
+        min_count: int,
+        timeout: float,
+        phase: str = "scroll",
+    ) -> tuple[int, float]:
+        """
+        Wait until at least `min_count` items match `xpath`, DOM mutations settled and no new resource finished loading.
+        Past `timeout`, rendered items are enough, as some feeds never settle (ads, video players...).
+        Returns number of matching items and elapsed seconds
+        """
+        start = time.perf_counter()
+        poll_interval = self.next_poll_interval(phase)
+        prev_resources = -1
+        while True:
+            state = driver.execute_script(RENDER_STATE_JS, xpath)
+            elapsed = time.perf_counter() - start
+            if (
+                state["n_items"] >= min_count
+                and state["quiet_ms"] >= self.quiet_ms
+                and state["n_resources"] == prev_resources
+            ):
+                self.observe_latency(phase, elapsed)
+                return state["n_items"], elapsed
+            if elapsed > timeout:
+                if state["n_items"] >= min_count:
+                    self.observe_latency(phase, elapsed)
+                    return state["n_items"], elapsed
+                raise TimeoutException(
+                    f"{min_count} items of {xpath} not rendered after {timeout}s"
+                )
+            prev_resources = state["n_resources"]
+            time.sleep(poll_interval)
+
+    def dwell(self, phase: str, elapsed: float = 0.0) -> float:
+        """Sleep the remaining part of a Weibull-distributed dwell time, given seconds already spent. Returns slept seconds"""
+        dwell = weibull_min.rvs(
+            self.shape, loc=0, scale=self.budgets[phase] * self.backoff(phase)
+        )
+        remaining = max(0.0, dwell - elapsed)
+        time.sleep(remaining)
+        return remaining
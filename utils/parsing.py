@@ -1,6 +1,33 @@
 from selenium.webdriver.remote.webelement import WebElement
 import re
-from datetime import datetime
+from html import unescape
+from datetime import datetime, timedelta
+
+hashtag_regex = re.compile(r"#[^\s,]+")
+interaction_btn_regex = re.compile(r"^(\d+) (.+)$")
+# Post date forms shown without hovering, e.g. `3 tháng 9, 2024`, `3 tháng 9 lúc 10:05` or `5 giờ`
+date_hint_regex = re.compile(
+    r"(\d{1,2}) tháng (\d{1,2})(?:, (\d{4}))?(?: lúc (\d{1,2}):(\d{1,2}))?"
+)
+# Reaction summary aria-labels, e.g. `Thích: 1,2K người`
+reaction_label_regex = re.compile(r"^(.+?): ([\d.,]+\s?[KkMmTr]*)\s*người")
+reaction_name_map = {
+    "thích": "like",
+    "yêu thích": "love",
+    "thương thương": "care",
+    "haha": "haha",
+    "wow": "wow",
+    "buồn": "sad",
+    "phẫn nộ": "angry",
+}
+relative_date_hint_regex = re.compile(r"^(\d+) ?(phút|giờ|ngày|tuần|năm)$")
+relative_date_units = {
+    "phút": timedelta(minutes=1),
+    "giờ": timedelta(hours=1),
+    "ngày": timedelta(days=1),
+    "tuần": timedelta(weeks=1),
+    "năm": timedelta(days=365),
+}
 
 
 def parse_post_date(raw_data: str):
@@ -13,10 +40,92 @@ def parse_post_date(raw_data: str):
     return result
 
 
-def parse_text_from_element(text_element: WebElement):
-    text = text_element.get_attribute("innerHTML")
+def parse_post_date_hint(hint: str) -> tuple[datetime | None, bool]:
+    """
+    Parse post date from text available without hovering (aria-label, title, visible text or `utime:<epoch>`).
+    Returns the date, or None, and whether it is exact. Inexact dates are the earliest the post could date from
+    """
+    hint = hint.strip().lower()
+    if hint.startswith("utime:"):
+        return datetime.fromtimestamp(int(hint[6:])), True
+    if (match := relative_date_hint_regex.search(hint)) is not None:
+        amount, unit = int(match.group(1)), match.group(2)
+        return datetime.now() - (amount + 1) * relative_date_units[unit], False
+    if (match := date_hint_regex.search(hint)) is not None:
+        day, month, year, hour, minute = match.groups()
+        try:
+            date = datetime(
+                year=int(year) if year is not None else datetime.now().year,
+                month=int(month),
+                day=int(day),
+                hour=int(hour or 0),
+                minute=int(minute or 0),
+            )
+        except ValueError:
+            return None, False
+        if year is None and date > datetime.now():
+            date = date.replace(year=date.year - 1)
+        # Dates of the current year are shown without year
+        return date, hour is not None
+    return None, False
+
+
+def parse_text_from_html(text: str):
     text = re.sub(r"(<img[^>]*alt=\"([^\"]+)\")[^>]*>", r"\2", text)
     text = re.sub(r"<a[^>]*href=\"([^\"]+)\"[^>]*>(.*?)</a>", r"href(\2, \1)", text)
     text = re.sub(r"(?<=</div>)()(?=<div)", r"\n", text)
     text = re.sub(r"<.*?>", "", text)
     return text
+
+
+def parse_text_from_element(text_element: WebElement):
+    return parse_text_from_html(text_element.get_attribute("innerHTML"))
+
+
+def parse_post_content(raw_content: str):
+    """Split parsed post text into cleaned content and space-separated hashtags"""
+    hashtag = " ".join(hashtag_regex.findall(raw_content))
+    content = hashtag_regex.sub("", raw_content)
+    content = unescape(re.sub(r"href\(, [^\)]+\)", "", content).strip())
+    return content, hashtag
+
+
+def parse_interaction_counts(button_texts: list[str]):
+    """Map comment/share button texts (e.g. `12 bình luận`) to their counts"""
+    num_comments, num_shares = 0, 0
+    for btn_text in button_texts:
+        btn_text_match = interaction_btn_regex.search(btn_text.strip())
+        if btn_text_match is None:
+            continue
+        count, btn_text = int(btn_text_match.group(1)), btn_text_match.group(2)
+        if btn_text == "bình luận":
+            num_comments = count
+        elif btn_text == "lượt chia sẻ":
+            num_shares = count
+    return num_comments, num_shares
+
+
+def parse_count(text: str) -> int | None:
+    """Parse abbreviated counts, e.g. `12`, `1.234`, `1,2K` or `3 Tr`"""
+    match = re.search(r"(\d+(?:[.,]\d+)*)\s?(K|k|M|m|Tr|tr)?", text or "")
+    if match is None:
+        return None
+    number, unit = match.group(1), (match.group(2) or "").lower()
+    if unit == "":
+        # Dots and commas only group thousands in plain counts
+        return int(re.sub(r"[.,]", "", number))
+    multiplier = 1_000 if unit == "k" else 1_000_000
+    return round(float(number.replace(",", ".")) * multiplier)
+
+
+def parse_reaction_labels(labels: list[str]) -> dict[str, int]:
+    """Map reaction summary aria-labels to counts per reaction"""
+    counts = dict()
+    for label in labels:
+        match = reaction_label_regex.search(label.strip())
+        if match is None:
+            continue
+        name = match.group(1).strip().lower()
+        counts[reaction_name_map.get(name, name)] = parse_count(match.group(2))
+    return counts
+
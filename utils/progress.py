@@ -1,13 +1,33 @@
-from collections import deque
+from collections import deque, Counter
 import os
+import sqlite3
+import threading
 from pathlib import Path
+from contextlib import contextmanager
+from .bloom_filter import ScalableBloomFilter
 
 from typing import Literal
 
 
 class Progress:
-    def __init__(self, dir: str = "progress") -> None:
+    """
+    Crawling frontier (queue) and history, journaled to a SQLite database in WAL mode.
+    Every enqueue, pop and history addition is committed as it happens, so a crash loses nothing:
+    popped URLs stay claimed until added to history or restored to queue, and claims left by a crash
+    are restored to the head of queue on load
+    """
+
+    def __init__(
+        self, dir: str = "progress", history_backend: Literal["set", "bloom"] = "set"
+    ) -> None:
         dir = Path(dir)
+        # "bloom" keeps history membership in a memory-mapped Bloom filter instead of a set,
+        # trading a small false positive rate (URLs wrongly treated as seen) for memory and load time
+        assert history_backend in ["set", "bloom"]
+        self.history_backend = history_backend
+        self.history = None
+        self.db = None
+        self.transaction_depth = 0
         self.set_dir(dir)
         self.load()
 
@@ -15,46 +35,138 @@ class Progress:
         self.progress_dir = dir
         self.history_path = dir.joinpath("history.txt")
         self.queue_path = dir.joinpath("queue.txt")
+        self.db_path = dir.joinpath("progress.db")
+        self.bloom_dir = dir.joinpath("history_bloom")
 
-    def load(self):
-        # Prepare history
-        if not self.history_path.exists():
-            history = []
-        else:
+    def connect(self):
+        if self.db is not None:
+            self.db.close()
+        os.makedirs(self.progress_dir, exist_ok=True)
+        is_new = not self.db_path.exists()
+
+        self.db = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS history (url TEXT PRIMARY KEY) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS queue (pos INTEGER PRIMARY KEY, url TEXT NOT NULL)"
+        )
+        # URLs popped from queue and still in flight, with their former position
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS claimed (url TEXT PRIMARY KEY, pos INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        if is_new:
+            self.import_text_files()
+
+    def import_text_files(self):
+        """Migrate progress saved as history.txt/queue.txt by earlier versions"""
+        history, queue = [], []
+        if self.history_path.exists():
             with open(self.history_path, "r") as f_hist:
                 history = f_hist.read().split()
-
-        # Prepare queue
-        if not self.queue_path.exists():
-            queue = deque()
-        else:
+        if self.queue_path.exists():
             with open(self.queue_path, "r") as f_queue:
                 queue = f_queue.read().split()
 
-        history, queue = set(history), deque(queue)
+        with self.transaction():
+            self.db.executemany(
+                "INSERT OR IGNORE INTO history VALUES (?)", ((url,) for url in history)
+            )
+            self.db.executemany("INSERT INTO queue VALUES (?, ?)", enumerate(queue))
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outermost transaction
+        if self.transaction_depth == 0:
+            self.db.execute("BEGIN")
+        self.transaction_depth += 1
+        try:
+            yield
+        except:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.db.execute("ROLLBACK")
+            raise
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.db.execute("COMMIT")
+
+    def load(self):
+        self.connect()
+        if isinstance(self.history, ScalableBloomFilter):
+            self.history.close()
+        if self.history_backend == "bloom":
+            history = ScalableBloomFilter(self.bloom_dir)
+            if not history.exists():
+                history.update(
+                    url for url, in self.db.execute("SELECT url FROM history")
+                )
+                history.save()
+        else:
+            history = set(url for url, in self.db.execute("SELECT url FROM history"))
+        self.restore_claimed()
+        queue_rows = self.db.execute(
+            "SELECT pos, url FROM queue ORDER BY pos"
+        ).fetchall()
+        queue = deque(url for _, url in queue_rows)
+
+        # Positions of queue's both ends, so deque operations map to single-row writes
+        self.queue_head = queue_rows[0][0] if len(queue_rows) > 0 else 0
+        self.queue_tail = queue_rows[-1][0] if len(queue_rows) > 0 else -1
         self.history = history
         self.queue = queue
+        # Membership index of queue (URL -> occurrences), kept in sync with the deque
+        self.queued = Counter(queue)
         return self.history, self.queue
 
-    def save(self):
-        if not self.progress_dir.is_dir():
-            os.makedirs(self.progress_dir, exist_ok=True)
+    def restore_claimed(self):
+        """Put URLs claimed by an interrupted run back to the head of queue, in their former order"""
+        claimed = [
+            url
+            for url, in self.db.execute(
+                "SELECT url FROM claimed WHERE url NOT IN (SELECT url FROM history) "
+                "AND url NOT IN (SELECT url FROM queue) ORDER BY pos"
+            )
+        ]
+        (head,) = self.db.execute("SELECT COALESCE(MIN(pos), 0) FROM queue").fetchone()
+        with self.transaction():
+            self.db.executemany(
+                "INSERT INTO queue VALUES (?, ?)",
+                ((head - len(claimed) + i, url) for i, url in enumerate(claimed)),
+            )
+            self.db.execute("DELETE FROM claimed")
+        self.claimed: set[str] = set()
 
-        with open(self.history_path, "w") as f_hist, open(
-            self.queue_path, "w"
-        ) as f_queue:
-            f_hist.writelines("\n".join(self.history))
-            f_queue.writelines("\n".join(self.queue))
+    def save(self):
+        # Every change is already durable, only fold the write-ahead log back into the database
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if isinstance(self.history, ScalableBloomFilter):
+            self.history.save()
 
     def enqueue(self, url: str, side: Literal["left", "right"] = "right"):
+        # A URL back in queue is no longer in flight
+        if url in self.claimed:
+            self.db.execute("DELETE FROM claimed WHERE url = ?", (url,))
+            self.claimed.discard(url)
         if side == "right":
+            self.queue_tail += 1
+            self.db.execute("INSERT INTO queue VALUES (?, ?)", (self.queue_tail, url))
             self.queue.append(url)
+            self.queued[url] += 1
         elif side == "left":
+            self.queue_head -= 1
+            self.db.execute("INSERT INTO queue VALUES (?, ?)", (self.queue_head, url))
             self.queue.appendleft(url)
+            self.queued[url] += 1
 
     def enqueue_list(self, urls: list[str], side: Literal["left", "right"] = "right"):
-        for url in urls:
-            self.enqueue(url, side)
+        with self.transaction():
+            for url in urls:
+                self.enqueue(url, side)
 
     def selectively_enqueue(
         self,
@@ -63,13 +175,7 @@ class Progress:
         ignore: Literal["none", "queue", "history"] = "none",
     ):
         assert ignore in ["none", "queue", "history"]
-        exclude_set = set()
-        if ignore in ["none", "queue"]:
-            exclude_set.update(self.history)
-        if ignore in ["none", "history"]:
-            exclude_set.update(self.queue)
-
-        if url not in exclude_set:
+        if not self.is_known(url, ignore):
             # Enqueue URLs that are not already in progress or history.
             self.enqueue(url, side=side)
 
@@ -80,26 +186,139 @@ class Progress:
         ignore: Literal["none", "queue", "history"] = "none",
     ):
         assert ignore in ["none", "queue", "history"]
-        exclude_set = set()
-        if ignore in ["none", "queue"]:
-            exclude_set.update(self.history)
-        if ignore in ["none", "history"]:
-            exclude_set.update(self.queue)
-
         # Enqueue URLs that are not already in progress or history.
-        urls = list(set(urls).difference(exclude_set))
+        urls = [url for url in dict.fromkeys(urls) if not self.is_known(url, ignore)]
         self.enqueue_list(urls, side=side)
 
+    def is_known(
+        self, url: str, ignore: Literal["none", "queue", "history"] = "none"
+    ) -> bool:
+        if ignore in ["none", "queue"] and url in self.history:
+            return True
+        if ignore in ["none", "history"] and url in self.queued:
+            return True
+        return False
+
     def next_url(self, pop: bool = True):
         if pop:
-            return self.queue.popleft()
+            url = self.queue[0]
+            with self.transaction():
+                self.db.execute(
+                    "INSERT OR IGNORE INTO claimed VALUES (?, ?)",
+                    (url, self.queue_head),
+                )
+                self.db.execute("DELETE FROM queue WHERE pos = ?", (self.queue_head,))
+            self.queue.popleft()
+            self.unmark_queued(url)
+            self.claimed.add(url)
+            self.queue_head += 1
+            return url
         return self.queue[0]
 
+    def unmark_queued(self, url: str):
+        self.queued[url] -= 1
+        if self.queued[url] <= 0:
+            del self.queued[url]
+
     def add_history(self, url: str):
+        with self.transaction():
+            self.db.execute("INSERT OR IGNORE INTO history VALUES (?)", (url,))
+            if url in self.claimed:
+                self.db.execute("DELETE FROM claimed WHERE url = ?", (url,))
         self.history.add(url)
+        self.claimed.discard(url)
 
     def propagated(self, url: str):
+        if self.history_backend == "bloom":
+            # Exact lookup, as a false positive here would drop a failed URL
+            return (
+                self.db.execute(
+                    "SELECT 1 FROM history WHERE url = ?", (url,)
+                ).fetchone()
+                is not None
+            )
         return url in self.history
 
     def count_remaining(self):
         return len(self.queue)
+
+
+class SharedProgress(Progress):
+    """
+    Thread-safe progress shared by concurrent workers.
+    Tracks in-flight URLs so idle workers wait for URLs that busy workers may still enqueue
+    """
+
+    def __init__(
+        self, dir: str = "progress", history_backend: Literal["set", "bloom"] = "set"
+    ) -> None:
+        self.lock = threading.RLock()
+        self.url_available = threading.Condition(self.lock)
+        self.in_flight = 0
+        super().__init__(dir, history_backend)
+
+    def load(self):
+        with self.lock:
+            return super().load()
+
+    def save(self):
+        with self.lock:
+            super().save()
+
+    def enqueue(self, url: str, side: Literal["left", "right"] = "right"):
+        with self.lock:
+            super().enqueue(url, side)
+            self.url_available.notify_all()
+
+    def enqueue_list(self, urls: list[str], side: Literal["left", "right"] = "right"):
+        with self.lock:
+            super().enqueue_list(urls, side)
+
+    def selectively_enqueue(
+        self,
+        url: str,
+        side: Literal["left", "right"] = "right",
+        ignore: Literal["none", "queue", "history"] = "none",
+    ):
+        with self.lock:
+            super().selectively_enqueue(url, side, ignore)
+
+    def selectively_enqueue_list(
+        self,
+        urls: list[str],
+        side: Literal["left", "right"] = "right",
+        ignore: Literal["none", "queue", "history"] = "none",
+    ):
+        with self.lock:
+            super().selectively_enqueue_list(urls, side, ignore)
+
+    def next_url(self, pop: bool = True):
+        with self.lock:
+            return super().next_url(pop)
+
+    def add_history(self, url: str):
+        with self.lock:
+            super().add_history(url)
+
+    def propagated(self, url: str):
+        with self.lock:
+            return super().propagated(url)
+
+    def count_remaining(self):
+        with self.lock:
+            return super().count_remaining()
+
+    def claim_url(self) -> str | None:
+        """Pop next URL, waiting while queue is empty but other workers are busy. Returns None once all work is done"""
+        with self.url_available:
+            while len(self.queue) == 0:
+                if self.in_flight == 0:
+                    return None
+                self.url_available.wait()
+            self.in_flight += 1
+            return super().next_url()
+
+    def release_url(self):
+        with self.url_available:
+            self.in_flight -= 1
+            self.url_available.notify_all()
@@ -0,0 +1,98 @@
+from selenium.webdriver import Chrome
+
+import re
+
+# URL patterns, as understood by CDP `Network.setBlockedURLs`: a pattern must match the whole URL,
+# '*' matching any characters and '?' any single character.
+# Extensions are matched at the end of the URL only, so that e.g. "*.ico" doesn't block ".../icons.js".
+# URLs with query strings are covered by the patterns of the hosts serving them
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "gif", "webp", "svg", "ico"]
+VIDEO_EXTENSIONS = ["mp4", "webm", "m4a", "mp3"]
+FONT_EXTENSIONS = ["woff", "woff2", "ttf", "otf"]
+IMAGES = [f"*.{extension}" for extension in IMAGE_EXTENSIONS] + [
+    "https://scontent*.fbcdn.net/*",
+    "https://external*.fbcdn.net/*",
+]
+VIDEO = [f"*.{extension}" for extension in VIDEO_EXTENSIONS] + [
+    "https://video*.fbcdn.net/*"
+]
+FONTS = [f"*.{extension}" for extension in FONT_EXTENSIONS]
+ANALYTICS = [
+    "https://www.facebook.com/tr/*",
+    "https://www.facebook.com/ajax/bz",
+    "https://connect.facebook.net/*",
+    "https://*.google-analytics.com/*",
+    "https://*.googletagmanager.com/*",
+    "https://*.doubleclick.net/*",
+]
+
+BLOCKING_PRESETS = {
+    "none": [],
+    "media": IMAGES + VIDEO + FONTS,
+    "analytics": ANALYTICS,
+    "feed": IMAGES + VIDEO + FONTS + ANALYTICS,
+}
+
+# Requests the crawlers depend on, which no blocking pattern may match
+KEPT_URLS = [
+    "https://www.facebook.com/api/graphql/",
+    "https://www.facebook.com/ajax/bulk-route-definitions/",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yA/r/feed.js",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yB/l/0,cross/feed.css",
+    "https://static.xx.fbcdn.net/rsrc.php/v3/yN/r/Comet.icons.js?_nc_x=Ij3Wp8lg5Kz",
+    # Pages whose username looks like a file name or an analytics endpoint
+    "https://www.facebook.com/travel.gifts",
+    "https://www.facebook.com/tramanh.mp4studio",
+]
+
+# Chrome flags trimming background work and renderer memory of a crawling browser
+LOW_MEMORY_ARGUMENTS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+    "--renderer-process-limit=2",
+]
+
+
+def url_pattern_regex(pattern: str) -> re.Pattern:
+    """Regex matching the same URLs as blocking `pattern`, when full-matched"""
+    return re.compile(
+        "".join({"*": ".*", "?": "."}.get(char, re.escape(char)) for char in pattern)
+    )
+
+
+class ResourceBlocker:
+    """
+    Blocks requests matching URL patterns through CDP `Network.setBlockedURLs`.
+    `resources` is either a preset of `BLOCKING_PRESETS` or a list of patterns.
+    Blocking applies per tab, so it is to be applied again in every new tab
+    """
+
+    def __init__(
+        self, resources: str | list[str] = "none", kept_urls: list[str] = KEPT_URLS
+    ) -> None:
+        if isinstance(resources, str):
+            assert (
+                resources in BLOCKING_PRESETS
+            ), f"Unknown blocking preset {resources}, expected one of {list(BLOCKING_PRESETS)}"
+            resources = BLOCKING_PRESETS[resources]
+        self.patterns = list(resources)
+        for pattern in self.patterns:
+            regex = url_pattern_regex(pattern)
+            for url in kept_urls:
+                if regex.fullmatch(url):
+                    raise ValueError(f"Blocking pattern {pattern} would block {url}")
+
+    def apply(self, driver: Chrome):
+        if len(self.patterns) == 0:
+            return
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.patterns})
@@ -0,0 +1,114 @@
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+from lxml import etree
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def compile_xpath(xpath: str) -> etree.XPath:
+    return etree.XPath(xpath)
+
+
+class Selector:
+    """
+    Named XPath selector with a fallback chain, tried in order until one matches.
+    Relative selectors (starting with `.`) are scoped to the element they are evaluated on,
+    so lookups only walk that element's subtree. Works on lxml elements and Selenium drivers/elements
+    """
+
+    def __init__(self, name: str, *xpaths: str, version: str | None = None) -> None:
+        assert len(xpaths) > 0
+        self.name = name
+        self.xpaths = xpaths
+        self.version = version
+        # Compiled once for offline (lxml) parsing
+        self.compiled = [compile_xpath(xpath) for xpath in xpaths]
+        # Number of lookups only matched by a fallback, hinting the primary selector is outdated
+        self.fallback_hits = 0
+
+    def __str__(self) -> str:
+        return self.xpaths[0]
+
+    def __repr__(self) -> str:
+        return f"Selector({self.name!r}, version={self.version!r})"
+
+    def derive(self, name: str, template: str) -> "Selector":
+        """New selector applying `template` (with `{}` for the XPath) to each XPath of the chain"""
+        return Selector(
+            name,
+            *(template.format(xpath) for xpath in self.xpaths),
+            version=self.version,
+        )
+
+    def select(self, element) -> list:
+        """All lxml matches of the first matching XPath"""
+        result = self.compiled[0](element)
+        if len(result) > 0 or len(self.compiled) == 1:
+            return result
+        for xpath in self.compiled[1:]:
+            if len(result := xpath(element)) > 0:
+                self.fallback_hits += 1
+                return result
+        return []
+
+    def select_one(self, element):
+        result = self.select(element)
+        return result[0] if len(result) > 0 else None
+
+    def find_elements(self, context) -> list:
+        """All Selenium matches of the first matching XPath, `context` being a driver or an element"""
+        for i, xpath in enumerate(self.xpaths):
+            if len(result := context.find_elements(By.XPATH, xpath)) > 0:
+                self.fallback_hits += i > 0
+                return result
+        return []
+
+    def find_element(self, context):
+        if len(self.xpaths) == 1:
+            return context.find_element(By.XPATH, self.xpaths[0])
+        result = self.find_elements(context)
+        if len(result) == 0:
+            raise NoSuchElementException(
+                f"No element matches selector {self.name} (version {self.version})"
+            )
+        return result[0]
+
+
+class SelectorRegistry:
+    """Versioned set of named selectors, accessed as attributes"""
+
+    def __init__(self, version: str) -> None:
+        self.version = version
+        self.selectors: dict[str, Selector] = dict()
+
+    def register(self, name: str, *xpaths: str) -> Selector:
+        selector = Selector(name, *xpaths, version=self.version)
+        self.selectors[name] = selector
+        return selector
+
+    def add(self, selector: Selector) -> Selector:
+        self.selectors[selector.name] = selector
+        return selector
+
+    def __getitem__(self, name: str) -> Selector:
+        return self.selectors[name]
+
+    def __getattr__(self, name: str) -> Selector:
+        try:
+            return self.__dict__["selectors"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def as_js(self) -> dict[str, list[str]]:
+        """XPath fallback chains by name, to be passed as argument to page scripts"""
+        return {
+            name: list(selector.xpaths) for name, selector in self.selectors.items()
+        }
+
+    def outdated(self) -> list[Selector]:
+        return [
+            selector
+            for selector in self.selectors.values()
+            if selector.fallback_hits > 0
+        ]
@@ -0,0 +1,52 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters Facebook appends for tracking, which don't change the target page
+TRACKING_PARAMS = {
+    "ref",
+    "refid",
+    "fref",
+    "hc_ref",
+    "hc_location",
+    "_rdr",
+    "_rdc",
+    "mibextid",
+    "rdid",
+    "paipv",
+    "eav",
+    "sfnsn",
+    "notif_id",
+    "notif_t",
+    "acontext",
+}
+FACEBOOK_HOSTS = {
+    "facebook.com",
+    "m.facebook.com",
+    "mbasic.facebook.com",
+    "web.facebook.com",
+    "touch.facebook.com",
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize an absolute URL so links to the same page compare equal:
+    lowercases scheme and host, maps Facebook mirrors to www.facebook.com,
+    drops fragments, tracking query parameters (`__cft__`, `__tn__`, ...) and trailing slashes.
+    Relative or non-HTTP links are returned unchanged
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.netloc:
+        return url
+
+    netloc = parts.netloc.lower()
+    if netloc in FACEBOOK_HOSTS:
+        netloc = "www.facebook.com"
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("__") and key not in TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip("/") if parts.path != "/" else ""
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
@@ -0,0 +1,101 @@
+import os
+import json
+import threading
+from datetime import datetime
+from pandas import read_csv, to_datetime, isna
+from typing import Any
+
+# Crawlers of one crawler_dir may run as concurrent workers sharing a watermark file
+_file_lock = threading.Lock()
+
+
+class Watermarks:
+    """
+    Newest crawled post links and date per page, so later crawls of a page can stop at already stored posts.
+    Pages without an entry fall back to the output CSV of an earlier crawl, if any
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fallback_csv_format: str | None = None,
+        max_links: int = 200,
+    ) -> None:
+        self.path = path
+        self.fallback_csv_format = fallback_csv_format
+        self.max_links = max_links
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return dict()
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _read_fallback_csv(self, page_id: str) -> tuple[list[str], datetime | None]:
+        if self.fallback_csv_format is None:
+            return [], None
+        csv_path = self.fallback_csv_format.format(page_id=page_id)
+        if not os.path.exists(csv_path):
+            return [], None
+
+        try:
+            df = read_csv(csv_path, usecols=["Post_link", "Post_date"])
+        except ValueError:
+            # Empty file, or written without the link or date columns: no watermark
+            return [], None
+        df["Post_date"] = to_datetime(df["Post_date"], errors="coerce")
+        df = df.sort_values("Post_date", ascending=False)
+        links = df["Post_link"].dropna().head(self.max_links).tolist()
+        post_date = df["Post_date"].max()
+        return links, None if isna(post_date) else post_date.to_pydatetime()
+
+    def get(self, page_id: str) -> tuple[set[str], datetime | None]:
+        """Known post links and newest post date of a page"""
+        with _file_lock:
+            entry = self._read().get(page_id)
+        if entry is None:
+            links, post_date = self._read_fallback_csv(page_id)
+            return set(links), post_date
+
+        post_date = entry.get("post_date")
+        return set(entry.get("post_links", [])), (
+            datetime.fromisoformat(post_date) if post_date is not None else None
+        )
+
+    def update(self, page_id: str, items: list[dict[str, Any]]):
+        """Record newly crawled posts of a page, newest first"""
+        items = [item for item in items if item.get("Post_link") is not None]
+        if len(items) == 0:
+            return
+        items = sorted(
+            items, key=lambda item: item.get("Post_date") or datetime.min, reverse=True
+        )
+
+        with _file_lock:
+            watermarks = self._read()
+            entry = watermarks.get(page_id)
+            if entry is None:
+                links, post_date = self._read_fallback_csv(page_id)
+                entry = dict(
+                    post_links=links,
+                    post_date=post_date.isoformat() if post_date is not None else None,
+                )
+            links = dict.fromkeys(
+                [item["Post_link"] for item in items] + entry["post_links"]
+            )
+            entry["post_links"] = list(links)[: self.max_links]
+
+            post_dates = [
+                item["Post_date"] for item in items if item.get("Post_date") is not None
+            ]
+            if entry["post_date"] is not None:
+                post_dates.append(datetime.fromisoformat(entry["post_date"]))
+            if len(post_dates) > 0:
+                entry["post_date"] = max(post_dates).isoformat()
+            watermarks[page_id] = entry
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(watermarks, f, indent=2)
+            os.replace(tmp_path, self.path)